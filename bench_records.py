@@ -0,0 +1,100 @@
+import sys
+import json
+import time
+import random
+import tracemalloc
+
+from records import FileRecord, load_records
+
+# Memory per file record and serialization throughput for a 10k-file vault:
+# generic dict rows mapped with per-field .get() fallbacks (the old
+# get_files path) versus slotted FileRecords and the compiled serializer.
+#
+#   python bench_records.py [files] [rounds]
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+ROUNDS = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+random.seed(7)
+
+
+def make_rows(n):
+    rows = []
+    for i in range(n):
+        # Half Supabase-shaped, half db.json-shaped, as the fallback paths mix them
+        if i % 2:
+            rows.append({
+                "id": f"id-{i}", "owner_id": "owner", "name": f"file-{i}.pdf", "size": random.randint(1, 10**7),
+                "type": "application/pdf", "url": None, "category": "Legal", "risk_level": "Low",
+                "verdict": "Looks fine", "uploaded_at": "2026-02-23T04:17:20Z", "cipher_content": "QUJD", "iv": "aXY=",
+            })
+        else:
+            rows.append({
+                "id": f"id-{i}", "ownerId": "owner", "name": f"file-{i}.pdf", "size": random.randint(1, 10**7),
+                "type": "application/pdf", "url": None, "category": "Legal", "riskLevel": "Low",
+                "verdict": "Looks fine", "uploadedAt": "2026-02-23T04:17:20Z", "cipherContent": "QUJD", "iv": "aXY=",
+            })
+    return rows
+
+
+def dict_path(rows):
+    mapped_files = []
+    for f in rows:
+        mapped_files.append({
+            "id": f.get("id"),
+            "name": f.get("name"),
+            "size": f.get("size"),
+            "type": f.get("type"),
+            "url": f.get("url"),
+            "category": f.get("category"),
+            "riskLevel": f.get("risk_level") or f.get("riskLevel"),
+            "verdict": f.get("verdict"),
+            "uploadedAt": f.get("uploaded_at") or f.get("uploadedAt"),
+            "cipherContent": f.get("cipher_content") or f.get("cipherContent"),
+            "iv": f.get("iv")
+        })
+    return mapped_files
+
+
+def record_path(rows):
+    return [r.to_frontend() for r in load_records(FileRecord, rows)]
+
+
+def held_bytes(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / N, held
+
+
+def best_of(fn, *args):
+    best = float("inf")
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+rows = make_rows(N)
+assert dict_path(rows) == record_path(rows)
+
+dict_bytes, _ = held_bytes(lambda: [dict(r) for r in rows])
+record_bytes, records = held_bytes(lambda: load_records(FileRecord, rows))
+
+print(f"{N} file records")
+print(f"  memory / record     dict {dict_bytes:8.0f} B    slotted {record_bytes:8.0f} B  ({record_bytes / dict_bytes:.0%})")
+
+t_dict = best_of(dict_path, rows)
+t_load = best_of(load_records, FileRecord, rows)
+t_ser = best_of(lambda: [r.to_frontend() for r in records])
+t_json_dict = best_of(lambda: json.dumps(dict_path(rows)))
+t_json_rec = best_of(lambda: json.dumps([r.to_frontend() for r in records]))
+
+print(f"  dict .get() mapping           {N / t_dict:12,.0f} rec/s")
+print(f"  normalize (row -> record)     {N / t_load:12,.0f} rec/s")
+print(f"  serialize (record -> dict)    {N / t_ser:12,.0f} rec/s")
+print(f"  end-to-end json, dict path    {N / t_json_dict:12,.0f} rec/s")
+print(f"  end-to-end json, records      {N / t_json_rec:12,.0f} rec/s")
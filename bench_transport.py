@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+# Bytes-on-the-wire and server CPU for the file endpoints, per transport.
+# Runs the Flask app in-process against a copy of db.json (Supabase is left
+# unconfigured so every call takes the local fallback path).
+#
+#   python bench_transport.py [iterations]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+workdir = tempfile.mkdtemp(prefix="cv-bench-")
+shutil.copy(os.path.join(HERE, "db.json"), workdir)
+os.chdir(workdir)
+os.environ.update({"SUPABASE_URL": "", "LOG_CONSOLE": "0", "LOG_FILE": "", "CLOUDVAULT_WARMUP": "0"})
+sys.path.insert(0, HERE)
+
+import server  # noqa: E402
+from transport import FRAMES_MIMETYPE, encode_frames  # noqa: E402
+
+client = server.app.test_client()
+with open("db.json") as f:
+    owners = {uid: files for uid, files in json.load(f).get("files", {}).items() if files}
+
+DOWNLOAD_MODES = {
+    "json": {"Accept": "application/json"},
+    "json+gzip": {"Accept": "application/json", "Accept-Encoding": "gzip"},
+    "json+zstd": {"Accept": "application/json", "Accept-Encoding": "zstd"},
+    "frames": {"Accept": FRAMES_MIMETYPE},
+}
+
+
+def measure(call):
+    total_bytes = 0
+    cpu = time.process_time()
+    for _ in range(ITERATIONS):
+        total_bytes += call()
+    return total_bytes // ITERATIONS, (time.process_time() - cpu) * 1000 / ITERATIONS
+
+
+def report(title, rows):
+    print(title)
+    base = rows[0][1]
+    for name, size, cpu_ms in rows:
+        print(f"  {name:<10} {size:>10} B  ({size / base:6.1%})  {cpu_ms:7.2f} ms cpu/req")
+
+
+for uid, files in owners.items():
+    rows = []
+    for name, headers in DOWNLOAD_MODES.items():
+        def call():
+            resp = client.get(f"/api/files/{uid}", headers=headers)
+            assert resp.status_code == 200, resp.status_code
+            return len(resp.get_data())
+        rows.append((name,) + measure(call))
+    report(f"GET /api/files/{uid} ({len(files)} files)", rows)
+
+    json_body = json.dumps(files).encode()
+    frames_body = encode_frames({}, files)
+    rows = []
+    for name, body, ctype in (("json", json_body, "application/json"), ("frames", frames_body, FRAMES_MIMETYPE)):
+        def call():
+            resp = client.post(f"/api/files/{uid}", data=body, content_type=ctype)
+            assert resp.status_code == 200, resp.status_code
+            return len(body)
+        rows.append((name,) + measure(call))
+    report(f"POST /api/files/{uid}", rows)
+
+shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,207 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from log_pipeline import get_logger
+
+# Lazily constructed external clients and a cached schema/capability probe.
+# Importing supabase/groq and building their clients is the bulk of the API's
+# cold start, so nothing here runs until a request (or the warm-up thread)
+# actually needs it.
+#
+# A failed Supabase client build is remembered for SUPABASE_RETRY_INTERVAL
+# seconds so requests fall back to db.json without retrying it each time.
+# The schema probe runs at most once per SCHEMA_PROBE_INTERVAL seconds, even
+# with refresh=True; a probe that hit errors (rather than a definite "does
+# not exist") records those tables/columns as unknown and is re-run on the
+# first call after the interval.
+
+log = get_logger("clients")
+
+ENV_FILE = ".env.local"
+
+# Tables the API reads/writes, and optional columns it adapts to
+PROBE_TABLES = ["users", "files", "access_requests", "system_notifications", "access_logs"]
+PROBE_COLUMNS = {"users": ["session_salt"]}
+
+SUPABASE_RETRY_INTERVAL = float(os.environ.get("SUPABASE_RETRY_INTERVAL", 30))
+SCHEMA_PROBE_INTERVAL = float(os.environ.get("SCHEMA_PROBE_INTERVAL", 30))
+
+_env_loaded = False
+_env_lock = threading.Lock()
+
+_supabase = None
+_supabase_failure: Optional[Tuple[str, float]] = None  # (error, retry at)
+_supabase_lock = threading.Lock()
+
+_groq = None
+_groq_lock = threading.Lock()
+
+_schema: Optional[Dict[str, Any]] = None
+_schema_probed_at = 0.0
+_schema_lock = threading.Lock()
+
+
+def load_env() -> None:
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _env_lock:
+        if not _env_loaded:
+            load_dotenv(dotenv_path=ENV_FILE)
+            _env_loaded = True
+
+
+def get_supabase():
+    global _supabase, _supabase_failure
+    if _supabase is not None:
+        return _supabase
+    with _supabase_lock:
+        if _supabase is None:
+            if _supabase_failure is not None and time.monotonic() < _supabase_failure[1]:
+                raise RuntimeError(f"Supabase client unavailable: {_supabase_failure[0]}")
+            load_env()
+            url, key = os.environ.get("SUPABASE_URL", ""), os.environ.get("SUPABASE_KEY", "")
+            try:
+                if not url or not key:
+                    raise RuntimeError("SUPABASE_URL and SUPABASE_KEY are not set")
+                from supabase import create_client
+
+                started = time.perf_counter()
+                _supabase = create_client(url, key)
+            except Exception as e:
+                _supabase_failure = (str(e), time.monotonic() + SUPABASE_RETRY_INTERVAL)
+                log.warning("Supabase client unavailable", extra={"error": str(e), "retry_in": SUPABASE_RETRY_INTERVAL})
+                raise
+            _supabase_failure = None
+            log.info("Supabase client initialized", extra={"init_ms": round((time.perf_counter() - started) * 1000, 2)})
+    return _supabase
+
+
+def get_groq():
+    global _groq
+    if _groq is not None:
+        return _groq
+    with _groq_lock:
+        if _groq is None:
+            load_env()
+            from groq import Groq
+
+            _groq = Groq(api_key=os.environ.get("VITE_GROQ_API_KEY"))
+            log.info("Groq client initialized")
+    return _groq
+
+
+def is_missing(error: Any, name: str) -> bool:
+    # True only for a definite "relation/column does not exist" about name
+    # (Postgres 42P01/42703, PostgREST PGRST204 "Could not find the ... column");
+    # timeouts, auth and connection errors are not evidence either way
+    text = str(error)
+    return name in text and any(marker in text for marker in ("does not exist", "42P01", "42703", "PGRST204", "Could not find"))
+
+
+def _probe_table(table: str) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"exists": False, "columns": {}}
+    started = time.perf_counter()
+    try:
+        get_supabase().table(table).select("id").limit(1).execute()
+        result["exists"] = True
+    except Exception as e:
+        result["error"] = str(e)
+        if not is_missing(e, table):
+            result["exists"] = None
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    if result["exists"]:
+        for column in PROBE_COLUMNS.get(table, []):
+            try:
+                get_supabase().table(table).select(column).limit(1).execute()
+                result["columns"][column] = True
+            except Exception as e:
+                result["columns"][column] = False if is_missing(e, column) else None
+                if result["columns"][column] is None:
+                    result.setdefault("column_errors", {})[column] = str(e)
+    return result
+
+
+def _settled(tables: Dict[str, Any]) -> bool:
+    return all(info["exists"] is not None and None not in info["columns"].values() for info in tables.values())
+
+
+def _schema_is_current(refresh: bool) -> bool:
+    # Caller decides whether to take the lock; this only reads
+    if _schema is None:
+        return False
+    if time.monotonic() - _schema_probed_at < SCHEMA_PROBE_INTERVAL:
+        return True
+    return not refresh and _schema["settled"]
+
+
+def probe_schema(refresh: bool = False) -> Dict[str, Any]:
+    global _schema, _schema_probed_at
+    if _schema_is_current(refresh):
+        return _schema
+    with _schema_lock:
+        if _schema_is_current(refresh):
+            return _schema
+
+        started = time.perf_counter()
+        try:
+            get_supabase()
+            with ThreadPoolExecutor(max_workers=len(PROBE_TABLES)) as pool:
+                tables = dict(zip(PROBE_TABLES, pool.map(_probe_table, PROBE_TABLES)))
+        except Exception as e:
+            tables = {t: {"exists": None, "columns": {}, "error": str(e)} for t in PROBE_TABLES}
+
+        _schema_probed_at = time.monotonic()
+        _schema = {
+            "supabase": any(t["exists"] for t in tables.values()),
+            "settled": _settled(tables),
+            "tables": tables,
+            "checked_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        log.info("Schema probe finished", extra={
+            "supabase": _schema["supabase"],
+            "duration_ms": _schema["duration_ms"],
+            "missing": [t for t, info in tables.items() if info["exists"] is False],
+            "settled": _schema["settled"],
+        })
+        return _schema
+
+
+def has_column(table: str, column: str) -> Optional[bool]:
+    # None means "not probed yet / unknown"; callers should try and learn
+    if _schema is None:
+        return None
+    info = _schema["tables"].get(table)
+    if not info or not info["exists"]:
+        return None
+    return info["columns"].get(column)
+
+
+def mark_column(table: str, column: str, present: bool) -> None:
+    # Record something a request discovered so later requests don't retry it
+    if _schema is None:
+        return
+    info = _schema["tables"].get(table)
+    if info is not None and info["columns"].get(column) != present:
+        info["columns"][column] = present
+        log.warning("Schema capability changed", extra={"table": table, "column": column, "present": present})
+
+
+def warm_up() -> threading.Thread:
+    # Build clients and run the probe off the import path
+    def _run():
+        try:
+            probe_schema()
+        except Exception:
+            log.exception("Startup schema probe failed")
+
+    thread = threading.Thread(target=_run, name="cloudvault-warmup", daemon=True)
+    thread.start()
+    return thread
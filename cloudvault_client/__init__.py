@@ -0,0 +1,24 @@
+import importlib
+
+# Python client for the CloudVault API: client-side encryption compatible
+# with services/encryption.js, a pooled/retrying HTTP client, and parallel,
+# resumable directory transfers (also available as `python -m cloudvault_client`).
+#
+# Exports resolve lazily so the server can import the container format
+# (cloudvault_client.container) without pulling in requests.
+
+_EXPORTS = {
+    "VaultClient": "client", "VaultError": "client",
+    "ContainerError": "container", "new_header": "container", "parse_header": "container",
+    "content_hash": "crypto", "decrypt_bytes": "crypto", "derive_key": "crypto",
+    "encrypt_bytes": "crypto", "share_key": "crypto",
+    "pull": "transfer", "pull_files": "transfer", "push": "transfer",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
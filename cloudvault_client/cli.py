@@ -0,0 +1,136 @@
+import os
+import sys
+import json
+import argparse
+from typing import Any, Dict, List, Optional
+
+from .client import VaultClient, VaultError
+from .transfer import pull, pull_files, push
+
+# Command-line front end for bulk vault transfers.
+#
+#   python -m cloudvault_client push ./docs --key 7B423BD2 --delete
+#   python -m cloudvault_client pull ./restore --key 7B423BD2
+#   python -m cloudvault_client ls | rm NAME... | usage
+#   python -m cloudvault_client shared SHAREKEY ./out
+#
+# Server and credentials come from --server/--email/--password or
+# CLOUDVAULT_URL / CLOUDVAULT_EMAIL / CLOUDVAULT_PASSWORD; the encryption
+# key from --key or CLOUDVAULT_KEY.
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cloudvault_client", description="CloudVault bulk transfer client")
+    parser.add_argument("--server", default=os.environ.get("CLOUDVAULT_URL", "http://127.0.0.1:5000"))
+    parser.add_argument("--email", default=os.environ.get("CLOUDVAULT_EMAIL"))
+    parser.add_argument("--password", default=os.environ.get("CLOUDVAULT_PASSWORD"))
+    parser.add_argument("--key", default=os.environ.get("CLOUDVAULT_KEY"),
+                        help="encryption key; defaults to this session's share key")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("push", help="mirror a local directory into the vault")
+    p.add_argument("directory")
+    p.add_argument("--delete", action="store_true", help="remove vault files missing locally")
+    p.add_argument("--analyze", action="store_true", help="run the AI security scan on new files")
+
+    p = commands.add_parser("pull", help="download and decrypt the vault into a directory")
+    p.add_argument("directory")
+
+    p = commands.add_parser("shared", help="download and decrypt files shared under a key")
+    p.add_argument("share_key")
+    p.add_argument("directory", nargs="?")
+
+    commands.add_parser("ls", help="list vault files")
+    p = commands.add_parser("rm", help="delete vault files by name")
+    p.add_argument("names", nargs="+")
+    commands.add_parser("usage", help="show storage usage and quotas")
+    return parser
+
+
+def _progress(quiet: bool):
+    if quiet:
+        return None
+    return lambda event, name: print(f"{event:>10}  {name}", file=sys.stderr)
+
+
+def _login(args, vault: VaultClient) -> None:
+    if not args.email or not args.password:
+        raise VaultError(401, "--email and --password (or CLOUDVAULT_EMAIL/CLOUDVAULT_PASSWORD) are required")
+    vault.login(args.email, args.password)
+
+
+def _key(args, vault: VaultClient) -> str:
+    if args.key:
+        return args.key
+    # Login rotates the share key, so anything encrypted with it needs this exact value to read back
+    print(f"warning: no --key given, using this session's share key {vault.share_key}", file=sys.stderr)
+    return vault.share_key
+
+
+def _print_report(report: Dict[str, Any], as_json: bool) -> None:
+    if as_json:
+        print(json.dumps(report, indent=2))
+        return
+    for field, value in report.items():
+        if field == "failed":
+            print(f"{field:>10}: {len(value)}")
+            for name, reason in value.items():
+                print(f"            {name}: {reason}")
+        elif isinstance(value, list):
+            print(f"{field:>10}: {len(value)}")
+        elif isinstance(value, dict):
+            print(f"{field:>10}: {json.dumps(value)}")
+        else:
+            print(f"{field:>10}: {value}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parser().parse_args(argv)
+    progress = _progress(args.json)
+
+    with VaultClient(args.server, pool_size=max(args.workers, 1) + 2) as vault:
+        try:
+            if args.command == "shared":
+                shared = vault.shared_files(args.share_key)
+                if not args.directory:
+                    _print_report({"owner": shared.get("owner"), "files": [f.get("name") for f in shared.get("files", [])]}, args.json)
+                    return 0
+                # Shared files were encrypted with the owner's share key
+                report = pull_files(shared.get("files", []), args.directory, args.key or args.share_key.upper(),
+                                    workers=args.workers, progress=progress, vault=vault)
+                _print_report(report, args.json)
+                return 1 if report["failed"] else 0
+
+            _login(args, vault)
+            if args.command == "push":
+                report = push(vault, args.directory, _key(args, vault), workers=args.workers,
+                              delete=args.delete, analyze=args.analyze, progress=progress)
+            elif args.command == "pull":
+                report = pull(vault, args.directory, _key(args, vault), workers=args.workers, progress=progress)
+            elif args.command == "ls":
+                found = vault.search(sort="name", per_page=100)
+                names = [f["name"] for f in found["results"]]
+                page = 1
+                while len(names) < found["total"]:
+                    page += 1
+                    found = vault.search(sort="name", per_page=100, page=page)
+                    names.extend(f["name"] for f in found["results"])
+                    if not found["results"]:
+                        break
+                report = {"files": names} if args.json else None
+                if not args.json:
+                    print("\n".join(names))
+            elif args.command == "rm":
+                result = vault.sync([], deleted=args.names)
+                report = {"deleted": result.get("deleted", [])}
+            else:
+                report = vault.usage()
+
+            if report is not None:
+                _print_report(report, args.json)
+            return 1 if report and report.get("failed") else 0
+        except VaultError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
@@ -0,0 +1,152 @@
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .crypto import share_key
+
+# Thin wrapper over the CloudVault HTTP API.
+#
+# One requests.Session per client, with a connection pool sized for the
+# transfer worker pool, so parallel uploads reuse keep-alive connections.
+# Connection errors, 429s (honouring Retry-After) and gateway/unavailable
+# responses are retried with exponential backoff; a plain 500 is the app
+# reporting an error and is raised. File POSTs are safe to retry: the
+# server upserts by name and skips unchanged content.
+#
+#   vault = VaultClient("http://127.0.0.1:5000")
+#   vault.login("me@example.com", "secret")
+#   vault.files()
+
+DEFAULT_TIMEOUT = 60
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class VaultError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class VaultClient:
+    def __init__(self, base_url: str, pool_size: int = 8, retries: int = 5, backoff: float = 0.5,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.user: Optional[Dict[str, Any]] = None
+
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=None, respect_retry_after_header=True, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "VaultClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _request(self, method: str, path: str, **kwargs) -> Any:
+        kwargs.setdefault("timeout", self.timeout)
+        response = self.session.request(method, self.base_url + path, **kwargs)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        if not response.ok:
+            message = body.get("error") if isinstance(body, dict) and body.get("error") else response.text
+            raise VaultError(response.status_code, message)
+        return body
+
+    @property
+    def user_id(self) -> Any:
+        if not self.user:
+            raise VaultError(401, "Not logged in")
+        return self.user["id"]
+
+    @property
+    def share_key(self) -> str:
+        # The key the web UI encrypts new uploads with; it rotates on every login
+        return share_key(self.user_id, self.user.get("session_salt"))
+
+    # -- accounts --
+    def register(self, email: str, password: str) -> Dict[str, Any]:
+        return self._request("POST", "/api/register", json={"email": email, "password": password})
+
+    def login(self, email: str, password: str) -> Dict[str, Any]:
+        self.user = self._request("POST", "/api/login", json={"email": email, "password": password})
+        return self.user
+
+    # -- files --
+    def files(self) -> List[Dict[str, Any]]:
+        return self._request("GET", f"/api/files/{self.user_id}")
+
+    def upload(self, files: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # files are frontend-shaped dicts (name, size, type, cipherContent, iv, ...)
+        return self._request("POST", f"/api/files/{self.user_id}", json=files)
+
+    def sync(self, manifest: List[Dict[str, Any]], deleted: Optional[List[str]] = None) -> Dict[str, Any]:
+        return self._request("POST", f"/api/files/{self.user_id}/sync",
+                             json={"manifest": manifest, "deleted": deleted or []})
+
+    def delete(self, file_id: Any) -> Dict[str, Any]:
+        return self._request("DELETE", f"/api/files/{self.user_id}/{file_id}")
+
+    def usage(self) -> Dict[str, Any]:
+        return self._request("GET", f"/api/files/{self.user_id}/usage")
+
+    def search(self, **params: Any) -> Dict[str, Any]:
+        return self._request("GET", f"/api/files/{self.user_id}/search", params=params)
+
+    def analyze(self, file_name: str, file_type: str) -> Dict[str, Any]:
+        # {verdict, category, riskLevel}; the server answers a neutral verdict if the scan is down
+        try:
+            return self._request("POST", "/api/analyze", json={"fileName": file_name, "fileType": file_type})
+        except VaultError:
+            return {"verdict": "Security scan unavailable.", "category": "Other", "riskLevel": "Low"}
+
+    # -- chunked containers --
+    def begin_container(self, header: bytes) -> Dict[str, Any]:
+        # Registers (or resumes) a container; the reply lists the segments still missing
+        return self._request("POST", f"/api/containers/{self.user_id}", data=header,
+                             headers={"Content-Type": "application/octet-stream"})
+
+    def container_status(self, container_id: str, owner_id: Any = None) -> Dict[str, Any]:
+        return self._request("GET", f"/api/containers/{owner_id or self.user_id}/{container_id}")
+
+    def put_segment(self, container_id: str, number: int, sealed: bytes) -> Dict[str, Any]:
+        return self._request("PUT", f"/api/containers/{self.user_id}/{container_id}/segments/{number}",
+                             data=sealed, headers={"Content-Type": "application/octet-stream"})
+
+    def get_segment(self, container_id: str, number: int, owner_id: Any = None) -> bytes:
+        response = self.session.get(
+            f"{self.base_url}/api/containers/{owner_id or self.user_id}/{container_id}/segments/{number}",
+            timeout=self.timeout)
+        if not response.ok:
+            raise VaultError(response.status_code, response.text)
+        return response.content
+
+    # -- sharing --
+    def shared_files(self, key: str) -> Dict[str, Any]:
+        return self._request("GET", f"/api/shared-files/{key}")
+
+    def request_access(self, file_id: Any, owner_id: Any, requester_key: str) -> Dict[str, Any]:
+        return self._request("POST", "/api/access-requests",
+                             json={"fileId": file_id, "ownerId": owner_id, "requesterKey": requester_key})
+
+    def access_requests(self) -> List[Dict[str, Any]]:
+        return self._request("GET", f"/api/access-requests/{self.user_id}")
+
+    def answer_access_request(self, request_id: Any, status: str) -> Dict[str, Any]:
+        return self._request("PATCH", f"/api/access-requests/{request_id}", json={"status": status})
+
+    def check_approval(self, file_id: Any, requester_key: str) -> bool:
+        body = self._request("POST", "/api/check-approval", json={"fileId": file_id, "requesterKey": requester_key})
+        return bool(body.get("approved"))
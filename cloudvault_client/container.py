@@ -0,0 +1,138 @@
+import os
+import struct
+import base64
+from typing import NamedTuple, Optional
+
+from .crypto import derive_key
+
+# CVC1: chunked encryption container (services/encryption.js has the same
+# format for the browser).
+#
+#   header  = magic "CVC1" | version u8 | flags u8 | reserved u16
+#             | segment_size u32 | plaintext_size u64 | container_id 16B   (36 bytes)
+#   segment i = AES-GCM(key, nonce_i, plaintext[i*S:(i+1)*S], aad_i)       (len + 16-byte tag)
+#   nonce_i = container_id[:8] | i (u32 BE)
+#   aad_i   = header | i (u32 BE) | final (u8)
+#
+# Every segment carries its own nonce and tag, so segments can be sent,
+# stored and decrypted independently and in any order. Binding the header,
+# the index and the final flag into each tag stops segments being swapped,
+# moved between files or the stream being truncated.
+#
+# A container has at most MAX_SEGMENTS segments (64 GiB at the default
+# segment size), so a header can't make the server track an unbounded
+# number of them.
+#
+# A file record holding a container stores the base64 header as its
+# cipherContent and CONTAINER_IV as its iv. Legacy records hold a single
+# AES-GCM message and a base64 12-byte IV, which can never equal the marker.
+
+MAGIC = b"CVC1"
+VERSION = 1
+CONTAINER_IV = "CVC1"
+TAG_BYTES = 16
+DEFAULT_SEGMENT_SIZE = 1024 * 1024
+MIN_SEGMENT_SIZE = 16 * 1024
+MAX_SEGMENT_SIZE = 16 * 1024 * 1024
+MAX_SEGMENTS = 65536
+
+_HEADER = struct.Struct(">4sBBHIQ16s")
+HEADER_BYTES = _HEADER.size
+_INDEX = struct.Struct(">I")
+
+
+class ContainerError(ValueError):
+    pass
+
+
+class Header(NamedTuple):
+    segment_size: int
+    size: int
+    container_id: bytes
+    raw: bytes
+
+    @property
+    def id(self) -> str:
+        return self.container_id.hex()
+
+    @property
+    def segment_count(self) -> int:
+        # An empty file still has one (empty, authenticated) segment
+        return max(1, -(-self.size // self.segment_size))
+
+    def segment_plain_bytes(self, index: int) -> int:
+        if index == self.segment_count - 1:
+            return self.size - index * self.segment_size
+        return self.segment_size
+
+    def segment_bytes(self, index: int) -> int:
+        return self.segment_plain_bytes(index) + TAG_BYTES
+
+    @property
+    def ciphertext_bytes(self) -> int:
+        # Header plus every sealed segment: what the container costs to store
+        return HEADER_BYTES + self.size + TAG_BYTES * self.segment_count
+
+
+def _check_size(size: int, segment_size: int) -> None:
+    if not MIN_SEGMENT_SIZE <= segment_size <= MAX_SEGMENT_SIZE:
+        raise ContainerError(f"segment size must be between {MIN_SEGMENT_SIZE} and {MAX_SEGMENT_SIZE}")
+    if size > MAX_SEGMENTS * segment_size:
+        raise ContainerError(f"container is limited to {MAX_SEGMENTS} segments of {segment_size} bytes")
+
+
+def new_header(size: int, segment_size: int = DEFAULT_SEGMENT_SIZE) -> Header:
+    _check_size(size, segment_size)
+    container_id = os.urandom(16)
+    raw = _HEADER.pack(MAGIC, VERSION, 0, 0, segment_size, size, container_id)
+    return Header(segment_size, size, container_id, raw)
+
+
+def parse_header(raw: bytes) -> Header:
+    if len(raw) != HEADER_BYTES:
+        raise ContainerError(f"container header must be {HEADER_BYTES} bytes")
+    magic, version, _, _, segment_size, size, container_id = _HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ContainerError("not a CVC1 container")
+    if version != VERSION:
+        raise ContainerError(f"unsupported container version {version}")
+    _check_size(size, segment_size)
+    return Header(segment_size, size, container_id, bytes(raw))
+
+
+def header_from_record(file: dict) -> Optional[Header]:
+    # The container header of a file record, or None for a legacy record
+    if file.get("iv") != CONTAINER_IV:
+        return None
+    content = file.get("cipherContent") or file.get("cipher_content")
+    if not content:
+        raise ContainerError("container record has no header")
+    return parse_header(base64.b64decode(content))
+
+
+def _nonce(header: Header, index: int) -> bytes:
+    return header.container_id[:8] + _INDEX.pack(index)
+
+
+def _aad(header: Header, index: int) -> bytes:
+    return header.raw + _INDEX.pack(index) + bytes([index == header.segment_count - 1])
+
+
+def seal_segment(header: Header, index: int, plaintext: bytes, password: str) -> bytes:
+    if len(plaintext) != header.segment_plain_bytes(index):
+        raise ContainerError(f"segment {index} must be {header.segment_plain_bytes(index)} bytes")
+    return derive_key(password).encrypt(_nonce(header, index), plaintext, _aad(header, index))
+
+
+def open_segment(header: Header, index: int, sealed: bytes, password: str) -> bytes:
+    # Raises cryptography.exceptions.InvalidTag for a wrong key, tampering or a misplaced segment
+    if not 0 <= index < header.segment_count or len(sealed) != header.segment_bytes(index):
+        raise ContainerError(f"segment {index} has the wrong size or index")
+    return derive_key(password).decrypt(_nonce(header, index), bytes(sealed), _aad(header, index))
+
+
+def read_segment(path: str, header: Header, index: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(index * header.segment_size)
+        return f.read(header.segment_plain_bytes(index))
+
@@ -0,0 +1,54 @@
+import os
+import base64
+import hashlib
+import functools
+from typing import Optional, Tuple
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+# Client-side encryption, bit-compatible with services/encryption.js:
+# PBKDF2-SHA256 (100k iterations, constant salt) -> AES-GCM-256 with a
+# random 12-byte IV; ciphertext (tag appended, as WebCrypto does) and IV
+# travel base64-encoded as cipherContent / iv.
+
+PBKDF2_SALT = b"cloudvault-salt"
+PBKDF2_ITERATIONS = 100000
+KEY_BYTES = 32
+IV_BYTES = 12
+
+
+@functools.lru_cache(maxsize=32)
+def derive_key(password: str) -> AESGCM:
+    # PBKDF2 is the expensive part; cached so a bulk transfer derives once per key
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=KEY_BYTES, salt=PBKDF2_SALT, iterations=PBKDF2_ITERATIONS)
+    return AESGCM(kdf.derive(password.encode("utf-8")))
+
+
+def encrypt_bytes(data: bytes, password: str) -> Tuple[str, str]:
+    # -> (cipherContent, iv), both base64
+    iv = os.urandom(IV_BYTES)
+    cipher = derive_key(password).encrypt(iv, data, None)
+    return base64.b64encode(cipher).decode("ascii"), base64.b64encode(iv).decode("ascii")
+
+
+def decrypt_bytes(cipher_b64: str, iv_b64: str, password: str) -> bytes:
+    # Raises cryptography.exceptions.InvalidTag for a wrong key or damaged data
+    return derive_key(password).decrypt(base64.b64decode(iv_b64), base64.b64decode(cipher_b64), None)
+
+
+def content_hash(cipher_b64: Optional[str]) -> str:
+    # Same content hash the server's sync manifest and encryption.js use
+    return hashlib.sha256(base64.b64decode(cipher_b64) if cipher_b64 else b"").hexdigest()
+
+
+def share_key(user_id, salt: Optional[str] = None) -> str:
+    # Port of generateDynamicKey (constants.js); JS strings hash by UTF-16 unit
+    seed = (str(user_id) + (salt or "cloudvault-legacy")).encode("utf-16-le")
+    h = 0
+    for i in range(0, len(seed), 2):
+        h = ((h << 5) - h + int.from_bytes(seed[i:i + 2], "little")) & 0xFFFFFFFF
+    if h & 0x80000000:
+        h -= 0x100000000
+    return format(abs(h), "x").upper()[:8]
@@ -0,0 +1,323 @@
+import os
+import json
+import base64
+import time
+import uuid
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+from cryptography.exceptions import InvalidTag
+
+from .client import VaultClient, VaultError
+from .container import (CONTAINER_IV, ContainerError, Header, header_from_record, new_header, open_segment,
+                        parse_header, read_segment, seal_segment)
+from .crypto import content_hash, decrypt_bytes, encrypt_bytes
+
+# Directory mirroring on top of the delta-sync handshake.
+#
+# push: the local tree is described to POST /api/files/<id>/sync, and only
+# the files the server asks for are encrypted and uploaded, in batches of
+# up to BATCH_BYTES spread over a worker pool. Each finished batch is
+# recorded in a state file inside the mirrored directory, keyed by
+# (size, mtime). An interrupted push therefore resumes where it stopped:
+# files already sent are reported to the server with the hash of what was
+# uploaded, so they come back "unchanged" and are not encrypted again.
+# (AES-GCM uses a fresh IV per upload, so re-encrypting would always look
+# like new content.)
+#
+# Files of CHUNKED_BYTES or more are sent as CVC1 containers instead: their
+# segments are sealed and uploaded in parallel, and the container header is
+# saved in the state file before the first segment goes out. A resumed push
+# re-registers that header, and the server answers with the segments it is
+# still missing; nonces are derived from the header, so only those are sent.
+#
+# pull: the vault is listed once, then decryption and writes run in
+# parallel. Files whose recorded hash still matches are skipped. Container
+# segments are fetched in parallel and written in place as they decrypt.
+
+STATE_FILE = ".cloudvault-state.json"
+BATCH_BYTES = 8 * 1024 * 1024
+CHUNKED_BYTES = 8 * 1024 * 1024
+
+Progress = Optional[Callable[[str, str], None]]
+
+
+class TransferState:
+    # {name: {"size", "mtime_ns", "hash"}} persisted next to the mirrored files
+    def __init__(self, root: str):
+        self.path = os.path.join(root, STATE_FILE)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r") as f:
+                self.entries: Dict[str, Dict[str, Any]] = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def current(self, name: str, st: os.stat_result) -> Optional[str]:
+        # Hash recorded for this exact local version of the file, if any
+        entry = self.entries.get(name)
+        if entry and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+            return entry.get("hash")
+        return None
+
+    def pending(self, name: str, st: os.stat_result) -> Optional[Header]:
+        # Header of an unfinished container upload of this exact local version
+        entry = self.entries.get(name)
+        if entry and entry.get("container") and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+            try:
+                return parse_header(bytes.fromhex(entry["container"]))
+            except (ContainerError, ValueError):
+                return None
+        return None
+
+    def begin(self, name: str, st: os.stat_result, header: Header) -> None:
+        with self._lock:
+            self.entries[name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "container": header.raw.hex()}
+        self.record([])
+
+    def record(self, items: Iterable[Tuple[str, os.stat_result, str]]) -> None:
+        with self._lock:
+            for name, st, digest in items:
+                self.entries[name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest}
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.entries, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+
+    def forget(self, names: Iterable[str]) -> None:
+        with self._lock:
+            for name in names:
+                self.entries.pop(name, None)
+        self.record([])
+
+
+def scan(root: str) -> Dict[str, Tuple[str, os.stat_result]]:
+    # vault name (posix relative path) -> (absolute path, stat)
+    found = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename in (STATE_FILE, STATE_FILE + ".tmp"):
+                continue
+            path = os.path.join(dirpath, filename)
+            name = os.path.relpath(path, root).replace(os.sep, "/")
+            found[name] = (path, os.stat(path))
+    return found
+
+
+def _batches(names: List[str], local: Dict[str, Tuple[str, os.stat_result]], limit: int) -> List[List[str]]:
+    batches, current, size = [], [], 0
+    for name in names:
+        file_size = local[name][1].st_size
+        if current and size + file_size > limit:
+            batches.append(current)
+            current, size = [], 0
+        current.append(name)
+        size += file_size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _record(vault: VaultClient, name: str, size: int, st: os.stat_result, cipher: str, iv: str,
+            analyze: bool) -> Dict[str, Any]:
+    file_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    record = {
+        "id": uuid.uuid4().hex[:9],
+        "ownerId": vault.user_id,
+        "name": name,
+        "size": size,
+        "type": file_type,
+        "uploadedAt": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(st.st_mtime)),
+        "isPublic": True,
+        "cipherContent": cipher,
+        "iv": iv,
+    }
+    if analyze:
+        record.update(vault.analyze(name, file_type))
+    return record
+
+
+def _encrypt(vault: VaultClient, name: str, path: str, st: os.stat_result, key: str, analyze: bool) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        data = f.read()
+    cipher, iv = encrypt_bytes(data, key)
+    return _record(vault, name, len(data), st, cipher, iv, analyze)
+
+
+def _push_container(vault: VaultClient, state: TransferState, name: str, path: str, st: os.stat_result, key: str,
+                    pool: ThreadPoolExecutor, analyze: bool) -> Dict[str, Any]:
+    header = state.pending(name, st)
+    if header is None:
+        header = new_header(st.st_size)
+        state.begin(name, st, header)
+    missing = vault.begin_container(header.raw)["missing"]
+
+    def send(number: int) -> None:
+        vault.put_segment(header.id, number, seal_segment(header, number, read_segment(path, header, number), key))
+
+    for future in [pool.submit(send, number) for number in missing]:
+        future.result()
+    record = _record(vault, name, header.size, st, base64.b64encode(header.raw).decode("ascii"), CONTAINER_IV, analyze)
+    vault.upload([record])
+    state.record([(name, st, content_hash(record["cipherContent"]))])
+    return record
+
+
+def push(vault: VaultClient, root: str, key: str, workers: int = 4, delete: bool = False,
+         analyze: bool = False, batch_bytes: int = BATCH_BYTES, progress: Progress = None) -> Dict[str, Any]:
+    state = TransferState(root)
+    local = scan(root)
+
+    manifest = []
+    for name, (_, st) in local.items():
+        entry = {"name": name, "size": st.st_size}
+        digest = state.current(name, st)
+        if digest:
+            entry["hash"] = digest
+        manifest.append(entry)
+
+    plan = vault.sync(manifest)
+    deleted: List[str] = []
+    if delete and plan.get("remote_only"):
+        deleted = plan["remote_only"]
+        vault.sync([], deleted=deleted)
+        if progress:
+            for name in deleted:
+                progress("deleted", name)
+
+    need = [name for name in plan.get("need", []) if name in local]
+    chunked = [name for name in need if local[name][1].st_size >= CHUNKED_BYTES]
+    need = [name for name in need if local[name][1].st_size < CHUNKED_BYTES]
+    report: Dict[str, Any] = {
+        "uploaded": [], "unchanged": len(plan.get("unchanged", [])), "deleted": deleted,
+        "stale": plan.get("stale", []), "failed": {}, "bytes": 0,
+    }
+    lock = threading.Lock()
+
+    def send(batch: List[str]) -> None:
+        records = [_encrypt(vault, name, local[name][0], local[name][1], key, analyze) for name in batch]
+        vault.upload(records)
+        state.record((r["name"], local[r["name"]][1], content_hash(r["cipherContent"])) for r in records)
+        with lock:
+            report["uploaded"].extend(batch)
+            report["bytes"] += sum(r["size"] for r in records)
+        if progress:
+            for name in batch:
+                progress("uploaded", name)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(send, batch): batch for batch in _batches(need, local, batch_bytes)}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except (VaultError, requests.RequestException, OSError) as e:
+                for name in futures[future]:
+                    report["failed"][name] = str(e)
+                    if progress:
+                        progress("failed", name)
+
+        # One container at a time, its segments spread over the same pool
+        for name in chunked:
+            try:
+                record = _push_container(vault, state, name, local[name][0], local[name][1], key, pool, analyze)
+            except (VaultError, requests.RequestException, OSError, ContainerError) as e:
+                report["failed"][name] = str(e)
+                if progress:
+                    progress("failed", name)
+                continue
+            report["uploaded"].append(name)
+            report["bytes"] += record["size"]
+            if progress:
+                progress("uploaded", name)
+
+    if deleted:
+        state.forget(deleted)
+    return report
+
+
+def _target(root: str, name: str) -> str:
+    # Refuse names that would escape the destination directory
+    path = os.path.normpath(os.path.join(root, name))
+    if os.path.commonpath([os.path.abspath(root), os.path.abspath(path)]) != os.path.abspath(root):
+        raise ValueError(f"Unsafe file name {name!r}")
+    return path
+
+
+def _pull_container(vault: Optional[VaultClient], f: Dict[str, Any], header: Header, tmp: str, key: str,
+                    workers: int) -> None:
+    if vault is None:
+        raise ValueError("chunked file needs a client to fetch its segments")
+    with open(tmp, "wb") as out:
+        out.truncate(header.size)
+
+    def fetch(number: int) -> None:
+        sealed = vault.get_segment(header.id, number, owner_id=f.get("ownerId"))
+        data = open_segment(header, number, sealed, key)
+        with open(tmp, "r+b") as out:
+            out.seek(number * header.segment_size)
+            out.write(data)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for future in [pool.submit(fetch, number) for number in range(header.segment_count)]:
+            future.result()
+
+
+def pull_files(files: List[Dict[str, Any]], root: str, key: str, workers: int = 4,
+               progress: Progress = None, vault: Optional[VaultClient] = None) -> Dict[str, Any]:
+    # vault is only needed to fetch the segments of chunked (CVC1) files
+    os.makedirs(root, exist_ok=True)
+    state = TransferState(root)
+    report: Dict[str, Any] = {"downloaded": [], "skipped": [], "failed": {}, "bytes": 0}
+    lock = threading.Lock()
+
+    def fetch(f: Dict[str, Any]) -> None:
+        name = f["name"]
+        path = _target(root, name)
+        digest = content_hash(f.get("cipherContent"))
+        if os.path.exists(path) and state.current(name, os.stat(path)) == digest:
+            with lock:
+                report["skipped"].append(name)
+            return
+
+        header = header_from_record(f)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".part"
+        if header:
+            _pull_container(vault, f, header, tmp, key, workers)
+            size = header.size
+        else:
+            data = decrypt_bytes(f["cipherContent"], f["iv"], key)
+            with open(tmp, "wb") as out:
+                out.write(data)
+            size = len(data)
+        os.replace(tmp, path)
+        state.record([(name, os.stat(path), digest)])
+        with lock:
+            report["downloaded"].append(name)
+            report["bytes"] += size
+        if progress:
+            progress("downloaded", name)
+
+    candidates = [f for f in files if f.get("name") and f.get("cipherContent") and f.get("iv")]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(fetch, f): f["name"] for f in candidates}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except InvalidTag:
+                report["failed"][futures[future]] = "decryption failed (wrong key?)"
+            except (ValueError, OSError, VaultError, requests.RequestException) as e:
+                report["failed"][futures[future]] = str(e)
+            else:
+                continue
+            if progress:
+                progress("failed", futures[future])
+    return report
+
+
+def pull(vault: VaultClient, root: str, key: str, workers: int = 4, progress: Progress = None) -> Dict[str, Any]:
+    return pull_files(vault.files(), root, key, workers=workers, progress=progress, vault=vault)
@@ -1,8 +1,43 @@
 import React, { useState, useEffect } from 'react';
 import { formatBytes, generateDynamicKey } from '../constants';
 import { groqService } from '../services/groqService';
-import { apiFetch } from '../services/api';
-import { encryptFile, decryptFile, bufferToBase64, base64ToBuffer } from '../services/encryption';
+import { apiFetch, segmentFetcher } from '../services/api';
+import {
+  encryptFile, decryptFile, bufferToBase64, base64ToBuffer, contentHash,
+  CONTAINER_IV, createContainerHeader, segmentSlice, sealSegment, decryptContainer, isContainer
+} from '../services/encryption';
+
+// Files at least this large are sent as a chunked container: segments upload
+// in parallel and an interrupted upload only resends the missing ones
+const CHUNKED_THRESHOLD = 8 * 1024 * 1024;
+const SEGMENT_WORKERS = 4;
+
+const uploadContainer = async (userId, file, key) => {
+  const header = createContainerHeader(file.size);
+  const beginRes = await apiFetch(`/api/containers/${userId}`, {
+    method: 'POST',
+    body: JSON.stringify({ header: bufferToBase64(header.raw) })
+  });
+  const state = await beginRes.json();
+  if (!beginRes.ok) throw new Error(state.error || 'Could not start upload');
+
+  const queue = [...state.missing];
+  const worker = async () => {
+    while (queue.length > 0) {
+      const index = queue.shift();
+      const plain = await segmentSlice(file, header, index).arrayBuffer();
+      const sealed = await sealSegment(header, index, plain, key);
+      const res = await apiFetch(`/api/containers/${userId}/${header.id}/segments/${index}`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/octet-stream' },
+        body: sealed
+      });
+      if (!res.ok) throw new Error((await res.json()).error || `Segment ${index} failed`);
+    }
+  };
+  await Promise.all(Array.from({ length: SEGMENT_WORKERS }, worker));
+  return { cipherContent: bufferToBase64(header.raw), iv: CONTAINER_IV };
+};
 
 export const HomeView = ({ user }) => {
   const [files, setFiles] = useState([]);
@@ -24,9 +59,36 @@ export const HomeView = ({ user }) => {
 
   const saveFiles = async (newFiles) => {
     setFiles(newFiles);
+
+    // Delta sync: send the manifest first, then only the files the server asks for
+    let needed = null;
+    try {
+      const manifest = await Promise.all(newFiles.map(async f => ({
+        name: f.name,
+        size: f.size,
+        hash: await contentHash(f.cipherContent),
+        // Compared like an upload would be, so a re-categorised file is still sent
+        type: f.type,
+        category: f.category,
+        riskLevel: f.riskLevel,
+        verdict: f.verdict
+      })));
+      const syncRes = await apiFetch(`/api/files/${user.id}/sync`, {
+        method: 'POST',
+        body: JSON.stringify({ manifest })
+      });
+      if (syncRes.ok) {
+        needed = new Set((await syncRes.json()).need);
+      }
+    } catch (err) {
+      console.error('Sync handshake failed, uploading everything:', err);
+    }
+
+    const toUpload = needed ? newFiles.filter(f => needed.has(f.name)) : newFiles;
+    if (toUpload.length === 0) return;
     await apiFetch(`/api/files/${user.id}`, {
       method: 'POST',
-      body: JSON.stringify(newFiles)
+      body: JSON.stringify(toUpload)
     });
   };
 
@@ -45,7 +107,13 @@ export const HomeView = ({ user }) => {
       const analysis = await groqService.analyzeFile(f.name, f.type);
 
       // 2. Encryption (on content)
-      const { cipherText, iv } = await encryptFile(f, currentKey);
+      let encrypted;
+      if (f.size >= CHUNKED_THRESHOLD) {
+        encrypted = await uploadContainer(user.id, f, currentKey);
+      } else {
+        const { cipherText, iv } = await encryptFile(f, currentKey);
+        encrypted = { cipherContent: bufferToBase64(cipherText), iv: bufferToBase64(iv) };
+      }
 
       const fileData = {
         id: Math.random().toString(36).substr(2, 9),
@@ -59,8 +127,7 @@ export const HomeView = ({ user }) => {
         category: analysis.category,
         riskLevel: analysis.riskLevel,
         verdict: analysis.verdict,
-        cipherContent: bufferToBase64(cipherText),
-        iv: bufferToBase64(iv)
+        ...encrypted
       };
       uploadedFiles.push(fileData);
     }
@@ -79,10 +146,15 @@ export const HomeView = ({ user }) => {
     const activeKey = generateDynamicKey(user.id);
 
     try {
-      const cipherBuffer = base64ToBuffer(file.cipherContent);
-      const ivBuffer = base64ToBuffer(file.iv);
-
-      const decryptedBlob = await decryptFile(cipherBuffer, ivBuffer, activeKey, file.type);
+      let decryptedBlob;
+      if (isContainer(file)) {
+        decryptedBlob = await decryptContainer(file.cipherContent, segmentFetcher(user.id, file.cipherContent),
+          activeKey, file.type);
+      } else {
+        const cipherBuffer = base64ToBuffer(file.cipherContent);
+        const ivBuffer = base64ToBuffer(file.iv);
+        decryptedBlob = await decryptFile(cipherBuffer, ivBuffer, activeKey, file.type);
+      }
       const url = window.URL.createObjectURL(decryptedBlob);
 
       const a = document.createElement('a');
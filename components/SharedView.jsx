@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { formatBytes } from '../constants';
-import { apiFetch } from '../services/api';
-import { decryptFile, base64ToBuffer } from '../services/encryption';
+import { apiFetch, segmentFetcher } from '../services/api';
+import { decryptFile, decryptContainer, isContainer, base64ToBuffer } from '../services/encryption';
 
 export const SharedView = ({ user }) => {
   const [targetKey, setTargetKey] = useState('');
@@ -94,10 +94,15 @@ export const SharedView = ({ user }) => {
 
     try {
       setIsDecrypting(file.id);
-      const cipherData = base64ToBuffer(file.cipherContent);
-      const ivData = base64ToBuffer(file.iv);
-
-      const decryptedBlob = await decryptFile(cipherData, ivData, targetKey.toUpperCase(), file.type);
+      let decryptedBlob;
+      if (isContainer(file)) {
+        decryptedBlob = await decryptContainer(file.cipherContent, segmentFetcher(file.ownerId, file.cipherContent),
+          targetKey.toUpperCase(), file.type);
+      } else {
+        const cipherData = base64ToBuffer(file.cipherContent);
+        const ivData = base64ToBuffer(file.iv);
+        decryptedBlob = await decryptFile(cipherData, ivData, targetKey.toUpperCase(), file.type);
+      }
 
       const downloadUrl = URL.createObjectURL(decryptedBlob);
       const link = document.createElement('a');
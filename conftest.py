@@ -0,0 +1,69 @@
+import os
+import json
+
+import pytest
+
+from supabase_standin import StandinClient
+
+# Shared fixture for tests that drive the Flask app. Supabase is a
+# supabase_standin client that can be taken "down", everything the server
+# writes to disk lives in tmp_path, and in-process state is rebuilt per test.
+
+os.environ.setdefault("CLOUDVAULT_WARMUP", "0")
+os.environ.setdefault("RETENTION_ENABLED", "0")
+os.environ.setdefault("LOG_CONSOLE", "0")
+os.environ.setdefault("LOG_FILE", "")
+
+
+class ServerEnv:
+    def __init__(self, server, client: StandinClient, db_path: str):
+        self.server = server
+        self.client = client
+        self.db_path = db_path
+        self.down = False
+        self.http = server.app.test_client()
+
+    def supabase(self) -> StandinClient:
+        if self.down:
+            raise ConnectionError("supabase is down")
+        return self.client
+
+    def local_db(self):
+        with open(self.db_path, "r") as f:
+            return json.load(f)
+
+
+@pytest.fixture
+def server_env(tmp_path, monkeypatch):
+    import clients
+    import rate_limit
+    import server
+    from repository import LocalBackend, Repository, SupabaseBackend
+    from search_index import SearchIndex
+    from segments import SegmentStore
+    from share_cache import shared_files_cache
+    from unread import UnreadCounter
+    from usage import UsageLedger, UsageTracker
+
+    db_path = str(tmp_path / "db.json")
+    with open(db_path, "w") as f:
+        json.dump({"users": {}, "files": {}}, f)
+
+    env = ServerEnv(server, StandinClient({"users": [], "files": [], "access_requests": [], "system_notifications": []}),
+                    db_path)
+    monkeypatch.setattr(server, "DB_FILE", db_path)
+    monkeypatch.setattr(server, "get_supabase", env.supabase)
+    monkeypatch.setattr(clients, "get_supabase", env.supabase)
+    monkeypatch.setattr(clients, "_schema", None)
+    monkeypatch.setattr(clients, "_schema_probed_at", 0.0)
+    monkeypatch.setattr(server, "repo", Repository(SupabaseBackend(env.supabase), LocalBackend(db_path)))
+    monkeypatch.setattr(server, "usage_ledger", UsageLedger(str(tmp_path / "usage_ledger")))
+    monkeypatch.setattr(server, "usage", UsageTracker(server.measure_usage, ledger=server.manifest_usage))
+    monkeypatch.setattr(server, "search_index", SearchIndex(server.load_search_documents))
+    monkeypatch.setattr(server, "unread_counts", UnreadCounter(server.count_unread_notifications))
+    monkeypatch.setattr(server, "segment_store", SegmentStore(str(tmp_path / "segments")))
+    limiter = rate_limit.RateLimiter(rate_limit.MemoryStore())
+    monkeypatch.setattr(rate_limit, "limiter", limiter)
+    monkeypatch.setattr(server, "limiter", limiter)
+    shared_files_cache.clear()
+    return env
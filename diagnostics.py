@@ -0,0 +1,381 @@
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import binascii
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from clients import PROBE_TABLES, is_missing
+from cloudvault_client.container import ContainerError, header_from_record
+from cloudvault_client.crypto import share_key
+from repository import LocalBackend, SupabaseBackend
+
+# One diagnostics command for the store (replaces the check_*.py,
+# diag_users.py and dump_keys.py scripts):
+#
+#   python diagnostics.py [--json] [--offline] [--db db.json] [--show-keys]
+#
+# Every Supabase round trip (table existence, row count, one per expected
+# column, and the full reads for the drift check) runs concurrently on one
+# pool, each timed, alongside the db.json checks. Sections:
+#   tables     - exists / rows / latency_ms per table, missing columns, and
+#                column_errors for probes that failed for another reason
+#                (timeouts, auth); exists is None when the table probe
+#                itself errored that way
+#   local_db   - size, parse time, record counts and integrity issues
+#   share_keys - keys recomputed for every user; collisions make one
+#                user's shared files resolve to another
+#   drift      - per collection, ids only in Supabase, only in db.json, or
+#                present in both with different values
+# --offline skips Supabase. Tests pass a supabase_standin client to run().
+# Exits 1 when a table or column is missing, db.json is broken or share
+# keys collide, and 2 when nothing is wrong but some probes errored (listed
+# under "errors"), since then the schema could not be fully checked.
+
+DIAG_WORKERS = int(os.environ.get("DIAG_WORKERS", 16))
+MAX_ISSUES = 50
+
+# Columns the API reads or writes, per table
+EXPECTED_COLUMNS = {
+    "users": ["email", "password", "username", "created_at", "session_salt"],
+    "files": ["owner_id", "name", "size", "type", "uploaded_at", "is_public", "category", "risk_level",
+              "verdict", "cipher_content", "iv"],
+    "access_requests": ["file_id", "owner_id", "requester_key", "status", "created_at"],
+    "system_notifications": ["user_id", "title", "message", "type", "is_read", "created_at"],
+    "access_logs": ["owner_id", "access_key"],
+}
+
+# Collection -> fields compared by the drift check (matched by id)
+DRIFT_FIELDS = {
+    "users": ["email", "session_salt"],
+    "files": ["owner_id", "name", "size", "iv"],
+    "access_requests": ["file_id", "status"],
+    "notifications": ["user_id", "is_read"],
+}
+
+
+def _timed(fn: Callable[[], Any]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        result = {"ok": True, "value": fn()}
+    except Exception as e:
+        result = {"ok": False, "error": str(e)}
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+def _text(value: Any) -> Any:
+    return None if value is None else str(value)
+
+
+# -- local db --
+def check_local_db(path: str) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"path": path, "exists": os.path.exists(path), "issues": []}
+    issues: List[str] = report["issues"]
+    if not report["exists"]:
+        issues.append("db.json is missing")
+        return report
+
+    report["bytes"] = os.path.getsize(path)
+    started = time.perf_counter()
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        issues.append(f"db.json does not parse: {e}")
+        return report
+    report["parse_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    if not isinstance(data, dict):
+        issues.append("db.json is not an object")
+        return report
+
+    users = data.get("users")
+    if not isinstance(users, dict):
+        issues.append("users is not an object keyed by email")
+        users = {}
+    user_ids = set()
+    for email, user in users.items():
+        if not isinstance(user, dict) or user.get("id") is None:
+            issues.append(f"user {email!r} has no id")
+            continue
+        if user.get("email") != email:
+            issues.append(f"user {email!r} is stored under a different email ({user.get('email')!r})")
+        if _text(user["id"]) in user_ids:
+            issues.append(f"duplicate user id {user['id']}")
+        user_ids.add(_text(user["id"]))
+
+    files = data.get("files")
+    if not isinstance(files, dict):
+        issues.append("files is not an object keyed by owner id")
+        files = {}
+    file_ids = set()
+    file_count = cipher_bytes = containers = 0
+    for owner_id, owned in files.items():
+        if owner_id not in user_ids:
+            issues.append(f"files stored for unknown user {owner_id}")
+        if not isinstance(owned, list):
+            issues.append(f"files of user {owner_id} is not a list")
+            continue
+        names = set()
+        for f in owned:
+            file_count += 1
+            label = f"file {f.get('id')!r} of user {owner_id}" if isinstance(f, dict) else f"file of user {owner_id}"
+            if not isinstance(f, dict) or not f.get("id") or not f.get("name"):
+                issues.append(f"{label} has no id or name")
+                continue
+            if f["name"] in names:
+                issues.append(f"{label} duplicates the name {f['name']!r}")
+            names.add(f["name"])
+            file_ids.add(_text(f["id"]))
+            if f.get("ownerId") is not None and _text(f["ownerId"]) != owner_id:
+                issues.append(f"{label} has ownerId {f['ownerId']}")
+            try:
+                header = header_from_record(f)
+                if header:
+                    containers += 1
+                    cipher_bytes += header.ciphertext_bytes
+                elif f.get("cipherContent"):
+                    cipher_bytes += len(base64.b64decode(f["cipherContent"], validate=True))
+            except (ContainerError, binascii.Error, ValueError) as e:
+                issues.append(f"{label} has unreadable ciphertext ({e})")
+
+    requests_ = data.get("access_requests", [])
+    for r in requests_ if isinstance(requests_, list) else []:
+        if isinstance(r, dict) and _text(r.get("file_id")) not in file_ids:
+            issues.append(f"access request {r.get('id')} points at missing file {r.get('file_id')}")
+    notifications = data.get("notifications", [])
+    for n in notifications if isinstance(notifications, list) else []:
+        if isinstance(n, dict) and _text(n.get("user_id")) not in user_ids:
+            issues.append(f"notification {n.get('id')} is for unknown user {n.get('user_id')}")
+
+    report["records"] = {
+        "users": len(users),
+        "files": file_count,
+        "containers": containers,
+        "access_requests": len(requests_) if isinstance(requests_, list) else 0,
+        "notifications": len(notifications) if isinstance(notifications, list) else 0,
+    }
+    report["ciphertext_bytes"] = cipher_bytes
+    if len(issues) > MAX_ISSUES:
+        report["issues_total"] = len(issues)
+        del issues[MAX_ISSUES:]
+    return report
+
+
+# -- share keys --
+def check_share_keys(users: List[Dict[str, Any]], show_keys: bool = False) -> Dict[str, Any]:
+    owners: Dict[str, List[Any]] = {}
+    seen = set()
+    legacy = []
+    for user in users:
+        user_id = user.get("id")
+        if user_id is None or _text(user_id) in seen:
+            continue
+        seen.add(_text(user_id))
+        if not user.get("session_salt"):
+            legacy.append(user_id)
+        owners.setdefault(share_key(user_id, user.get("session_salt")), []).append(user_id)
+
+    report = {
+        "users": len(seen),
+        "collisions": {key: ids for key, ids in owners.items() if len(ids) > 1},
+        # No session salt yet: these users still share with the legacy constant key
+        "legacy": legacy,
+    }
+    if show_keys:
+        report["keys"] = {_text(i): key for key, ids in owners.items() for i in ids}
+    return report
+
+
+# -- drift --
+def compare(collection: str, remote: List[Dict[str, Any]], local: List[Dict[str, Any]]) -> Dict[str, Any]:
+    fields = DRIFT_FIELDS[collection]
+    remote_by_id = {_text(r.get("id")): r for r in remote}
+    local_by_id = {_text(r.get("id")): r for r in local}
+    changed = {}
+    for row_id in remote_by_id.keys() & local_by_id.keys():
+        diff = [f for f in fields if _text(remote_by_id[row_id].get(f)) != _text(local_by_id[row_id].get(f))]
+        if diff:
+            changed[row_id] = diff
+    return {
+        "supabase": len(remote_by_id),
+        "local": len(local_by_id),
+        "only_supabase": sorted(remote_by_id.keys() - local_by_id.keys(), key=str)[:MAX_ISSUES],
+        "only_local": sorted(local_by_id.keys() - remote_by_id.keys(), key=str)[:MAX_ISSUES],
+        "changed": dict(sorted(changed.items())[:MAX_ISSUES]),
+        "in_sync": not changed and remote_by_id.keys() == local_by_id.keys(),
+    }
+
+
+# -- run --
+def run(client: Any = None, db_path: str = "db.json", show_keys: bool = False,
+        workers: int = DIAG_WORKERS) -> Dict[str, Any]:
+    # client: a supabase(-like) client, or None to skip every Supabase check
+    started = time.perf_counter()
+    local = LocalBackend(db_path)
+    remote = SupabaseBackend(lambda: client) if client is not None else None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        local_future = pool.submit(check_local_db, db_path)
+        local_rows = {c: pool.submit(_timed, lambda c=c: local.find(c, fields=["id"] + DRIFT_FIELDS[c]))
+                      for c in DRIFT_FIELDS}
+        exists, rows, columns, remote_rows = {}, {}, {}, {}
+        if remote is not None:
+            for table in PROBE_TABLES:
+                exists[table] = pool.submit(_timed, lambda t=table: client.table(t).select("id").limit(1).execute())
+                rows[table] = pool.submit(_timed, lambda t=table: client.table(t).select("id", count="exact").limit(1).execute().count)
+                for column in EXPECTED_COLUMNS.get(table, []):
+                    columns[table, column] = pool.submit(
+                        _timed, lambda t=table, c=column: client.table(t).select(c).limit(1).execute())
+            for collection in DRIFT_FIELDS:
+                remote_rows[collection] = pool.submit(
+                    _timed, lambda c=collection: remote.find(c, fields=["id"] + DRIFT_FIELDS[c]))
+
+        report: Dict[str, Any] = {"checked_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+        if remote is None:
+            report["tables"] = None
+        else:
+            tables = {}
+            for table in PROBE_TABLES:
+                probe, count = exists[table].result(), rows[table].result()
+                info: Dict[str, Any] = {"exists": probe["ok"], "latency_ms": probe["latency_ms"]}
+                if probe["ok"]:
+                    info["rows"] = count.get("value") if count["ok"] else None
+                    info["count_ms"] = count["latency_ms"]
+                    # Only a "does not exist" error means the column is missing
+                    failed = {c: columns[table, c].result().get("error") for c in EXPECTED_COLUMNS.get(table, [])
+                              if not columns[table, c].result()["ok"]}
+                    info["missing_columns"] = [c for c, error in failed.items() if is_missing(error, c)]
+                    info["column_errors"] = {c: error for c, error in failed.items() if not is_missing(error, c)}
+                else:
+                    info["error"] = probe["error"]
+                    if not is_missing(probe["error"], table):
+                        info["exists"] = None
+                tables[table] = info
+            report["tables"] = tables
+
+        report["local_db"] = local_future.result()
+        # An unreadable db.json is already reported by check_local_db
+        local_data = {c: f.result().get("value", []) for c, f in local_rows.items()}
+
+        users = list(local_data["users"])
+        drift: Optional[Dict[str, Any]] = None
+        if remote is not None:
+            drift = {}
+            for collection, future in remote_rows.items():
+                fetched = future.result()
+                if not fetched["ok"]:
+                    drift[collection] = {"error": fetched["error"]}
+                    continue
+                drift[collection] = compare(collection, fetched["value"], local_data[collection])
+                drift[collection]["latency_ms"] = fetched["latency_ms"]
+                if collection == "users":
+                    users = fetched["value"] + users
+        report["drift"] = drift
+    report["share_keys"] = check_share_keys(users, show_keys)
+
+    problems, errors = [], []
+    issues = report["local_db"].get("issues_total") or len(report["local_db"]["issues"])
+    if issues:
+        problems.append(f"db.json has {issues} integrity issue(s)")
+    for table, info in (report["tables"] or {}).items():
+        if info["exists"] is None:
+            errors.append(f"table {table} could not be checked: {info['error']}")
+        elif not info["exists"]:
+            problems.append(f"table {table} is missing")
+        else:
+            if info["missing_columns"]:
+                problems.append(f"{table} is missing {', '.join(info['missing_columns'])}")
+            errors += [f"{table}.{column} could not be checked: {error}" for column, error in info["column_errors"].items()]
+    if report["share_keys"]["collisions"]:
+        problems.append("share keys collide")
+    report["ok"] = not problems
+    report["problems"] = problems
+    report["errors"] = errors
+    report["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"CloudVault diagnostics ({report['checked_at']}, {report['duration_ms']} ms)", ""]
+
+    lines.append("Supabase tables:")
+    if report["tables"] is None:
+        lines.append("  skipped (offline)")
+    else:
+        for table, info in report["tables"].items():
+            if not info["exists"]:
+                status = "ERROR" if info["exists"] is None else "MISSING"
+                lines.append(f"  {table:<22} {status:<7}  {info['latency_ms']:>8} ms  {info['error']}")
+                continue
+            line = f"  {table:<22} {str(info['rows']) + ' rows':>10}  {info['latency_ms']:>8} ms"
+            if info["missing_columns"]:
+                line += f"  missing: {', '.join(info['missing_columns'])}"
+            if info["column_errors"]:
+                line += f"  unchecked: {', '.join(info['column_errors'])}"
+            lines.append(line)
+
+    db = report["local_db"]
+    lines += ["", f"Local db ({db['path']}):"]
+    if "records" in db:
+        counts = ", ".join(f"{v} {k}" for k, v in db["records"].items())
+        lines.append(f"  {db['bytes']} bytes, parsed in {db['parse_ms']} ms; {counts}")
+    lines += [f"  ! {issue}" for issue in db["issues"]] or ["  no integrity issues"]
+    if db.get("issues_total"):
+        lines.append(f"  ... {db['issues_total'] - len(db['issues'])} more")
+
+    keys = report["share_keys"]
+    lines += ["", f"Share keys: {keys['users']} users, {len(keys['legacy'])} without a session salt"]
+    for key, ids in keys["collisions"].items():
+        lines.append(f"  ! {key} is shared by users {', '.join(map(str, ids))}")
+    for user_id, key in (keys.get("keys") or {}).items():
+        lines.append(f"  {user_id}: {key}")
+
+    lines += ["", "Drift (Supabase vs db.json):"]
+    if report["drift"] is None:
+        lines.append("  skipped (offline)")
+    else:
+        for collection, info in report["drift"].items():
+            if "error" in info:
+                lines.append(f"  {collection:<16} error: {info['error']}")
+            elif info["in_sync"]:
+                lines.append(f"  {collection:<16} in sync ({info['supabase']} rows)")
+            else:
+                lines.append(f"  {collection:<16} {len(info['only_supabase'])} only in Supabase, "
+                             f"{len(info['only_local'])} only local, {len(info['changed'])} changed")
+
+    lines += [""]
+    if report["errors"]:
+        lines.append("ERRORS: " + "; ".join(report["errors"]))
+    lines.append("OK" if report["ok"] else "PROBLEMS: " + "; ".join(report["problems"]))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None, client: Any = None) -> int:
+    parser = argparse.ArgumentParser(prog="diagnostics.py", description="Check the CloudVault stores")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    parser.add_argument("--offline", action="store_true", help="skip Supabase, check db.json only")
+    parser.add_argument("--db", default="db.json", help="path of the local fallback store")
+    parser.add_argument("--show-keys", action="store_true", help="list every user's current share key")
+    parser.add_argument("--workers", type=int, default=DIAG_WORKERS)
+    args = parser.parse_args(argv)
+
+    if client is None and not args.offline:
+        from clients import get_supabase
+        try:
+            client = get_supabase()
+        except Exception as e:
+            print(f"Supabase client unavailable ({e}); running offline", file=sys.stderr)
+
+    report = run(client, db_path=args.db, show_keys=args.show_keys, workers=args.workers)
+    print(json.dumps(report, indent=2, default=str) if args.json else format_report(report))
+    if not report["ok"]:
+        return 1
+    return 2 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
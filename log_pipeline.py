@@ -0,0 +1,231 @@
+import os
+import copy
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from typing import Any, Dict, List, Optional
+
+from flask import Flask, g, has_request_context, request
+
+# Structured logging for the Flask API.
+# Request threads only format the record and drop it on a bounded queue; a
+# background QueueListener does the JSON encoding and the (buffered,
+# size-rotated) file I/O, so logging can never block or fail a request.
+# Buffered output is also flushed every LOG_FLUSH_INTERVAL seconds, so INFO
+# lines don't sit in the buffer while traffic is quiet.
+
+ROOT_LOGGER = "cloudvault"
+
+# Attributes every LogRecord carries; anything else was passed via `extra=`
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+_flusher: Optional["PeriodicFlusher"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for attr, value in record.__dict__.items():
+            if attr not in _STANDARD_ATTRS and not attr.startswith("_"):
+                payload[attr] = value
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    # Runs on the request thread (before the record is queued) so the Flask
+    # request context is still available.
+    def filter(self, record: logging.LogRecord) -> bool:
+        if has_request_context():
+            if not hasattr(record, "request_id"):
+                record.request_id = getattr(g, "request_id", None)
+            if not hasattr(record, "route"):
+                record.route = request.url_rule.rule if request.url_rule else request.path
+            if not hasattr(record, "method"):
+                record.method = request.method
+            view_args = request.view_args or {}
+            if "user_id" in view_args and not hasattr(record, "user_id"):
+                record.user_id = view_args["user_id"]
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    # A full queue means the writer thread is behind; drop the record rather
+    # than stalling the request that produced it.
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args and render exceptions now; the listener only sees plain data
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def handleError(self, record: logging.LogRecord) -> None:
+        self.dropped += 1
+
+
+class _QuietRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    def handleError(self, record: logging.LogRecord) -> None:
+        # Disk full / permission problems must not spam stderr on every record
+        pass
+
+
+class PeriodicFlusher:
+    # Flushes buffering handlers on a timer. MemoryHandler.flush takes the
+    # handler lock, so this is safe alongside the listener thread.
+    def __init__(self, handlers: List[logging.Handler], interval: float):
+        self.handlers = handlers
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cloudvault-log-flush", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            for handler in self.handlers:
+                try:
+                    handler.flush()
+                except Exception:
+                    pass
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def _settings() -> Dict[str, Any]:
+    # Read at setup time rather than import time so .env.local is honoured
+    return {
+        "level": os.environ.get("LOG_LEVEL", "INFO").upper(),
+        "file": os.environ.get("LOG_FILE", "cloudvault.log"),
+        "max_bytes": int(os.environ.get("LOG_MAX_BYTES", 5 * 1024 * 1024)),
+        "backup_count": int(os.environ.get("LOG_BACKUP_COUNT", 3)),
+        "buffer_records": int(os.environ.get("LOG_BUFFER_RECORDS", 64)),
+        "flush_interval": float(os.environ.get("LOG_FLUSH_INTERVAL", 2)),
+        "queue_size": int(os.environ.get("LOG_QUEUE_SIZE", 10000)),
+        "console": os.environ.get("LOG_CONSOLE", "1") != "0",
+    }
+
+
+def _build_output_handlers(settings: Dict[str, Any]) -> list:
+    formatter = JsonFormatter()
+    handlers = []
+
+    if settings["console"]:
+        console = logging.StreamHandler()
+        console.setFormatter(formatter)
+        handlers.append(console)
+
+    if settings["file"]:
+        try:
+            file_handler = _QuietRotatingFileHandler(
+                settings["file"], maxBytes=settings["max_bytes"], backupCount=settings["backup_count"], delay=True
+            )
+            file_handler.setFormatter(formatter)
+            # Batch writes; anything at WARNING or above is flushed immediately
+            handlers.append(logging.handlers.MemoryHandler(
+                settings["buffer_records"], flushLevel=logging.WARNING, target=file_handler
+            ))
+        except Exception:
+            pass
+
+    return handlers
+
+
+def get_logger(name: str = "") -> logging.Logger:
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}" if name else ROOT_LOGGER)
+
+
+def setup_logging(level: Optional[str] = None) -> logging.Logger:
+    global _listener, _queue_handler, _flusher
+
+    settings = _settings()
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(getattr(logging, (level or settings["level"]).upper(), logging.INFO))
+    if _listener is not None:
+        return root
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=settings["queue_size"])
+    _queue_handler = DroppingQueueHandler(log_queue)
+    _queue_handler.addFilter(RequestContextFilter())
+    root.addHandler(_queue_handler)
+    root.propagate = False
+
+    handlers = _build_output_handlers(settings)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    buffered = [h for h in handlers if isinstance(h, logging.handlers.MemoryHandler)]
+    if buffered and settings["flush_interval"] > 0:
+        _flusher = PeriodicFlusher(buffered, settings["flush_interval"])
+        _flusher.start()
+    atexit.register(shutdown_logging)
+    return root
+
+
+def shutdown_logging() -> None:
+    global _listener, _flusher
+    if _listener is None:
+        return
+    if _flusher is not None:
+        _flusher.stop()
+        _flusher = None
+    _listener.stop()
+    for handler in _listener.handlers:
+        try:
+            handler.flush()
+            handler.close()
+        except Exception:
+            pass
+    _listener = None
+
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+def init_app(app: Flask) -> None:
+    setup_logging()
+    access_log = get_logger("access")
+
+    @app.before_request
+    def _start_request_log():
+        g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16]
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _finish_request_log(response):
+        started = getattr(g, "request_started", None)
+        latency_ms = round((time.perf_counter() - started) * 1000, 2) if started else None
+        response.headers["X-Request-ID"] = getattr(g, "request_id", "")
+        access_log.info("request completed", extra={
+            "status": response.status_code,
+            "latency_ms": latency_ms,
+        })
+        return response
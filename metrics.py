@@ -0,0 +1,45 @@
+import threading
+from typing import Any, Callable, Dict
+
+# Process-local counters, timings and gauges, exposed by GET /api/metrics.
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_timings: Dict[str, Dict[str, float]] = {}
+_gauges: Dict[str, Callable[[], Any]] = {}
+
+
+def incr(name: str, amount: int = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def observe(name: str, value: float) -> None:
+    with _lock:
+        t = _timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+        t["count"] += 1
+        t["total"] += value
+        t["last"] = value
+        if value > t["max"]:
+            t["max"] = value
+
+
+def register_gauge(name: str, fn: Callable[[], Any]) -> None:
+    # fn is called on every snapshot; it must be cheap and must not raise
+    with _lock:
+        _gauges[name] = fn
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        counters = dict(_counters)
+        timings = {k: dict(v) for k, v in _timings.items()}
+        gauges = dict(_gauges)
+
+    values = {}
+    for name, fn in gauges.items():
+        try:
+            values[name] = fn()
+        except Exception as e:
+            values[name] = {"error": str(e)}
+    return {"counters": counters, "timings": timings, "gauges": values}
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import jsonify, request
+
+import metrics
+from log_pipeline import get_logger
+
+# Token-bucket throttling for share-key resolution and approval checks.
+#
+# Every limited request takes a token from the client's bucket and from a
+# global bucket for the same scope. Failed share-key lookups add a strike to
+# the client; past RATE_LIMIT_STRIKES the client is blocked for an
+# exponentially growing period. Keys that recently failed are remembered so
+# repeated guesses skip the users-table scan entirely.
+#
+# State lives in a pluggable store: in-process by default, or a SQLite file
+# (RATE_LIMIT_STORE=sqlite:/path/limits.db) shared by all workers on a host.
+# Every store call made on a request's behalf goes through fail_open, so a
+# locked or corrupt store is logged and counted but never fails the request.
+
+log = get_logger("rate_limit")
+
+# scope -> (per-client rate/s, per-client burst, global rate/s, global burst)
+LIMITS = {
+    "share": (
+        float(os.environ.get("SHARE_RATE", 0.5)), float(os.environ.get("SHARE_BURST", 20)),
+        float(os.environ.get("SHARE_GLOBAL_RATE", 20)), float(os.environ.get("SHARE_GLOBAL_BURST", 200)),
+    ),
+    "approval": (
+        float(os.environ.get("APPROVAL_RATE", 5)), float(os.environ.get("APPROVAL_BURST", 120)),
+        float(os.environ.get("APPROVAL_GLOBAL_RATE", 200)), float(os.environ.get("APPROVAL_GLOBAL_BURST", 2000)),
+    ),
+}
+
+RATE_LIMIT_STRIKES = int(os.environ.get("RATE_LIMIT_STRIKES", 5))
+RATE_LIMIT_STRIKE_WINDOW = float(os.environ.get("RATE_LIMIT_STRIKE_WINDOW", 600))
+RATE_LIMIT_BACKOFF_BASE = float(os.environ.get("RATE_LIMIT_BACKOFF_BASE", 30))
+RATE_LIMIT_BACKOFF_MAX = float(os.environ.get("RATE_LIMIT_BACKOFF_MAX", 3600))
+NEGATIVE_KEY_TTL = float(os.environ.get("NEGATIVE_KEY_TTL", 60))
+TRUST_PROXY_HOPS = int(os.environ.get("TRUST_PROXY_HOPS", 0))
+
+# Update functions receive the stored state (or None) and return
+# (new_state or None to delete, result)
+Updater = Callable[[Optional[Dict[str, Any]]], Tuple[Optional[Dict[str, Any]], Any]]
+
+
+class MemoryStore:
+    def __init__(self):
+        self._data: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._lock = threading.Lock()
+        self._ops = 0
+
+    def update(self, key: str, fn: Updater, ttl: float) -> Any:
+        now = time.time()
+        with self._lock:
+            current = self._data.get(key)
+            state = current[0] if current and current[1] > now else None
+            new_state, result = fn(state)
+            if new_state is None:
+                self._data.pop(key, None)
+            else:
+                self._data[key] = (new_state, now + ttl)
+            self._ops += 1
+            if self._ops % 1000 == 0:
+                self._purge(now)
+            return result
+
+    def clear(self, prefix: str = "") -> None:
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def _purge(self, now: float) -> None:
+        for key in [k for k, (_, expires) in self._data.items() if expires <= now]:
+            del self._data[key]
+
+
+class SqliteStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._ops = 0
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS limiter (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def update(self, key: str, fn: Updater, ttl: float) -> Any:
+        now = time.time()
+        conn = self._connect()
+        # IMMEDIATE takes the write lock up front so read-modify-write is atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value, expires FROM limiter WHERE key = ?", (key,)).fetchone()
+            state = json.loads(row[0]) if row and row[1] > now else None
+            new_state, result = fn(state)
+            if new_state is None:
+                conn.execute("DELETE FROM limiter WHERE key = ?", (key,))
+            else:
+                conn.execute("INSERT OR REPLACE INTO limiter (key, value, expires) VALUES (?, ?, ?)",
+                             (key, json.dumps(new_state), now + ttl))
+            self._ops += 1
+            if self._ops % 1000 == 0:
+                conn.execute("DELETE FROM limiter WHERE expires <= ?", (now,))
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self, prefix: str = "") -> None:
+        self._connect().execute("DELETE FROM limiter WHERE key LIKE ?", (prefix + "%",))
+
+
+def _take_token(rate: float, burst: float, now: float) -> Updater:
+    def fn(state):
+        tokens = burst if state is None else min(burst, state["tokens"] + (now - state["ts"]) * rate)
+        if tokens >= 1:
+            return {"tokens": tokens - 1, "ts": now}, (True, 0.0)
+        return {"tokens": tokens, "ts": now}, (False, (1 - tokens) / rate if rate > 0 else RATE_LIMIT_BACKOFF_MAX)
+    return fn
+
+
+class RateLimiter:
+    def __init__(self, store):
+        self.store = store
+
+    def check(self, scope: str, client: str) -> Tuple[bool, float, str]:
+        # Returns (allowed, retry_after_seconds, reason)
+        now = time.time()
+
+        blocked_until = self.store.update(f"block:{client}", lambda s: (s, s["until"] if s else 0.0), RATE_LIMIT_BACKOFF_MAX)
+        if blocked_until > now:
+            metrics.incr(f"ratelimit.{scope}.blocked")
+            return False, blocked_until - now, "backoff"
+
+        rate, burst, global_rate, global_burst = LIMITS[scope]
+        ttl = max(burst / rate if rate else 0, 60)
+        allowed, retry_after = self.store.update(f"bucket:{scope}:{client}", _take_token(rate, burst, now), ttl)
+        if not allowed:
+            metrics.incr(f"ratelimit.{scope}.limited_client")
+            return False, retry_after, "client"
+
+        global_ttl = max(global_burst / global_rate if global_rate else 0, 60)
+        allowed, retry_after = self.store.update(f"bucket:{scope}:*", _take_token(global_rate, global_burst, now), global_ttl)
+        if not allowed:
+            metrics.incr(f"ratelimit.{scope}.limited_global")
+            return False, retry_after, "global"
+
+        metrics.incr(f"ratelimit.{scope}.allowed")
+        return True, 0.0, ""
+
+    def record_failure(self, client: str) -> None:
+        now = time.time()
+
+        def strike(state):
+            if state is None or now - state["first"] > RATE_LIMIT_STRIKE_WINDOW:
+                state = {"first": now, "count": 0, "level": state["level"] if state else 0}
+            state["count"] += 1
+            block = None
+            if state["count"] >= RATE_LIMIT_STRIKES:
+                # Each block doubles the next one: base, 2*base, 4*base, ...
+                block = min(RATE_LIMIT_BACKOFF_BASE * (2 ** state["level"]), RATE_LIMIT_BACKOFF_MAX)
+                state = {"first": now, "count": 0, "level": state["level"] + 1}
+            return state, block
+
+        block = self.store.update(f"strikes:{client}", strike, RATE_LIMIT_BACKOFF_MAX * 2)
+        if block:
+            self.store.update(f"block:{client}", lambda s: ({"until": now + block}, None), block)
+            metrics.incr("ratelimit.backoffs")
+            log.warning("Client blocked after repeated failed share keys", extra={"client": client, "seconds": block})
+
+    def is_known_bad_key(self, share_key: str) -> bool:
+        hit = self.store.update(f"neg:{share_key}", lambda s: (s, s is not None), NEGATIVE_KEY_TTL)
+        if hit:
+            metrics.incr("ratelimit.negative_cache_hits")
+        return hit
+
+    def remember_bad_key(self, share_key: str) -> None:
+        self.store.update(f"neg:{share_key}", lambda s: ({"at": time.time()}, None), NEGATIVE_KEY_TTL)
+
+    def forget_bad_key(self, share_key: str) -> None:
+        # A login mints a new key that may have been guessed (and cached as bad) before
+        self.store.update(f"neg:{share_key}", lambda s: (None, None), NEGATIVE_KEY_TTL)
+
+
+def _build_store():
+    spec = os.environ.get("RATE_LIMIT_STORE", "memory")
+    if spec.startswith("sqlite:"):
+        try:
+            return SqliteStore(spec[len("sqlite:"):])
+        except Exception as e:
+            log.error("Could not open shared limiter store, using in-process state", extra={"error": str(e)})
+    return MemoryStore()
+
+
+limiter = RateLimiter(_build_store())
+
+
+def client_address() -> str:
+    if TRUST_PROXY_HOPS:
+        forwarded = [p.strip() for p in request.headers.get("X-Forwarded-For", "").split(",") if p.strip()]
+        if len(forwarded) >= TRUST_PROXY_HOPS:
+            return forwarded[-TRUST_PROXY_HOPS]
+    return request.remote_addr or "unknown"
+
+
+def fail_open(default: Any, fn: Callable[..., Any], *args: Any) -> Any:
+    # A broken limiter store must not take the endpoint down with it: the
+    # error is logged and counted and the caller carries on with `default`
+    try:
+        return fn(*args)
+    except Exception as e:
+        metrics.incr("rate_limit.store_errors")
+        log.error("Rate limiter unavailable, continuing", extra={"error": str(e), "call": getattr(fn, "__name__", "")})
+        return default
+
+
+def rate_limited(scope: str):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            allowed, retry_after, reason = fail_open((True, 0.0, None), limiter.check, scope, client_address())
+            if not allowed:
+                response = jsonify({"error": "Too many requests. Please slow down.", "reason": reason})
+                response.headers["Retry-After"] = str(max(1, int(retry_after + 0.999)))
+                return response, 429
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
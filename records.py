@@ -0,0 +1,141 @@
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+# Typed, slotted records for the four collections the API serves.
+#
+# Rows arrive either in Supabase's snake_case columns or, for files kept in
+# db.json, in the frontend's camelCase shape. from_row() resolves that once
+# at the storage boundary; after that code reads plain attributes.
+# Serializers are compiled to a single dict-literal function per output
+# shape, so producing JSON-ready dicts costs one call per record.
+#
+# Access requests and notifications are returned to the client as stored, so
+# they also keep any columns not in __slots__ (new columns, joined fields) in
+# `extra` and to_json emits them alongside the known ones.
+
+_MISSING = object()
+
+
+def _compile_serializer(name: str, pairs: Sequence[Tuple[str, str]], extra: bool = False) -> Callable[[Any], Dict[str, Any]]:
+    # pairs: (output key, attribute) -> def name(r): return {"key": r.attr, ...}
+    body = ", ".join(["**r.extra"] * extra + [f"{key!r}: r.{attr}" for key, attr in pairs])
+    namespace: Dict[str, Any] = {}
+    exec(f"def {name}(r):\n    return {{{body}}}\n", namespace)
+    return namespace[name]
+
+
+def _compile_loader(name: str, cls: type, sources: Sequence[Tuple[str, Sequence[str]]],
+                    extra: bool = False) -> Callable[[Dict[str, Any]], Any]:
+    # sources: (attribute, [row keys to try in order]); first non-empty value wins,
+    # matching the old `row.get("snake") or row.get("camel")` fallbacks.
+    # extra: also keep the row's other columns in r.extra
+    lines = [f"def {name}(row):", "    get = row.get", "    r = new(cls)"]
+    for attr, keys in sources:
+        expr = " or ".join(f"get({k!r})" for k in keys)
+        lines.append(f"    r.{attr} = {expr}")
+    if extra:
+        lines.append("    r.extra = {k: v for k, v in row.items() if k not in known}")
+    lines.append("    return r")
+    known = frozenset(k for _, keys in sources for k in keys)
+    namespace: Dict[str, Any] = {"new": object.__new__, "cls": cls, "known": known}
+    exec("\n".join(lines) + "\n", namespace)
+    return namespace[name]
+
+
+class UserRecord:
+    KEEP_EXTRA = False
+    __slots__ = ("id", "email", "username", "session_salt", "created_at")
+
+    SOURCES = [
+        ("id", ["id"]),
+        ("email", ["email"]),
+        ("username", ["username"]),
+        ("session_salt", ["session_salt"]),
+        ("created_at", ["created_at"]),
+    ]
+
+
+class FileRecord:
+    KEEP_EXTRA = False
+    __slots__ = ("id", "owner_id", "name", "size", "type", "url", "category", "risk_level",
+                 "verdict", "uploaded_at", "cipher_content", "iv")
+
+    SOURCES = [
+        ("id", ["id"]),
+        ("owner_id", ["owner_id", "ownerId"]),
+        ("name", ["name"]),
+        ("size", ["size"]),
+        ("type", ["type"]),
+        ("url", ["url"]),
+        ("category", ["category"]),
+        ("risk_level", ["risk_level", "riskLevel"]),
+        ("verdict", ["verdict"]),
+        ("uploaded_at", ["uploaded_at", "uploadedAt"]),
+        ("cipher_content", ["cipher_content", "cipherContent"]),
+        ("iv", ["iv"]),
+    ]
+
+    FRONTEND = [
+        ("id", "id"), ("name", "name"), ("size", "size"), ("type", "type"), ("url", "url"),
+        ("category", "category"), ("riskLevel", "risk_level"), ("verdict", "verdict"),
+        ("uploadedAt", "uploaded_at"), ("cipherContent", "cipher_content"), ("iv", "iv"),
+    ]
+
+    # Searchable/listable fields only; no ciphertext
+    METADATA = [
+        ("id", "id"), ("name", "name"), ("size", "size"), ("type", "type"), ("category", "category"),
+        ("riskLevel", "risk_level"), ("verdict", "verdict"), ("uploadedAt", "uploaded_at"),
+    ]
+
+    # Supabase columns written by save_user_files (uploaded_at is set by the DB)
+    DB_WRITE = [
+        ("owner_id", "owner_id"), ("name", "name"), ("size", "size"), ("type", "type"), ("url", "url"),
+        ("category", "category"), ("risk_level", "risk_level"), ("verdict", "verdict"),
+        ("cipher_content", "cipher_content"), ("iv", "iv"),
+    ]
+
+
+class AccessRequestRecord:
+    KEEP_EXTRA = True
+    __slots__ = ("id", "file_id", "owner_id", "requester_key", "status", "created_at", "files", "extra")
+
+    SOURCES = [
+        ("id", ["id"]),
+        ("file_id", ["file_id"]),
+        ("owner_id", ["owner_id"]),
+        ("requester_key", ["requester_key"]),
+        ("status", ["status"]),
+        ("created_at", ["created_at"]),
+        ("files", ["files"]),
+    ]
+
+
+class NotificationRecord:
+    KEEP_EXTRA = True
+    __slots__ = ("id", "user_id", "title", "message", "type", "is_read", "created_at", "extra")
+
+    SOURCES = [
+        ("id", ["id"]),
+        ("user_id", ["user_id"]),
+        ("title", ["title"]),
+        ("message", ["message"]),
+        ("type", ["type"]),
+        ("is_read", ["is_read"]),
+        ("created_at", ["created_at"]),
+    ]
+
+
+for _cls in (UserRecord, FileRecord, AccessRequestRecord, NotificationRecord):
+    _cls.from_row = staticmethod(_compile_loader(f"{_cls.__name__}_from_row", _cls, _cls.SOURCES, _cls.KEEP_EXTRA))
+    # Records served as-is use their own attribute names as JSON keys
+    _cls.to_json = _compile_serializer(f"{_cls.__name__}_to_json", [(a, a) for a in _cls.__slots__ if a != "extra"],
+                                       _cls.KEEP_EXTRA)
+
+FileRecord.to_frontend = _compile_serializer("file_to_frontend", FileRecord.FRONTEND)
+FileRecord.to_shared_frontend = _compile_serializer("file_to_shared_frontend", FileRecord.FRONTEND + [("ownerId", "owner_id")])
+FileRecord.to_db_row = _compile_serializer("file_to_db_row", FileRecord.DB_WRITE)
+FileRecord.to_metadata = _compile_serializer("file_to_metadata", FileRecord.METADATA)
+
+
+def load_records(cls: type, rows: List[Dict[str, Any]]) -> List[Any]:
+    from_row = cls.from_row
+    return [from_row(row) for row in rows]
@@ -0,0 +1,306 @@
+import os
+import re
+import heapq
+import json
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from log_pipeline import get_logger
+
+# One read API over both storage backends.
+#
+#   repo.find("access_requests", where={"owner_id": uid, "status": "pending"},
+#             order_by="created_at", desc=True, limit=20, fields=["id", "status"])
+#
+# where maps a column to a value (equality), a list/tuple/set (IN), or an
+# (op, value) pair with op in eq/neq/lt/lte/gt/gte/in. fields is a
+# projection; an entry like "files(name)" embeds the related row through
+# its <singular>_id column (PostgREST syntax, resolved locally by id).
+#
+# SupabaseBackend pushes everything into the PostgREST query builder.
+# LocalBackend executes against a parsed db.json snapshot that is reused
+# until the file changes on disk, narrowing candidates with lazily built
+# hash indexes on equality columns before applying the remaining filters.
+# Both return rows keyed by the Supabase column names.
+
+log = get_logger("repository")
+
+# Logical collection -> Supabase table
+TABLES = {
+    "users": "users",
+    "files": "files",
+    "access_requests": "access_requests",
+    "notifications": "system_notifications",
+    "access_logs": "access_logs",
+}
+
+# Local file records are stored in the frontend's camelCase shape
+FILE_ALIASES = {
+    "riskLevel": "risk_level",
+    "uploadedAt": "uploaded_at",
+    "cipherContent": "cipher_content",
+    "ownerId": "owner_id",
+}
+
+_EMBED = re.compile(r"^(\w+)\((.*)\)$")
+
+Where = Dict[str, Any]
+
+
+class QueryError(ValueError):
+    pass
+
+
+def _normalize_where(where: Optional[Where]) -> List[Tuple[str, str, Any]]:
+    clauses = []
+    for column, value in (where or {}).items():
+        if isinstance(value, tuple) and len(value) == 2 and isinstance(value[0], str):
+            op, operand = value
+        elif isinstance(value, (list, set, frozenset)):
+            op, operand = "in", list(value)
+        else:
+            op, operand = "eq", value
+        if op not in ("eq", "neq", "lt", "lte", "gt", "gte", "in"):
+            raise QueryError(f"Unsupported operator {op!r} on {column}")
+        clauses.append((column, op, operand))
+    return clauses
+
+
+def _split_fields(fields: Optional[Sequence[str]]) -> Tuple[Optional[List[str]], List[Tuple[str, List[str]]]]:
+    # -> (plain columns or None for all, [(related collection, columns)])
+    if not fields:
+        return None, []
+    plain, embeds = [], []
+    for field in fields:
+        match = _EMBED.match(field.strip())
+        if match:
+            embeds.append((match.group(1), [c.strip() for c in match.group(2).split(",") if c.strip()]))
+        else:
+            plain.append(field.strip())
+    return (None if "*" in plain else plain), embeds
+
+
+class SupabaseBackend:
+    name = "supabase"
+
+    def __init__(self, get_client: Callable[[], Any]):
+        self.get_client = get_client
+
+    def _apply(self, query, clauses):
+        for column, op, operand in clauses:
+            method = "in_" if op == "in" else op
+            query = getattr(query, method)(column, operand)
+        return query
+
+    def find(self, collection: str, where: Optional[Where] = None, order_by: Optional[str] = None,
+             desc: bool = False, limit: Optional[int] = None, fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        query = self.get_client().table(TABLES[collection]).select(", ".join(fields) if fields else "*")
+        query = self._apply(query, _normalize_where(where))
+        if order_by:
+            query = query.order(order_by, desc=desc)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.execute().data
+
+    def count(self, collection: str, where: Optional[Where] = None) -> int:
+        query = self.get_client().table(TABLES[collection]).select("id", count="exact")
+        res = self._apply(query, _normalize_where(where)).limit(1).execute()
+        return res.count or 0
+
+
+def _key(value: Any) -> Any:
+    # PostgREST compares the textual form; do the same so "1" matches 1
+    return None if value is None else str(value)
+
+
+class LocalBackend:
+    name = "local"
+
+    INDEXED = {
+        "users": ("id", "email"),
+        "files": ("owner_id", "id", "name"),
+        "access_requests": ("owner_id", "file_id", "requester_key", "status", "id"),
+        "notifications": ("user_id", "id", "is_read"),
+    }
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._rows: Dict[str, List[Dict[str, Any]]] = {}
+        self._indexes: Dict[Tuple[str, str], Dict[Any, List[Dict[str, Any]]]] = {}
+        self.reloads = 0
+
+    def _load(self) -> None:
+        try:
+            st = os.stat(self.path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = (0, 0)
+        if stamp == self._stamp:
+            return
+
+        data: Dict[str, Any] = {}
+        if stamp != (0, 0):
+            with open(self.path, "r") as f:
+                data = json.load(f)
+
+        rows: Dict[str, List[Dict[str, Any]]] = {}
+        users = data.get("users")
+        rows["users"] = [u for u in users.values() if isinstance(u, dict)] if isinstance(users, dict) else []
+
+        files = []
+        if isinstance(data.get("files"), dict):
+            for owner_id, owned in data["files"].items():
+                for f in owned if isinstance(owned, list) else []:
+                    if isinstance(f, dict):
+                        row = {FILE_ALIASES.get(k, k): v for k, v in f.items()}
+                        row["owner_id"] = owner_id
+                        files.append(row)
+        rows["files"] = files
+
+        for collection in ("access_requests", "notifications", "access_logs"):
+            value = data.get(collection)
+            rows[collection] = [r for r in value if isinstance(r, dict)] if isinstance(value, list) else []
+
+        self._rows = rows
+        self._indexes = {}
+        self._stamp = stamp
+        self.reloads += 1
+
+    def _index(self, collection: str, column: str) -> Dict[Any, List[Dict[str, Any]]]:
+        index = self._indexes.get((collection, column))
+        if index is None:
+            index = {}
+            for row in self._rows.get(collection, []):
+                index.setdefault(_key(row.get(column)), []).append(row)
+            self._indexes[(collection, column)] = index
+        return index
+
+    def _candidates(self, collection: str, clauses: List[Tuple[str, str, Any]]):
+        # Intersect-free plan: take the smallest posting list among indexed
+        # equality/IN clauses, then filter the rest in Python
+        best = None
+        for column, op, operand in clauses:
+            if op not in ("eq", "in") or column not in self.INDEXED.get(collection, ()):
+                continue
+            index = self._index(collection, column)
+            if op == "eq":
+                postings = index.get(_key(operand), [])
+            else:
+                postings = [row for value in {_key(v) for v in operand} for row in index.get(value, [])]
+            if best is None or len(postings) < len(best[1]):
+                best = ((column, op, operand), postings)
+        if best is None:
+            return self._rows.get(collection, []), clauses
+        return best[1], [c for c in clauses if c is not best[0]]
+
+    @staticmethod
+    def _matches(row: Dict[str, Any], clauses: Iterable[Tuple[str, str, Any]]) -> bool:
+        for column, op, operand in clauses:
+            value = row.get(column)
+            if op == "eq":
+                if _key(value) != _key(operand):
+                    return False
+            elif op == "neq":
+                if _key(value) == _key(operand):
+                    return False
+            elif op == "in":
+                if _key(value) not in {_key(v) for v in operand}:
+                    return False
+            else:
+                if value is None:
+                    return False
+                if op == "lt" and not value < operand:
+                    return False
+                if op == "lte" and not value <= operand:
+                    return False
+                if op == "gt" and not value > operand:
+                    return False
+                if op == "gte" and not value >= operand:
+                    return False
+        return True
+
+    def _embed(self, row: Dict[str, Any], related: str, columns: List[str]) -> Optional[Dict[str, Any]]:
+        fk = row.get(related[:-1] + "_id" if related.endswith("s") else related + "_id")
+        matches = self._index(related, "id").get(_key(fk), [])
+        if not matches:
+            return None
+        target = matches[0]
+        return dict(target) if not columns or "*" in columns else {c: target.get(c) for c in columns}
+
+    def find(self, collection: str, where: Optional[Where] = None, order_by: Optional[str] = None,
+             desc: bool = False, limit: Optional[int] = None, fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        if collection not in TABLES:
+            raise QueryError(f"Unknown collection {collection!r}")
+        clauses = _normalize_where(where)
+        plain, embeds = _split_fields(fields)
+
+        with self._lock:
+            self._load()
+            candidates, rest = self._candidates(collection, clauses)
+            matched = (row for row in candidates if self._matches(row, rest))
+
+            if order_by:
+                # NULLs sort last ascending and first descending, as in Postgres
+                sort_key = lambda r: (r.get(order_by) is None, r.get(order_by) if r.get(order_by) is not None else "")
+                if limit is not None:
+                    pick = heapq.nlargest if desc else heapq.nsmallest
+                    rows = pick(limit, matched, key=sort_key)
+                else:
+                    rows = sorted(matched, key=sort_key, reverse=desc)
+            else:
+                rows = list(matched)
+                if limit is not None:
+                    rows = rows[:limit]
+
+            # Copies, so callers can't mutate the cached snapshot
+            out = []
+            for row in rows:
+                projected = dict(row) if plain is None else {c: row.get(c) for c in plain}
+                for related, columns in embeds:
+                    projected[related] = self._embed(row, related, columns)
+                out.append(projected)
+            return out
+
+    def count(self, collection: str, where: Optional[Where] = None) -> int:
+        clauses = _normalize_where(where)
+        with self._lock:
+            self._load()
+            candidates, rest = self._candidates(collection, clauses)
+            return sum(1 for row in candidates if self._matches(row, rest))
+
+
+class Repository:
+    # Tries the primary backend and falls back to the secondary on error,
+    # the same policy every route used to hand-code
+    def __init__(self, primary, fallback=None):
+        self.primary = primary
+        self.fallback = fallback
+
+    def _run(self, method: str, collection: str, *args, **kwargs):
+        try:
+            return getattr(self.primary, method)(collection, *args, **kwargs)
+        except QueryError:
+            raise
+        except Exception as e:
+            if self.fallback is None:
+                raise
+            log.warning("Primary store query failed, using fallback", extra={
+                "collection": collection, "backend": self.primary.name, "error": str(e)
+            })
+            return getattr(self.fallback, method)(collection, *args, **kwargs)
+
+    def find(self, collection: str, where: Optional[Where] = None, order_by: Optional[str] = None,
+             desc: bool = False, limit: Optional[int] = None, fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        return self._run("find", collection, where=where, order_by=order_by, desc=desc, limit=limit, fields=fields)
+
+    def first(self, collection: str, where: Optional[Where] = None, **kwargs) -> Optional[Dict[str, Any]]:
+        rows = self.find(collection, where=where, limit=1, **kwargs)
+        return rows[0] if rows else None
+
+    def exists(self, collection: str, where: Optional[Where] = None) -> bool:
+        return self.first(collection, where=where, fields=["id"]) is not None
+
+    def count(self, collection: str, where: Optional[Where] = None) -> int:
+        return self._run("count", collection, where=where)
@@ -0,0 +1,207 @@
+import os
+import gzip
+import json
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+from log_pipeline import get_logger
+
+# TTL retention for the collections that only ever grow.
+#
+# A background sweeper periodically removes expired rows from Supabase (in
+# batches of RETENTION_BATCH_SIZE ids) and from the local db.json fallback,
+# optionally appending them to gzip'd JSONL archives first, then compacts
+# the local store. A Supabase batch that deletes nothing (e.g. row-level
+# security hiding rows from the delete) ends that policy's sweep instead of
+# fetching the same batch forever. Setting a policy's days to 0 disables it.
+#
+#   python retention.py        # run one sweep and print the report
+
+log = get_logger("retention")
+
+RETENTION_SWEEP_INTERVAL = float(os.environ.get("RETENTION_SWEEP_INTERVAL", 3600))
+RETENTION_BATCH_SIZE = int(os.environ.get("RETENTION_BATCH_SIZE", 500))
+RETENTION_ARCHIVE_DIR = os.environ.get("RETENTION_ARCHIVE_DIR", "")
+
+POLICIES: List[Dict[str, Any]] = [
+    {
+        "name": "read_notifications",
+        "table": "system_notifications",
+        "local": "notifications",
+        "days": float(os.environ.get("RETENTION_READ_NOTIFICATIONS_DAYS", 30)),
+        "filters": [("eq", "is_read", True)],
+        "match": lambda r: r.get("is_read") is True,
+    },
+    {
+        "name": "resolved_access_requests",
+        "table": "access_requests",
+        "local": "access_requests",
+        "days": float(os.environ.get("RETENTION_RESOLVED_REQUESTS_DAYS", 90)),
+        "filters": [("in_", "status", ["approved", "denied"])],
+        "match": lambda r: r.get("status") in ("approved", "denied"),
+    },
+    {
+        "name": "access_logs",
+        "table": "access_logs",
+        "local": None,
+        "days": float(os.environ.get("RETENTION_ACCESS_LOGS_DAYS", 30)),
+        "filters": [],
+        "match": lambda r: True,
+    },
+]
+
+COLLECTIONS = ["users", "files", "access_requests", "notifications"]
+
+
+def cutoff_for(days: float, now: Optional[float] = None) -> str:
+    # Same format the API writes created_at in, so local comparison is lexicographic
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime((now or time.time()) - days * 86400))
+
+
+def _archive(policy: Dict[str, Any], rows: List[Dict[str, Any]]) -> None:
+    if not RETENTION_ARCHIVE_DIR or not rows:
+        return
+    os.makedirs(RETENTION_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(RETENTION_ARCHIVE_DIR, f"{policy['name']}-{time.strftime('%Y%m%d', time.gmtime())}.jsonl.gz")
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, default=str) + "\n")
+
+
+def collection_sizes(local_db: Dict[str, Any]) -> Dict[str, int]:
+    sizes = {}
+    for name in COLLECTIONS:
+        value = local_db.get(name)
+        if name == "files" and isinstance(value, dict):
+            sizes[name] = sum(len(v) for v in value.values() if isinstance(v, list))
+        elif isinstance(value, (list, dict)):
+            sizes[name] = len(value)
+        else:
+            sizes[name] = 0
+    return sizes
+
+
+def compact_local_db(local_db: Dict[str, Any]) -> int:
+    # Drop empty per-user file lists. Manifests are left alone: a user's files
+    # may live only in Supabase, and the manifest also holds pending uploads
+    # and the usage ledger
+    removed = 0
+    files = local_db.get("files")
+    if isinstance(files, dict):
+        for user_id in [u for u, v in files.items() if not v]:
+            del files[user_id]
+            removed += 1
+    return removed
+
+
+class RetentionSweeper:
+    def __init__(self, get_supabase: Callable[[], Any], load_local_db: Callable[[], Dict[str, Any]],
+                 save_local_db: Callable[[Dict[str, Any]], None]):
+        self.get_supabase = get_supabase
+        self.load_local_db = load_local_db
+        self.save_local_db = save_local_db
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sweep_lock = threading.Lock()
+
+    def _sweep_supabase(self, policy: Dict[str, Any], cutoff: str) -> int:
+        removed = 0
+        while True:
+            query = self.get_supabase().table(policy["table"]).select("*").lt("created_at", cutoff)
+            for op, column, value in policy["filters"]:
+                query = getattr(query, op)(column, value)
+            rows = query.limit(RETENTION_BATCH_SIZE).execute().data
+            if not rows:
+                break
+            _archive(policy, rows)
+            deleted = self.get_supabase().table(policy["table"]).delete().in_("id", [r["id"] for r in rows]).execute().data
+            if not deleted:
+                log.warning("Retention delete removed nothing, stopping", extra={"policy": policy["name"], "batch": len(rows)})
+                break
+            removed += len(deleted)
+            if len(rows) < RETENTION_BATCH_SIZE:
+                break
+        return removed
+
+    def _sweep_local(self, local_db: Dict[str, Any], policy: Dict[str, Any], cutoff: str) -> int:
+        rows = local_db.get(policy["local"])
+        if not isinstance(rows, list):
+            return 0
+        keep, expired = [], []
+        for r in rows:
+            if isinstance(r, dict) and r.get("created_at", "") < cutoff and policy["match"](r):
+                expired.append(r)
+            else:
+                keep.append(r)
+        if expired:
+            _archive(policy, expired)
+            local_db[policy["local"]] = keep
+        return len(expired)
+
+    def sweep(self) -> Dict[str, Any]:
+        with self._sweep_lock:
+            started = time.perf_counter()
+            now = time.time()
+            report: Dict[str, Any] = {"policies": {}, "started_at": cutoff_for(0, now)}
+
+            policies = [p for p in POLICIES if p["days"] > 0]
+            for policy in policies:
+                cutoff = cutoff_for(policy["days"], now)
+                result: Dict[str, Any] = {"cutoff": cutoff, "supabase": 0, "local": 0}
+                try:
+                    result["supabase"] = self._sweep_supabase(policy, cutoff)
+                except Exception as e:
+                    result["supabase_error"] = str(e)
+                report["policies"][policy["name"]] = result
+
+            # db.json is loaded only after the network work and saved straight
+            # away, so a request writing it meanwhile isn't overwritten
+            local_db = self.load_local_db()
+            local_dirty = False
+            for policy in policies:
+                result = report["policies"][policy["name"]]
+                if policy["local"]:
+                    result["local"] = self._sweep_local(local_db, policy, result["cutoff"])
+                    local_dirty = local_dirty or result["local"] > 0
+                metrics.incr(f"retention.{policy['name']}.removed", result["supabase"] + result["local"])
+            compacted = compact_local_db(local_db)
+            if local_dirty or compacted:
+                self.save_local_db(local_db)
+            report["compacted"] = compacted
+            report["collection_sizes"] = collection_sizes(local_db)
+            report["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+            metrics.observe("retention.sweep_ms", report["duration_ms"])
+            self.last_report = report
+            log.info("Retention sweep finished", extra={
+                "duration_ms": report["duration_ms"],
+                "removed": {name: r["supabase"] + r["local"] for name, r in report["policies"].items()},
+                "collection_sizes": report["collection_sizes"],
+            })
+            return report
+
+    def start(self, interval: float = RETENTION_SWEEP_INTERVAL) -> None:
+        if self._thread is not None or interval <= 0:
+            return
+
+        def _run():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception:
+                    log.exception("Retention sweep failed")
+
+        self._thread = threading.Thread(target=_run, name="cloudvault-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    from server import retention_sweeper
+
+    print(json.dumps(retention_sweeper.sweep(), indent=2))
@@ -0,0 +1,308 @@
+import os
+import re
+import time
+import heapq
+import bisect
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import metrics
+
+# Per-user inverted index over file metadata for GET /api/files/<id>/search.
+#
+# A user's index is built from the store on their first search (metadata
+# only, never ciphertext) and then kept current by save_user_files,
+# delete_file and sync deletions, which upsert/remove documents by name.
+# It holds:
+#   postings - name token -> file names, plus a sorted token list so a
+#              prefix is a bisect and a short scan
+#   facets   - category / riskLevel / type (lowercased) -> file names
+# Size and upload-date ranges are applied to the narrowed candidate set.
+#
+# Ranking: every query token must match a name token, exactly (2 points)
+# or as a prefix (1 point); names starting with the full query get a
+# bonus. Ties go to the most recently uploaded file.
+#
+# Indexes are kept LRU, capped by user count and by the documents held
+# across all users. A build runs outside the lock, so writes for that user
+# while it is in flight bump a generation and the build is redone instead
+# of caching an index that misses them.
+
+SEARCH_INDEX_TTL = float(os.environ.get("SEARCH_INDEX_TTL", 3600))
+SEARCH_INDEX_MAX_USERS = int(os.environ.get("SEARCH_INDEX_MAX_USERS", 512))
+SEARCH_INDEX_MAX_DOCS = int(os.environ.get("SEARCH_INDEX_MAX_DOCS", 500000))
+SEARCH_BUILD_ATTEMPTS = 3
+SEARCH_MAX_PER_PAGE = 100
+
+FACETS = ("category", "riskLevel", "type")
+SORTS = ("relevance", "name", "size", "uploadedAt")
+
+_TOKEN = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall((text or "").lower())
+
+
+class _UserIndex:
+    __slots__ = ("docs", "phrases", "postings", "tokens", "facets", "expires")
+
+    def __init__(self, ttl: float):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.phrases: Dict[str, str] = {}
+        self.postings: Dict[str, Set[str]] = {}
+        self.tokens: List[str] = []
+        self.facets: Dict[str, Dict[str, Set[str]]] = {f: {} for f in FACETS}
+        self.expires = time.monotonic() + ttl
+
+    def add(self, doc: Dict[str, Any]) -> None:
+        name = doc["name"]
+        if name in self.docs:
+            self.remove(name)
+        self.docs[name] = doc
+        tokens = tokenize(name)
+        self.phrases[name] = " ".join(tokens)
+        for token in set(tokens):
+            names = self.postings.get(token)
+            if names is None:
+                names = self.postings[token] = set()
+                bisect.insort(self.tokens, token)
+            names.add(name)
+        for facet in FACETS:
+            value = doc.get(facet)
+            if value:
+                self.facets[facet].setdefault(str(value).lower(), set()).add(name)
+
+    def remove(self, name: str) -> None:
+        doc = self.docs.pop(name, None)
+        if doc is None:
+            return
+        del self.phrases[name]
+        for token in set(tokenize(name)):
+            names = self.postings.get(token)
+            if names is None:
+                continue
+            names.discard(name)
+            if not names:
+                del self.postings[token]
+                del self.tokens[bisect.bisect_left(self.tokens, token)]
+        for facet in FACETS:
+            value = doc.get(facet)
+            if value:
+                names = self.facets[facet].get(str(value).lower())
+                if names is not None:
+                    names.discard(name)
+                    if not names:
+                        del self.facets[facet][str(value).lower()]
+
+    def match_token(self, token: str) -> Dict[str, int]:
+        # file name -> score for one query token (exact beats prefix)
+        scores: Dict[str, int] = {}
+        start = bisect.bisect_left(self.tokens, token)
+        for i in range(start, len(self.tokens)):
+            candidate = self.tokens[i]
+            if not candidate.startswith(token):
+                break
+            points = 2 if candidate == token else 1
+            for name in self.postings[candidate]:
+                if scores.get(name, 0) < points:
+                    scores[name] = points
+        return scores
+
+
+class SearchIndex:
+    def __init__(self, loader: Callable[[Any], List[Dict[str, Any]]], ttl: float = SEARCH_INDEX_TTL,
+                 max_users: int = SEARCH_INDEX_MAX_USERS, max_docs: int = SEARCH_INDEX_MAX_DOCS):
+        # loader(user_id) -> frontend-shaped metadata dicts (no cipherContent)
+        self.loader = loader
+        self.ttl = ttl
+        self.max_users = max_users
+        self.max_docs = max_docs
+        self._users: "OrderedDict[str, _UserIndex]" = OrderedDict()
+        self._docs = 0
+        # user -> [builds in flight, generation]; only held while a build runs
+        self._generations: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.evictions = 0
+
+    def _index(self, user_id: Any) -> _UserIndex:
+        key = str(user_id)
+        for _ in range(SEARCH_BUILD_ATTEMPTS):
+            with self._lock:
+                index = self._users.get(key)
+                if index and index.expires > time.monotonic():
+                    self._users.move_to_end(key)
+                    return index
+                tracked = self._generations.setdefault(key, [0, 0])
+                tracked[0] += 1
+                generation = tracked[1]
+
+            started = time.monotonic()
+            index = _UserIndex(self.ttl)
+            try:
+                for doc in self.loader(user_id):
+                    if doc.get("name"):
+                        index.add(doc)
+            except Exception:
+                with self._lock:
+                    self._release(key, tracked)
+                raise
+            with self._lock:
+                self._release(key, tracked)
+                raced = tracked[1] != generation
+                if not raced:
+                    self._store(key, index)
+                    self.builds += 1
+            metrics.observe("search.build_ms", (time.monotonic() - started) * 1000)
+            if not raced:
+                return index
+            metrics.incr("search.build_raced")
+        # Still racing writes: answer from the last build without caching it
+        return index
+
+    def _release(self, key: str, tracked: List[int]) -> None:
+        # Caller holds the lock
+        tracked[0] -= 1
+        if not tracked[0]:
+            del self._generations[key]
+
+    def _store(self, key: str, index: _UserIndex) -> None:
+        # Caller holds the lock
+        old = self._users.pop(key, None)
+        if old is not None:
+            self._docs -= len(old.docs)
+        self._users[key] = index
+        self._docs += len(index.docs)
+        self._evict(keep=key)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        # Caller holds the lock; least recently searched first, never `keep`
+        while len(self._users) > self.max_users or (self._docs > self.max_docs and len(self._users) > 1):
+            oldest = next(iter(self._users))
+            if oldest == keep:
+                self._users.move_to_end(oldest)
+                oldest = next(iter(self._users))
+            self._docs -= len(self._users.pop(oldest).docs)
+            self.evictions += 1
+            metrics.incr("search.evictions")
+
+    def _changed(self, key: str) -> None:
+        # Caller holds the lock; makes an in-flight build for this user start over
+        tracked = self._generations.get(key)
+        if tracked is not None:
+            tracked[1] += 1
+
+    def upsert(self, user_id: Any, docs: Iterable[Dict[str, Any]]) -> None:
+        # Users without a built index are left alone; their first search loads the store
+        key = str(user_id)
+        with self._lock:
+            self._changed(key)
+            index = self._users.get(key)
+            if index is None:
+                return
+            before = len(index.docs)
+            for doc in docs:
+                if doc.get("name"):
+                    index.add(doc)
+            self._docs += len(index.docs) - before
+            self._evict(keep=key)
+
+    def remove(self, user_id: Any, names: Iterable[str]) -> None:
+        key = str(user_id)
+        with self._lock:
+            self._changed(key)
+            index = self._users.get(key)
+            if index is None:
+                return
+            before = len(index.docs)
+            for name in names:
+                index.remove(name)
+            self._docs += len(index.docs) - before
+
+    def invalidate(self, user_id: Any) -> None:
+        key = str(user_id)
+        with self._lock:
+            self._changed(key)
+            index = self._users.pop(key, None)
+            if index is not None:
+                self._docs -= len(index.docs)
+
+    def size(self) -> int:
+        return len(self._users)
+
+    def search(self, user_id: Any, q: str = "", filters: Optional[Dict[str, str]] = None,
+               size_range: Tuple[Optional[int], Optional[int]] = (None, None),
+               date_range: Tuple[Optional[str], Optional[str]] = (None, None),
+               sort: str = "relevance", page: int = 1, per_page: int = 20) -> Dict[str, Any]:
+        started = time.monotonic()
+        index = self._index(user_id)
+        query_tokens = tokenize(q)
+        per_page = max(1, min(per_page, SEARCH_MAX_PER_PAGE))
+        page = max(1, page)
+
+        with self._lock:
+            # Narrow with the smallest sets first; None means "everything"
+            candidates: Optional[Set[str]] = None
+            scores: Dict[str, int] = {}
+            for facet, value in (filters or {}).items():
+                names = index.facets[facet].get(str(value).lower(), set())
+                candidates = set(names) if candidates is None else candidates & names
+            for token in query_tokens:
+                matched = index.match_token(token)
+                candidates = set(matched) if candidates is None else candidates & matched.keys()
+                for name in candidates:
+                    scores[name] = scores.get(name, 0) + matched[name]
+            if candidates is None:
+                candidates = set(index.docs)
+
+            low, high = size_range
+            since, until = date_range
+            docs = index.docs
+            if low is None and high is None and not since and not until:
+                hits = [docs[name] for name in candidates]
+            else:
+                hits = []
+                for name in candidates:
+                    doc = docs[name]
+                    if low is not None or high is not None:
+                        size = doc.get("size")
+                        if not isinstance(size, (int, float)):
+                            continue
+                        if (low is not None and size < low) or (high is not None and size > high):
+                            continue
+                    if since or until:
+                        uploaded = doc.get("uploadedAt")
+                        if not uploaded or (since and uploaded < since) or (until and uploaded > until):
+                            continue
+                    hits.append(doc)
+
+            # Rank on plain tuples and order only the requested page's prefix
+            # (heap select, not a full sort)
+            total = len(hits)
+            offset = (page - 1) * per_page
+            wanted = offset + per_page
+            if sort == "relevance":
+                phrase = " ".join(query_tokens)
+                phrases, score_of = index.phrases, scores.get
+                ranked = [(score_of(d["name"], 0) + (phrase != "" and phrases[d["name"]].startswith(phrase)),
+                           d.get("uploadedAt") or "", d["name"]) for d in hits]
+                top = [docs[name] for _, _, name in heapq.nlargest(wanted, ranked)]
+            elif sort == "name":
+                top = [docs[name] for _, name in heapq.nsmallest(wanted, [(d["name"].lower(), d["name"]) for d in hits])]
+            else:
+                # NULLs last, as the repository orders
+                ranked = [(d.get(sort) is None, d.get(sort) if d.get(sort) is not None else 0, d["name"]) for d in hits]
+                top = [docs[name] for _, _, name in heapq.nsmallest(wanted, ranked)]
+            results = [dict(d) for d in top[offset:]]
+
+        took_ms = round((time.monotonic() - started) * 1000, 2)
+        metrics.observe("search.query_ms", took_ms)
+        return {
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "results": results,
+            "took_ms": took_ms,
+        }
@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from cloudvault_client.container import ContainerError, Header, parse_header
+from log_pipeline import get_logger
+
+# Segment storage for CVC1 chunked containers (format in
+# cloudvault_client/container.py).
+#
+# Each container lives in SEGMENT_DIR/<user_id>/<container_id>/ as its
+# header, one file per sealed segment and an index.json recording each
+# stored segment's length and sha256. Segments are written atomically and
+# can arrive in any order or in parallel; begin() on an existing container
+# reports which are still missing, so a resumed upload only resends those.
+# Presence is read from the segment files themselves, so uploads split
+# across worker processes are still counted correctly.
+#
+# A container is pending until a saved file record claims it. Pending
+# containers aren't in the user's usage yet, so begin() hands what they
+# reserve to the caller's quota check before registering another one, and
+# ones never claimed are pruned after SEGMENT_UPLOAD_TTL seconds.
+
+log = get_logger("segments")
+
+SEGMENT_DIR = os.environ.get("SEGMENT_DIR", "segments")
+SEGMENT_UPLOAD_TTL = float(os.environ.get("SEGMENT_UPLOAD_TTL", 24 * 3600))
+
+
+class SegmentError(ValueError):
+    pass
+
+
+def _safe(part: Any) -> str:
+    text = str(part)
+    if not text or text in (".", "..") or not all(c.isalnum() or c in "-_" for c in text):
+        raise SegmentError(f"Invalid path component {text!r}")
+    return text
+
+
+class SegmentStore:
+    def __init__(self, root: str = SEGMENT_DIR, upload_ttl: float = SEGMENT_UPLOAD_TTL):
+        self.root = root
+        self.upload_ttl = upload_ttl
+        self._lock = threading.Lock()
+
+    def _dir(self, user_id: Any, container_id: str) -> str:
+        return os.path.join(self.root, _safe(user_id), _safe(container_id))
+
+    def _read_index(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(path, "index.json"), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_index(self, path: str, index: Dict[str, Any]) -> None:
+        tmp = os.path.join(path, "index.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp, os.path.join(path, "index.json"))
+
+    def header(self, user_id: Any, container_id: str) -> Header:
+        try:
+            with open(os.path.join(self._dir(user_id, container_id), "header"), "rb") as f:
+                return parse_header(f.read())
+        except OSError:
+            raise KeyError(container_id)
+
+    def begin(self, user_id: Any, header: Header,
+              admit: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        # Register a container (idempotent for the same header) and report its state.
+        # For a new container, admit(containers, bytes) is first called with
+        # what this user already has pending and may raise to refuse it.
+        self.prune(user_id)
+        path = self._dir(user_id, header.id)
+        with self._lock:
+            index = self._read_index(path)
+            if index is not None:
+                if index["header"] != header.raw.hex():
+                    raise SegmentError("A different container with this id already exists")
+            else:
+                if admit is not None:
+                    admit(*self.pending(user_id))
+                os.makedirs(path, exist_ok=True)
+                with open(os.path.join(path, "header"), "wb") as f:
+                    f.write(header.raw)
+                index = {"header": header.raw.hex(), "created": time.time(), "segments": {}, "claimed": False}
+                self._write_index(path, index)
+        return self._status(header, path, index)
+
+    def claim(self, user_id: Any, container_id: str) -> None:
+        # A file record now lists this container; it counts in usage from here on
+        path = self._dir(user_id, container_id)
+        with self._lock:
+            index = self._read_index(path)
+            if index is None:
+                raise KeyError(container_id)
+            if not index.get("claimed", True):
+                index["claimed"] = True
+                self._write_index(path, index)
+
+    def _containers(self, user_id: Any) -> Iterator[Tuple[str, Header, Dict[str, Any]]]:
+        user_dir = os.path.join(self.root, _safe(user_id))
+        if not os.path.isdir(user_dir):
+            return
+        for container_id in os.listdir(user_dir):
+            path = os.path.join(user_dir, container_id)
+            index = self._read_index(path)
+            if index is None:
+                continue
+            try:
+                header = parse_header(bytes.fromhex(index["header"]))
+            except (ContainerError, ValueError):
+                continue
+            yield path, header, index
+
+    def _unclaimed(self, header: Header, path: str, index: Dict[str, Any]) -> bool:
+        # Containers registered before claims were recorded are pending until complete
+        if "claimed" in index:
+            return not index["claimed"]
+        return not self._status(header, path, index)["complete"]
+
+    def pending(self, user_id: Any) -> Tuple[int, int]:
+        # (containers, ciphertext bytes) registered but not yet claimed by a file record
+        count = size = 0
+        for path, header, index in self._containers(user_id):
+            if self._unclaimed(header, path, index):
+                count += 1
+                size += header.ciphertext_bytes
+        return count, size
+
+    def put(self, user_id: Any, container_id: str, number: int, data: bytes) -> Dict[str, Any]:
+        header = self.header(user_id, container_id)
+        if not 0 <= number < header.segment_count:
+            raise SegmentError(f"Segment {number} out of range (0-{header.segment_count - 1})")
+        if len(data) != header.segment_bytes(number):
+            raise SegmentError(f"Segment {number} must be {header.segment_bytes(number)} bytes, got {len(data)}")
+
+        path = self._dir(user_id, container_id)
+        tmp = os.path.join(path, f"{number}.seg.{threading.get_ident()}")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, os.path.join(path, f"{number}.seg"))
+        with self._lock:
+            index = self._read_index(path)
+            index["segments"][str(number)] = {"bytes": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+            self._write_index(path, index)
+        return self._status(header, path, index)
+
+    def get(self, user_id: Any, container_id: str, number: int) -> bytes:
+        try:
+            with open(os.path.join(self._dir(user_id, container_id), f"{int(number)}.seg"), "rb") as f:
+                return f.read()
+        except OSError:
+            raise KeyError(number)
+
+    def status(self, user_id: Any, container_id: str) -> Dict[str, Any]:
+        header = self.header(user_id, container_id)
+        path = self._dir(user_id, container_id)
+        return self._status(header, path, self._read_index(path) or {"segments": {}})
+
+    def _status(self, header: Header, path: str, index: Dict[str, Any]) -> Dict[str, Any]:
+        present = sorted(int(name[:-4]) for name in os.listdir(path) if name.endswith(".seg") and name[:-4].isdigit())
+        # The gaps between stored segments (segment_count is bounded by MAX_SEGMENTS)
+        missing, expected = [], 0
+        for number in present:
+            missing.extend(range(expected, number))
+            expected = number + 1
+        missing.extend(range(expected, header.segment_count))
+        return {
+            "id": header.id,
+            "size": header.size,
+            "segment_size": header.segment_size,
+            "segment_count": header.segment_count,
+            "present": present,
+            "missing": missing,
+            "complete": not missing,
+            "segments": index["segments"],
+        }
+
+    def stream(self, user_id: Any, container_id: str) -> Iterator[bytes]:
+        # Header then every segment in order, read one at a time
+        header = self.header(user_id, container_id)
+        yield header.raw
+        for number in range(header.segment_count):
+            yield self.get(user_id, container_id, number)
+
+    def delete(self, user_id: Any, container_id: str) -> bool:
+        path = self._dir(user_id, container_id)
+        if not os.path.isdir(path):
+            return False
+        shutil.rmtree(path, ignore_errors=True)
+        return True
+
+    def prune(self, user_id: Any) -> int:
+        # Drop this user's containers that no file record claimed in time
+        if self.upload_ttl <= 0:
+            return 0
+        removed = 0
+        cutoff = time.time() - self.upload_ttl
+        for path, header, index in list(self._containers(user_id)):
+            if index.get("created", 0) < cutoff and self._unclaimed(header, path, index):
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        if removed:
+            log.info("Pruned abandoned container uploads", extra={"user_id": user_id, "removed": removed})
+        return removed
@@ -1,24 +1,44 @@
 import os
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from groq import Groq
-from dotenv import load_dotenv
 import json
 import time
-from typing import Dict, Any, List, Optional
-from supabase import create_client, Client
+import base64
+from typing import Dict, Any, List, Optional, Tuple
+from log_pipeline import get_logger, init_app as init_logging
+from clients import load_env, get_supabase, get_groq, probe_schema, has_column, is_missing, mark_column, warm_up
+import transport
+from transport import FrameError, wants_frames, frames_response, read_files_payload
+from sync import (ManifestError, build_entry, build_manifest, diff_manifest, get_manifest, is_unchanged,
+                  read_client_manifest, set_manifest)
+from share_cache import shared_files_cache
+import metrics
+from rate_limit import limiter, rate_limited, client_address, fail_open
+from log_pipeline import dropped_records
+from unread import UnreadCounter
+from retention import RetentionSweeper
+from repository import Repository, SupabaseBackend, LocalBackend
+from records import AccessRequestRecord, FileRecord, NotificationRecord, load_records
+from usage import QuotaExceeded, UsageLedger, UsageTracker, manifest_delta, manifest_totals, record_bytes
+from search_index import FACETS, SORTS, SearchIndex
+from cloudvault_client.container import CONTAINER_IV, ContainerError, header_from_record, parse_header
+from segments import SegmentError, SegmentStore
 
-load_dotenv(dotenv_path=".env.local")
+load_env()
 
 app = Flask(__name__)
 CORS(app)
+init_logging(app)
+transport.init_app(app)
+log = get_logger("server")
 
-# Supabase Configuration
-url: str = os.environ.get("SUPABASE_URL", "")
-key: str = os.environ.get("SUPABASE_KEY", "")
-supabase: Client = create_client(url, key)
+# Supabase/Groq clients are built on first use (see clients.py); the schema
+# probe runs in the background so startup doesn't wait on the network
+if os.environ.get("CLOUDVAULT_WARMUP", "1") != "0":
+    warm_up()
 
-client = Groq(api_key=os.environ.get("VITE_GROQ_API_KEY"))
+metrics.register_gauge("share_cache", shared_files_cache.snapshot)
+metrics.register_gauge("log_records_dropped", dropped_records)
 
 # Local DB Fallback Initialization
 DB_FILE = "db.json"
@@ -29,7 +49,7 @@ def load_local_db():
                 return json.load(f)
         return {"users": {}, "files": {}}
     except Exception as e:
-        print(f"ERROR: Could not load local DB: {e}")
+        log.error("Could not load local DB", extra={"error": str(e)})
         return {"users": {}, "files": {}}
 
 def save_local_db(data):
@@ -37,7 +57,16 @@ def save_local_db(data):
         with open(DB_FILE, "w") as f:
             json.dump(data, f, indent=4)
     except Exception as e:
-        print(f"ERROR: Could not save local DB: {e}")
+        log.error("Could not save local DB", extra={"error": str(e)})
+
+# Reads go through one query API with Supabase first and db.json as fallback
+repo = Repository(SupabaseBackend(get_supabase), LocalBackend(DB_FILE))
+
+# Expired notifications/requests/logs are swept in the background (see retention.py)
+retention_sweeper = RetentionSweeper(get_supabase, load_local_db, save_local_db)
+metrics.register_gauge("retention", lambda: retention_sweeper.last_report)
+if os.environ.get("RETENTION_ENABLED", "1") != "0":
+    retention_sweeper.start()
 
 def generate_dynamic_key(user_id: Any, salt: Optional[str] = None) -> str:
     # If no salt provided, we fall back to a legacy time-based key or constant
@@ -70,95 +99,119 @@ def generate_dynamic_key(user_id: Any, salt: Optional[str] = None) -> str:
 def home():
     return jsonify({"status": "CloudVault API is running", "version": "1.0.0"})
 
-@app.route('/api/shared-files/<target_key>', methods=['GET'])
-def get_shared_files(target_key):
-    try:
-        owner_id = None
-        owner_name = "Unknown"
-        target_key_upper = target_key.upper()
-        print(f"INFO: Attempting to match key: {target_key_upper}")
+@app.route('/api/ready', methods=['GET'])
+def readiness():
+    # ?refresh=1 re-runs the schema probe (e.g. after a migration); the probe
+    # runs at most once per SCHEMA_PROBE_INTERVAL however often this is hit
+    schema = probe_schema(refresh=request.args.get('refresh') == '1')
+    ready = schema["supabase"] or os.path.exists(DB_FILE)
+    return jsonify({
+        "ready": ready,
+        "storage": "supabase" if schema["supabase"] else "local",
+        "schema": schema
+    }), 200 if ready else 503
 
-        # 1. Try identifying owner from Supabase
-        try:
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return jsonify(metrics.snapshot()), 200
+
+def resolve_share_key(target_key_upper: str):
+    owner_id = None
+    owner_name = "Unknown"
+
+    # 1. Try identifying owner from Supabase
+    try:
+        if has_column("users", "session_salt") is False:
+            users_result = get_supabase().table("users").select("id, username").execute()
+        else:
             try:
-                users_result = supabase.table("users").select("id, username, session_salt").execute()
+                users_result = get_supabase().table("users").select("id, username, session_salt").execute()
             except Exception as e:
-                print(f"WARNING: session_salt column might be missing, falling back: {e}")
-                users_result = supabase.table("users").select("id, username").execute()
+                if not is_missing(e, "session_salt"):
+                    raise
+                log.warning("session_salt column is missing, falling back", extra={"error": str(e)})
+                mark_column("users", "session_salt", False)
+                users_result = get_supabase().table("users").select("id, username").execute()
+        
+        for user in users_result.data:
+            user_id_str = str(user.get('id'))
+            salt = user.get('session_salt')
+            gen_key = generate_dynamic_key(user_id_str, salt)
             
-            for user in users_result.data:
-                user_id_str = str(user.get('id'))
-                salt = user.get('session_salt')
-                gen_key = generate_dynamic_key(user_id_str, salt)
-                
-                if gen_key == target_key_upper:
-                    owner_id = user['id']
-                    owner_name = user.get('username')
-                    print(f"SUCCESS: Match found! Owner: {owner_name}")
-                    break
-        except Exception as e:
-            print(f"WARNING: Supabase user match failed, checking local: {e}")
+            if gen_key == target_key_upper:
+                owner_id = user['id']
+                owner_name = user.get('username')
+                log.info("Share key matched", extra={"owner_id": owner_id, "source": "supabase"})
+                break
+    except Exception as e:
+        log.warning("Supabase user match failed, checking local", extra={"error": str(e)})
 
-        # 2. Try identifying owner from Local DB if not found yet
-        if not owner_id:
-            local_db = load_local_db()
-            for email, u in local_db.get("users", {}).items():
-                u_id = u.get("id")
-                u_salt = u.get("session_salt")
-                gen_key = generate_dynamic_key(u_id, u_salt)
-                if gen_key == target_key_upper:
-                    owner_id = u_id
-                    owner_name = u.get("username")
-                    print(f"SUCCESS: Match found in Local DB! Owner: {owner_name}")
-                    break
+    # 2. Try identifying owner from Local DB if not found yet
+    if not owner_id:
+        local_db = load_local_db()
+        for email, u in local_db.get("users", {}).items():
+            u_id = u.get("id")
+            u_salt = u.get("session_salt")
+            gen_key = generate_dynamic_key(u_id, u_salt)
+            if gen_key == target_key_upper:
+                owner_id = u_id
+                owner_name = u.get("username")
+                log.info("Share key matched", extra={"owner_id": owner_id, "source": "local"})
+                break
+
+    return owner_id, owner_name
+
+def fetch_shared_files(owner_id: Any) -> List[Dict[str, Any]]:
+    files = load_records(FileRecord, repo.find("files", where={"owner_id": owner_id}))
+    return [f.to_shared_frontend() for f in files]
+
+@app.route('/api/shared-files/<target_key>', methods=['GET'])
+@rate_limited("share")
+def get_shared_files(target_key):
+    try:
+        target_key_upper = target_key.upper()
+        log.debug("Attempting to match share key", extra={"share_key": target_key_upper})
 
-        if not owner_id:
-            print(f"ERROR: No match found for key {target_key_upper}")
+        # Recently failed keys skip the users scan and still count as a strike
+        if fail_open(False, limiter.is_known_bad_key, target_key_upper):
+            fail_open(None, limiter.record_failure, client_address())
             return jsonify({"error": "No files found for this key or key has expired."}), 404
 
-        # 3. Fetch files for this owner
-        files = []
-        try:
-            files_result = supabase.table("files").select("*").eq("owner_id", owner_id).execute()
-            files = files_result.data
-        except Exception as e:
-            print(f"WARNING: Supabase files fetch failed, falling back to local: {e}")
-            local_db = load_local_db()
-            files = local_db.get("files", {}).get(str(owner_id), [])
-        
-        # Map DB keys to Frontend keys
-        mapped_files = []
-        for f in files:
-            mapped_files.append({
-                "id": f.get("id"),
-                "name": f.get("name"),
-                "size": f.get("size"),
-                "type": f.get("type"),
-                "url": f.get("url"),
-                "category": f.get("category"),
-                "riskLevel": f.get("risk_level") or f.get("riskLevel"),
-                "verdict": f.get("verdict"),
-                "uploadedAt": f.get("uploaded_at") or f.get("uploadedAt"),
-                "cipherContent": f.get("cipher_content") or f.get("cipherContent"),
-                "iv": f.get("iv"),
-                "ownerId": f.get("owner_id") or f.get("ownerId")
-            })
+        # Cached by share key; login (salt rotation) and file writes invalidate it
+        cached = shared_files_cache.get(target_key_upper)
+        if cached:
+            owner_id, owner_name, mapped_files = cached
+        else:
+            # Taken before resolving, so a salt rotation during the lookup isn't cached
+            generation = shared_files_cache.generation()
+            owner_id, owner_name = resolve_share_key(target_key_upper)
+            if not owner_id:
+                log.info("No owner matches share key", extra={"share_key": target_key_upper})
+                fail_open(None, limiter.remember_bad_key, target_key_upper)
+                fail_open(None, limiter.record_failure, client_address())
+                return jsonify({"error": "No files found for this key or key has expired."}), 404
+
+            mapped_files = fetch_shared_files(owner_id)
+            shared_files_cache.put(target_key_upper, owner_id, owner_name, mapped_files, generation)
 
-        # 4. Log the access attempt (optional, don't fail if Supabase is down)
+        # Log the access attempt, cached or not (optional, don't fail if Supabase is down)
         try:
-            supabase.table("access_logs").insert({
+            get_supabase().table("access_logs").insert({
                 "owner_id": owner_id,
-                "access_key": target_key.upper()
+                "access_key": target_key_upper
             }).execute()
-        except:
-            pass
+        except Exception as e:
+            log.debug("Access log insert skipped", extra={"owner_id": owner_id, "error": str(e)})
+
+        if wants_frames():
+            return frames_response(mapped_files, owner=owner_name)
 
         return jsonify({
             "owner": owner_name,
             "files": mapped_files
         })
     except Exception as e:
-        print(f"Error accessing shared files: {e}")
+        log.exception("Error accessing shared files")
         return jsonify({"error": str(e)}), 500
 
 # Persistent Database
@@ -172,11 +225,11 @@ def register():
     try:
         # Check if user exists
         try:
-            existing = supabase.table("users").select("id, email, password, username, created_at").eq("email", email).execute()
+            existing = get_supabase().table("users").select("id, email, password, username, created_at").eq("email", email).execute()
             if existing.data:
                 return jsonify({"error": "User already exists"}), 400
         except Exception as e:
-            print(f"WARNING: Supabase check failed during register: {e}")
+            log.warning("Supabase check failed during register", extra={"error": str(e)})
             local_db = load_local_db()
             if email in local_db["users"]:
                 return jsonify({"error": "User already exists (local)"}), 400
@@ -191,10 +244,10 @@ def register():
         }
         
         try:
-            result = supabase.table("users").insert(new_user).execute()
+            result = get_supabase().table("users").insert(new_user).execute()
             user_data = result.data[0]
         except Exception as e:
-            print(f"WARNING: Supabase insert failed, saving locally: {e}")
+            log.warning("Supabase insert failed, saving locally", extra={"error": str(e)})
             local_data = load_local_db()
             if "users" not in local_data:
                 local_data["users"] = {}
@@ -218,11 +271,11 @@ def login():
     try:
         user = None
         try:
-            result = supabase.table("users").select("id, email, password, username, created_at").eq("email", email).eq("password", password).execute()
+            result = get_supabase().table("users").select("id, email, password, username, created_at").eq("email", email).eq("password", password).execute()
             if result.data:
                 user = result.data[0]
         except Exception as e:
-            print(f"WARNING: Supabase login failed, checking local: {e}")
+            log.warning("Supabase login failed, checking local", extra={"error": str(e)})
         
         if not user:
             local_db = load_local_db()
@@ -238,11 +291,13 @@ def login():
         
         # Update user with new salt
         try:
-            supabase.table("users").update({"session_salt": new_salt}).eq("id", user['id']).execute()
+            if has_column("users", "session_salt") is False:
+                raise RuntimeError("users.session_salt column is missing")
+            get_supabase().table("users").update({"session_salt": new_salt}).eq("id", user['id']).execute()
             user['session_salt'] = new_salt
-            print(f"INFO: Updated session salt for {email}")
+            log.info("Updated session salt", extra={"user_id": user['id']})
         except Exception as update_err:
-            print(f"WARNING: Could not update session_salt for {email}: {update_err}")
+            log.warning("Could not update session_salt, rotating locally", extra={"user_id": user['id'], "error": str(update_err)})
             # Fallback to local salt rotation
             local_data = load_local_db()
             if email in local_data.get("users", {}):
@@ -251,10 +306,14 @@ def login():
                 local_data["users"] = users_map
                 save_local_db(local_data)
             user['session_salt'] = new_salt
+
+        # The old share key dies with the old salt; the new one may have been guessed before
+        shared_files_cache.invalidate_owner(user['id'])
+        fail_open(None, limiter.forget_bad_key, generate_dynamic_key(user['id'], new_salt))
         
         return jsonify(user), 200
     except Exception as e:
-        print(f"CRITICAL: Login error for {email}: {e}")
+        log.exception("Login error")
         return jsonify({"error": str(e)}), 500
 
 # Access Requests & Notifications Endpoints
@@ -265,22 +324,18 @@ def create_access_request():
     file_id = data.get('fileId')
     owner_id = data.get('ownerId')
     requester_key = data.get('requesterKey')
-    print(f"DEBUG: New access request for file={file_id}, owner={owner_id}, key={requester_key}")
-    
-    # Log attempt to file
-    with open("access_debug.log", "a") as f_log:
-        f_log.write(f"ATTEMPT: file={file_id} owner={owner_id} key={requester_key}\n")
+    log.debug("New access request", extra={"file_id": file_id, "owner_id": owner_id, "requester_key": requester_key})
 
     try:
         # Safety check: if owner_id is missing or looks invalid, resolve it from the file table
         if not owner_id or owner_id == 'undefined':
-            print(f"INFO: owner_id missing or undefined, fetching from DB for file {file_id}")
-            file_res = supabase.table("files").select("owner_id").eq("id", file_id).execute()
+            log.info("owner_id missing or undefined, resolving from files table", extra={"file_id": file_id})
+            file_res = get_supabase().table("files").select("owner_id").eq("id", file_id).execute()
             if file_res.data:
                 owner_id = file_res.data[0]['owner_id']
-                print(f"SUCCESS: Resolved owner_id to {owner_id}")
+                log.debug("Resolved owner_id", extra={"file_id": file_id, "owner_id": owner_id})
             else:
-                print(f"ERROR: Could not find owner for file {file_id}")
+                log.warning("Could not find owner for file", extra={"file_id": file_id})
                 return jsonify({"error": "File not found for mapping owner"}), 404
 
         # 1. Create the request
@@ -294,17 +349,17 @@ def create_access_request():
         }
         
         try:
-            res = supabase.table("access_requests").insert(req_data).execute()
+            res = get_supabase().table("access_requests").insert(req_data).execute()
             req_result = res.data[0]
         except Exception as e:
-            print(f"WARNING: Supabase access_request insert failed, saving locally: {e}")
+            log.warning("Supabase access_request insert failed, saving locally", extra={"error": str(e)})
             local_db = load_local_db()
             if "access_requests" not in local_db or not isinstance(local_db["access_requests"], list):
                 local_db["access_requests"] = []
             local_db["access_requests"].append(req_data)
             save_local_db(local_db)
             req_result = req_data
-        print(f"DEBUG: Inserted access_request record")
+        log.debug("Inserted access_request record", extra={"owner_id": owner_id})
         
         # 2. Create a notification for the owner
         notif_data = {
@@ -317,51 +372,34 @@ def create_access_request():
             "created_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
         }
         try:
-            supabase.table("system_notifications").insert(notif_data).execute()
+            get_supabase().table("system_notifications").insert(notif_data).execute()
         except Exception as e:
-            print(f"WARNING: Supabase notification insert failed, saving locally: {e}")
+            log.warning("Supabase notification insert failed, saving locally", extra={"error": str(e)})
             local_db = load_local_db()
             if "notifications" not in local_db or not isinstance(local_db["notifications"], list):
                 local_db["notifications"] = []
             local_db["notifications"].append(notif_data)
             save_local_db(local_db)
-        print(f"DEBUG: Created system_notification for user {owner_id}")
-        
-        # Log to a file we can read
-        with open("access_debug.log", "a") as f_log:
-            f_log.write(f"REQ: file={file_id} owner={owner_id} key={requester_key}\n")
+        unread_counts.adjust(owner_id, 1)
+        log.info("Access request created", extra={"file_id": file_id, "owner_id": owner_id, "requester_key": requester_key})
 
         return jsonify(req_result), 201
     except Exception as e:
-        print(f"ERROR in access-request: {e}")
-        with open("access_debug.log", "a") as f_log:
-            f_log.write(f"ERROR: {str(e)}\n")
+        log.exception("Error in access-request", extra={"file_id": file_id, "owner_id": owner_id})
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/access-requests/<user_id>', methods=['GET'])
 def get_access_requests(user_id):
     try:
-        final_requests = []
-        try:
-            res = supabase.table("access_requests").select("*, files(name)").eq("owner_id", user_id).eq("status", "pending").execute()
-            final_requests = res.data
-        except Exception as e:
-            print(f"WARNING: Supabase access_requests fetch failed, checking local: {e}")
-            local_db = load_local_db()
-            local_requests = local_db.get("access_requests")
-            if not isinstance(local_requests, list):
-                local_requests = []
-            
-            # Filter pending requests for this owner
-            owner_requests = [r for r in local_requests if isinstance(r, dict) and r.get("owner_id") == user_id and r.get("status") == "pending"]
-            
-            # Mock file name joined (simple)
-            for r in owner_requests:
-                if "files" not in r:
-                    r["files"] = {"name": f"File-{r.get('file_id')}"}
-            final_requests = owner_requests
+        rows = repo.find("access_requests", where={"owner_id": user_id, "status": "pending"}, fields=["*", "files(name)"])
+        final_requests = load_records(AccessRequestRecord, rows)
+
+        # Requests whose file isn't in the store still need a display name
+        for r in final_requests:
+            if not r.files:
+                r.files = {"name": f"File-{r.file_id}"}
         
-        return jsonify(final_requests), 200
+        return jsonify([r.to_json() for r in final_requests]), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -372,11 +410,11 @@ def update_access_request(request_id):
     try:
         updated_data = None
         try:
-            res = supabase.table("access_requests").update({"status": status}).eq("id", request_id).execute()
+            res = get_supabase().table("access_requests").update({"status": status}).eq("id", request_id).execute()
             if res.data:
                 updated_data = res.data[0]
         except Exception as e:
-            print(f"WARNING: Supabase access_request update failed, trying local: {e}")
+            log.warning("Supabase access_request update failed, trying local", extra={"request_id": request_id, "error": str(e)})
             local_db = load_local_db()
             local_requests = local_db.get("access_requests")
             if not isinstance(local_requests, list):
@@ -398,24 +436,70 @@ def update_access_request(request_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/notifications/<user_id>', methods=['GET'])
-def get_notifications(user_id):
+def bulk_request_body() -> Tuple[Dict[str, Any], Optional[List[str]]]:
+    # JSON object body plus its "ids" as strings; ids is None when the body is
+    # not an object or "ids" is not a list of strings/numbers
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return {}, None
+    raw = data.get('ids')
+    if raw is None:
+        return data, []
+    if not isinstance(raw, list) or not all(isinstance(i, (str, int)) and not isinstance(i, bool) for i in raw):
+        return data, None
+    return data, [str(i) for i in raw]
+
+@app.route('/api/access-requests', methods=['PATCH'])
+def update_access_requests_bulk():
+    # Body: {"ids": [...], "status": "approved" | "denied", "ownerId": optional}
+    data, ids = bulk_request_body()
+    if ids is None:
+        return jsonify({"error": "Body must be a JSON object with ids as a list"}), 400
+    status = data.get('status')
+    owner_id = data.get('ownerId')
+    if not ids or status not in ("approved", "denied"):
+        return jsonify({"error": "ids and a status of 'approved' or 'denied' are required"}), 400
+
     try:
-        final_notifs = []
+        updated = []
         try:
-            res = supabase.table("system_notifications").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
-            final_notifs = res.data
+            query = get_supabase().table("access_requests").update({"status": status}).in_("id", ids)
+            if owner_id:
+                query = query.eq("owner_id", owner_id)
+            updated = query.execute().data
         except Exception as e:
-            print(f"WARNING: Supabase notifications fetch failed, checking local: {e}")
+            log.warning("Supabase bulk access_request update failed, trying local", extra={"count": len(ids), "error": str(e)})
             local_db = load_local_db()
-            local_notifs = local_db.get("notifications")
-            if not isinstance(local_notifs, list):
-                local_notifs = []
-                
-            final_notifs = [n for n in local_notifs if isinstance(n, dict) and n.get("user_id") == user_id]
-            final_notifs.sort(key=lambda x: x.get("created_at", ""), reverse=True)
+            local_requests = local_db.get("access_requests")
+            if not isinstance(local_requests, list):
+                local_requests = []
+
+            wanted = set(ids)
+            for r in local_requests:
+                if isinstance(r, dict) and str(r.get("id")) in wanted and (not owner_id or r.get("owner_id") == owner_id):
+                    r["status"] = status
+                    updated.append(r)
+            if updated:
+                local_db["access_requests"] = local_requests
+                save_local_db(local_db)
+
+        found = {str(r.get("id")) for r in updated}
+        return jsonify({
+            "updated": updated,
+            "missing": [i for i in ids if i not in found]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/notifications/<user_id>', methods=['GET'])
+def get_notifications(user_id):
+    try:
+        rows = repo.find("notifications", where={"user_id": user_id}, order_by="created_at", desc=True)
+        final_notifs = load_records(NotificationRecord, rows)
             
-        return jsonify(final_notifs), 200
+        return jsonify([n.to_json() for n in final_notifs]), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -424,11 +508,17 @@ def mark_notification_read(notif_id):
     try:
         updated_notif = None
         try:
-            res = supabase.table("system_notifications").update({"is_read": True}).eq("id", notif_id).execute()
+            # Only flips unread rows, so the unread counter moves exactly once
+            res = get_supabase().table("system_notifications").update({"is_read": True}).eq("id", notif_id).eq("is_read", False).execute()
             if res.data:
                 updated_notif = res.data[0]
+                unread_counts.adjust(updated_notif.get("user_id"), -1)
+            else:
+                res = get_supabase().table("system_notifications").select("*").eq("id", notif_id).execute()
+                if res.data:
+                    updated_notif = res.data[0]
         except Exception as e:
-            print(f"WARNING: Supabase notification update failed, trying local: {e}")
+            log.warning("Supabase notification update failed, trying local", extra={"notif_id": notif_id, "error": str(e)})
             local_db = load_local_db()
             local_notifs = local_db.get("notifications")
             if not isinstance(local_notifs, list):
@@ -436,6 +526,8 @@ def mark_notification_read(notif_id):
                 
             for n in local_notifs:
                 if isinstance(n, dict) and str(n.get("id")) == str(notif_id):
+                    if not n.get("is_read"):
+                        unread_counts.adjust(n.get("user_id"), -1)
                     n["is_read"] = True
                     updated_notif = n
                     break
@@ -450,28 +542,70 @@ def mark_notification_read(notif_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/notifications/<user_id>/read', methods=['POST'])
+def mark_notifications_read(user_id):
+    # Body: {"ids": [...]} to mark those, or {"all": true} for every unread one
+    data, ids = bulk_request_body()
+    if ids is None:
+        return jsonify({"error": "Body must be a JSON object with ids as a list"}), 400
+    mark_all = bool(data.get('all'))
+    if not ids and not mark_all:
+        return jsonify({"error": "ids or all=true required"}), 400
+
+    try:
+        marked = []
+        try:
+            query = get_supabase().table("system_notifications").update({"is_read": True}).eq("user_id", user_id).eq("is_read", False)
+            if not mark_all:
+                query = query.in_("id", ids)
+            marked = [n.get("id") for n in query.execute().data]
+        except Exception as e:
+            log.warning("Supabase bulk notification update failed, trying local", extra={"error": str(e)})
+            local_db = load_local_db()
+            local_notifs = local_db.get("notifications")
+            if not isinstance(local_notifs, list):
+                local_notifs = []
+
+            wanted = set(ids)
+            for n in local_notifs:
+                if (isinstance(n, dict) and n.get("user_id") == user_id and not n.get("is_read")
+                        and (mark_all or str(n.get("id")) in wanted)):
+                    n["is_read"] = True
+                    marked.append(n.get("id"))
+            if marked:
+                local_db["notifications"] = local_notifs
+                save_local_db(local_db)
+
+        unread_counts.adjust(user_id, -len(marked))
+        return jsonify({"marked": marked, "unread": unread_counts.get(user_id)}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/notifications/<user_id>/unread-count', methods=['GET'])
+def get_unread_count(user_id):
+    try:
+        return jsonify({"unread": unread_counts.get(user_id)}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def count_unread_notifications(user_id: Any) -> int:
+    return repo.count("notifications", where={"user_id": user_id, "is_read": False})
+
+unread_counts = UnreadCounter(count_unread_notifications)
+metrics.register_gauge("unread_counters", unread_counts.size)
+
 @app.route('/api/check-approval', methods=['POST'])
+@rate_limited("approval")
 def check_approval():
     data = request.json
     file_id = data.get('fileId')
     requester_key = data.get('requesterKey')
     try:
-        is_approved = False
-        try:
-            res = supabase.table("access_requests")\
-                .select("*")\
-                .eq("file_id", file_id)\
-                .eq("requester_key", requester_key)\
-                .eq("status", "approved")\
-                .execute()
-            is_approved = len(res.data) > 0
-        except Exception as e:
-            print(f"WARNING: Supabase check-approval failed, checking local: {e}")
-            local_db = load_local_db()
-            local_requests = local_db.get("access_requests")
-            if not isinstance(local_requests, list):
-                local_requests = []
-            is_approved = any(r for r in local_requests if isinstance(r, dict) and r.get("file_id") == file_id and r.get("requester_key") == requester_key and r.get("status") == "approved")
+        is_approved = repo.exists("access_requests", where={
+            "file_id": file_id,
+            "requester_key": requester_key,
+            "status": "approved"
+        })
             
         return jsonify({"approved": is_approved}), 200
     except Exception as e:
@@ -484,7 +618,7 @@ def analyze():
     file_type = data.get('fileType')
     
     try:
-        completion = client.chat.completions.create(
+        completion = get_groq().chat.completions.create(
             messages=[
                 {
                     "role": "system",
@@ -500,7 +634,7 @@ def analyze():
         )
         return completion.choices[0].message.content
     except Exception as e:
-        print(f"Groq error: {e}")
+        log.error("Groq error", extra={"error": str(e)})
         return jsonify({
             "verdict": "Security scan unavailable.",
             "category": "Other",
@@ -514,39 +648,24 @@ def get_files(user_id):
         if not user_id:
             return jsonify({"error": "User ID required"}), 400
 
-        try:
-            result = supabase.table("files").select("*").eq("owner_id", user_id).execute()
-            files = result.data
-        except Exception as e:
-            print(f"WARNING: Supabase GET error, falling back to local: {e}")
-            local_db = load_local_db()
-            files = local_db.get("files", {}).get(str(user_id), [])
-        
-        # Map DB keys to Frontend keys
-        mapped_files = []
-        for f in files:
-            mapped_files.append({
-                "id": f.get("id"),
-                "name": f.get("name"),
-                "size": f.get("size"),
-                "type": f.get("type"),
-                "url": f.get("url"),
-                "category": f.get("category"),
-                "riskLevel": f.get("risk_level") or f.get("riskLevel"),
-                "verdict": f.get("verdict"),
-                "uploadedAt": f.get("uploaded_at") or f.get("uploadedAt"),
-                "cipherContent": f.get("cipher_content") or f.get("cipherContent"),
-                "iv": f.get("iv")
-            })
+        files = load_records(FileRecord, repo.find("files", where={"owner_id": user_id}))
+        mapped_files = [f.to_frontend() for f in files]
             
+        if wants_frames():
+            return frames_response(mapped_files)
+
         return jsonify(mapped_files), 200
     except Exception as e:
-        print(f"GET files error: {e}")
+        log.exception("GET files error")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/files/<user_id>', methods=['POST'])
 def save_user_files(user_id):
-    new_files = request.json
+    # Accepts the JSON list or CVF1 frames (raw ciphertext, see transport.py)
+    try:
+        _, new_files = read_files_payload()
+    except FrameError as e:
+        return jsonify({"error": str(e)}), 400
     if not isinstance(new_files, list):
         return jsonify({"error": "Invalid data format"}), 400
 
@@ -554,42 +673,85 @@ def save_user_files(user_id):
         if not user_id:
             return jsonify({"error": "User ID required"}), 400
 
+        # Only files whose content hash or metadata changed get written
+        local_db_data = load_local_db()
+        manifest = get_manifest(local_db_data, user_id)
+        if manifest is None:
+            manifest = bootstrap_manifest(user_id, local_db_data)
+
+        changed = []
+        posted = []
+        for file in new_files:
+            if not isinstance(file, dict) or not file.get('name'):
+                continue
+            try:
+                entry = build_entry(file)
+            except ManifestError as e:
+                return jsonify({"error": f"{file['name']}: {e}"}), 400
+            posted.append(file['name'])
+            if not is_unchanged(manifest.get(file['name']), entry):
+                changed.append((file, entry))
+
+        # Chunked files are only listed once every segment has been stored
+        for file, _ in changed:
+            if file.get('iv') != CONTAINER_IV:
+                continue
+            try:
+                state = segment_store.status(user_id, header_from_record(file).id)
+            except (ContainerError, SegmentError) as e:
+                return jsonify({"error": f"{file['name']}: {e}"}), 400
+            except KeyError:
+                return jsonify({"error": f"{file['name']}: container was never uploaded"}), 409
+            if not state["complete"]:
+                return jsonify({"error": f"{file['name']}: container is incomplete", "missing": state["missing"]}), 409
+
+        if not changed:
+            # Pending entries always count as changed, so these are all in Supabase already
+            in_supabase = not any(manifest[name].get("pending") for name in posted)
+            return jsonify({"status": "success", "supabase": in_supabase, "written": 0}), 200
+
+        # Quotas are enforced on the projected totals before anything is written
+        delta = manifest_delta((manifest.get(file['name']), entry) for file, entry in changed)
+        check_delta = delta
+        if delta is None:
+            # Entries from before byte tracking: re-measure from the store and
+            # price the files being replaced from their stored records
+            usage.invalidate(user_id)
+            check_delta = manifest_delta(replacement_costs(local_db_data, user_id, manifest, changed))
+        try:
+            usage.check(user_id, *check_delta, largest_file=max(entry["bytes"] for _, entry in changed))
+        except QuotaExceeded as e:
+            return jsonify({"error": str(e), "usage": e.usage, "quota": e.limits}), 413
+
         supabase_success = True
         try:
-            for file in new_files:
-                file_name = file.get('name')
-                if not file_name:
-                    continue
+            # One lookup for every name instead of one per file
+            names = [file['name'] for file, _ in changed]
+            existing = get_supabase().table("files").select("id, name").eq("owner_id", user_id).in_("name", names).execute()
+            existing_ids = {row['name']: row['id'] for row in existing.data}
+
+            inserts = []
+            for file, _ in changed:
+                file_name = file['name']
 
                 # Mapping frontend keys to DB keys
-                file_data = {
-                    "owner_id": user_id,
-                    "name": file_name,
-                    "size": file.get('size'),
-                    "type": file.get('type'),
-                    "url": file.get('url'),
-                    "category": file.get('category'),
-                    "risk_level": file.get('riskLevel'),
-                    "verdict": file.get('verdict'),
-                    "cipher_content": file.get('cipherContent'),
-                    "iv": file.get('iv')
-                }
-
-                # Check if file already exists for this user to avoid duplicates
-                existing = supabase.table("files").select("id").eq("owner_id", user_id).eq("name", file_name).execute()
-                
-                if existing.data:
+                record = FileRecord.from_row(file)
+                record.owner_id = user_id
+                file_data = record.to_db_row()
+
+                if file_name in existing_ids:
                     # Update existing record
-                    supabase.table("files").update(file_data).eq("id", existing.data[0]['id']).execute()
+                    get_supabase().table("files").update(file_data).eq("id", existing_ids[file_name]).execute()
                 else:
-                    # Insert new record
-                    supabase.table("files").insert(file_data).execute()
+                    inserts.append(file_data)
+
+            if inserts:
+                get_supabase().table("files").insert(inserts).execute()
         except Exception as e:
-            print(f"WARNING: Supabase save failed, using local fallback: {e}")
+            log.warning("Supabase save failed, using local fallback", extra={"error": str(e)})
             supabase_success = False
 
         # Always sync to local DB for fallback reliability
-        local_db_data = load_local_db()
         user_id_str = str(user_id)
         if "files" not in local_db_data or not isinstance(local_db_data["files"], dict):
             local_db_data["files"] = {}
@@ -600,25 +762,185 @@ def save_user_files(user_id):
         
         # Simple merge: replace existing or add new
         current_local_files = files_map[user_id_str]
-        for nf in new_files:
-            found = False
-            for i, of in enumerate(current_local_files):
-                if of.get("name") == nf.get("name"):
-                    current_local_files[i] = nf
-                    found = True
-                    break
-            if not found:
+        positions = {of.get("name"): i for i, of in enumerate(current_local_files)}
+        replaced = []
+        for nf, entry in changed:
+            if nf["name"] in positions:
+                replaced.append(current_local_files[positions[nf["name"]]])
+                current_local_files[positions[nf["name"]]] = nf
+            else:
+                positions[nf["name"]] = len(current_local_files)
                 current_local_files.append(nf)
+            if not supabase_success:
+                # Only in db.json for now; the next save or handshake asks for it again
+                entry["pending"] = True
+            manifest[nf["name"]] = entry
         
         files_map[user_id_str] = current_local_files
         local_db_data["files"] = files_map
+        set_manifest(local_db_data, user_id, manifest)
         save_local_db(local_db_data)
+        usage_ledger.write(user_id, manifest_totals(manifest))
+        shared_files_cache.invalidate_owner(user_id)
+        usage.apply(user_id, delta)
+        search_index.upsert(user_id, [FileRecord.from_row(nf).to_metadata() for nf, _ in changed])
+        # Overwritten chunked files leave their old segments behind
+        saved = {h.id for h in (chunked_header(nf) for nf, _ in changed) if h}
+        drop_containers(user_id, replaced, keep=saved)
+        claim_containers(user_id, saved)
         
-        return jsonify({"status": "success", "supabase": supabase_success}), 200
+        return jsonify({"status": "success", "supabase": supabase_success, "written": len(changed)}), 200
+    except Exception as e:
+        log.exception("Error saving files")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/files/<user_id>/sync', methods=['POST'])
+def sync_user_files(user_id):
+    # Delta sync handshake. Body: {"manifest": [{name, size, hash, version}],
+    # "deleted": [name, ...]}. Deletions are applied here; the response lists
+    # which files the client must then POST to /api/files/<user_id>.
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid data format"}), 400
+    deleted = data.get('deleted') or []
+    if not isinstance(deleted, list) or not all(isinstance(name, str) for name in deleted):
+        return jsonify({"error": "deleted must be a list of file names"}), 400
+    try:
+        client_entries = read_client_manifest(data.get('manifest', []))
+    except ManifestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        local_db_data = load_local_db()
+        manifest = get_manifest(local_db_data, user_id)
+        dirty = manifest is None
+        if manifest is None:
+            manifest = bootstrap_manifest(user_id, local_db_data)
+
+        supabase_success = True
+        if deleted:
+            doomed = set(deleted)
+            dropped = []
+            try:
+                dropped = get_supabase().table("files").delete().eq("owner_id", user_id).in_("name", deleted).execute().data or []
+            except Exception as e:
+                log.warning("Supabase batch delete failed, using local fallback", extra={"error": str(e)})
+                supabase_success = False
+
+            files_root = local_db_data.get("files")
+            if isinstance(files_root, dict) and str(user_id) in files_root:
+                dropped += [f for f in files_root[str(user_id)] if f.get("name") in doomed]
+                files_root[str(user_id)] = [f for f in files_root[str(user_id)] if f.get("name") not in doomed]
+            drop_containers(user_id, dropped)
+            removed = [(manifest.pop(name), None) for name in deleted if name in manifest]
+            usage.apply(user_id, manifest_delta(removed) if len(removed) == len(set(deleted)) else None)
+            dirty = True
+
+        result = diff_manifest(manifest, client_entries)
+
+        if dirty:
+            set_manifest(local_db_data, user_id, manifest)
+            save_local_db(local_db_data)
+            usage_ledger.write(user_id, manifest_totals(manifest))
+        if deleted:
+            shared_files_cache.invalidate_owner(user_id)
+            search_index.remove(user_id, deleted)
+
+        result.update({"deleted": deleted, "supabase": supabase_success})
+        return jsonify(result), 200
+    except Exception as e:
+        log.exception("Error syncing files")
+        return jsonify({"error": str(e)}), 500
+
+def bootstrap_manifest(user_id: Any, local_db_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    # First sync for this user: derive the manifest from whatever is stored
+    local_files = local_db_data.get("files", {}).get(str(user_id), [])
+    if local_files:
+        return build_manifest(local_files)
+    try:
+        result = get_supabase().table("files").select("id, name, size, cipher_content").eq("owner_id", user_id).execute()
+        return build_manifest(result.data)
+    except Exception as e:
+        log.warning("Could not bootstrap manifest from Supabase", extra={"error": str(e)})
+        return {}
+
+@app.route('/api/files/<user_id>/usage', methods=['GET'])
+def get_usage(user_id):
+    try:
+        return jsonify({**usage.get(user_id), "quota": usage.limits()}), 200
     except Exception as e:
-        print(f"Error saving files: {e}")
         return jsonify({"error": str(e)}), 500
 
+def replacement_costs(local_db_data: Dict[str, Any], user_id: Any, manifest: Dict[str, Dict[str, Any]],
+                      changed: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+    # (old entry, new entry) pairs with old entries lacking "bytes" sized from
+    # the db.json record; a record only in Supabase counts as 0 (worst case)
+    stored = {f.get("name"): f for f in local_db_data.get("files", {}).get(str(user_id), []) if isinstance(f, dict)}
+    for file, entry in changed:
+        old = manifest.get(file['name'])
+        if old is not None and "bytes" not in old:
+            old = {**old, "bytes": record_bytes(stored.get(file['name'], {}))}
+        yield old, entry
+
+usage_ledger = UsageLedger()
+
+def measure_usage(user_id: Any):
+    # Full scan; only used when the manifest ledger can't say and by reconcile()
+    rows = repo.find("files", where={"owner_id": user_id}, fields=["id", "cipher_content", "iv"])
+    return len(rows), sum(record_bytes(r) for r in rows)
+
+def manifest_usage(user_id: Any):
+    # Totals implied by the user's sync manifest, or None if it can't say.
+    # Read from the user's ledger file; only a user never written since the
+    # ledger existed costs a db.json parse, once, to seed it
+    seeded, totals = usage_ledger.read(user_id)
+    if seeded:
+        return totals
+    totals = manifest_totals(get_manifest(load_local_db(), user_id))
+    usage_ledger.write(user_id, totals, replace=False)
+    return totals
+
+usage = UsageTracker(measure_usage, ledger=manifest_usage)
+metrics.register_gauge("usage", lambda: {"counters": usage.size(), "last_reconcile": usage.last_reconcile})
+
+@app.route('/api/files/<user_id>/search', methods=['GET'])
+def search_files(user_id):
+    # ?q=tax rep&category=Legal&riskLevel=High&type=application/pdf
+    # &min_size=&max_size=&from=&to=&sort=relevance|name|size|uploadedAt&page=&per_page=
+    args = request.args
+    sort = args.get('sort', 'relevance')
+    if sort not in SORTS:
+        return jsonify({"error": f"sort must be one of {', '.join(SORTS)}"}), 400
+    try:
+        size_range = tuple(int(args[k]) if args.get(k) else None for k in ('min_size', 'max_size'))
+        page = int(args.get('page', 1))
+        per_page = int(args.get('per_page', 20))
+    except ValueError:
+        return jsonify({"error": "page, per_page, min_size and max_size must be integers"}), 400
+
+    try:
+        result = search_index.search(
+            user_id,
+            q=args.get('q', ''),
+            filters={f: args[f] for f in FACETS if args.get(f)},
+            size_range=size_range,
+            date_range=(args.get('from'), args.get('to')),
+            sort=sort,
+            page=page,
+            per_page=per_page,
+        )
+        return jsonify(result), 200
+    except Exception as e:
+        log.exception("Search error")
+        return jsonify({"error": str(e)}), 500
+
+def load_search_documents(user_id: Any) -> List[Dict[str, Any]]:
+    columns = [column for _, column in FileRecord.METADATA]
+    return [f.to_metadata() for f in load_records(FileRecord, repo.find("files", where={"owner_id": user_id}, fields=columns))]
+
+search_index = SearchIndex(load_search_documents)
+metrics.register_gauge("search_indexes", search_index.size)
+
 @app.route('/api/files/<user_id>/<file_id>', methods=['DELETE'])
 def delete_file(user_id, file_id):
     try:
@@ -627,10 +949,14 @@ def delete_file(user_id, file_id):
              
         # Delete from Supabase
         supabase_success = True
+        deleted_names = set()
+        dropped = []
         try:
-            supabase.table("files").delete().eq("owner_id", user_id).eq("id", file_id).execute()
+            res = get_supabase().table("files").delete().eq("owner_id", user_id).eq("id", file_id).execute()
+            dropped += res.data or []
+            deleted_names.update(row.get("name") for row in res.data or [])
         except Exception as e:
-            print(f"WARNING: Supabase delete failed, using local fallback: {e}")
+            log.warning("Supabase delete failed, using local fallback", extra={"file_id": file_id, "error": str(e)})
             supabase_success = False
             
         # Local delete
@@ -638,18 +964,137 @@ def delete_file(user_id, file_id):
         files_root = local_data.get("files", {})
         user_files = files_root.get(str(user_id), [])
         new_user_files = [f for f in user_files if str(f.get("id")) != str(file_id)]
+        dropped += [f for f in user_files if str(f.get("id")) == str(file_id)]
+        deleted_names.update(f.get("name") for f in user_files if str(f.get("id")) == str(file_id))
+
+        # Forget the sync state too, or a later re-upload would be skipped as unchanged
+        manifest = get_manifest(local_data, user_id)
+        removed = []
+        if manifest:
+            removed = [(entry, None) for name, entry in manifest.items()
+                       if name in deleted_names or str(entry.get("id")) == str(file_id)]
+            set_manifest(local_data, user_id, {
+                name: entry for name, entry in manifest.items()
+                if name not in deleted_names and str(entry.get("id")) != str(file_id)
+            })
         
         if not isinstance(files_root, dict):
             files_root = {}
         files_root[str(user_id)] = new_user_files
         local_data["files"] = files_root
         save_local_db(local_data)
+        if manifest:
+            usage_ledger.write(user_id, manifest_totals(get_manifest(local_data, user_id)))
+        shared_files_cache.invalidate_owner(user_id)
+        # Deleting something the manifest never tracked leaves the delta unknown
+        usage.apply(user_id, manifest_delta(removed) if len(removed) >= len(deleted_names) else None)
+        search_index.remove(user_id, deleted_names | {name for name, entry in (manifest or {}).items()
+                                                      if str(entry.get("id")) == str(file_id)})
+        drop_containers(user_id, dropped)
         
         return jsonify({"status": "success", "supabase": supabase_success}), 200
     except Exception as e:
-        print(f"Error deleting file: {e}")
+        log.exception("Error deleting file")
         return jsonify({"error": str(e)}), 500
 
+# Chunked (CVC1) containers: segments are uploaded first, then the file
+# record (cipherContent = base64 header, iv = "CVC1") is posted as usual.
+# See cloudvault_client/container.py for the format and segments.py for storage.
+
+segment_store = SegmentStore()
+
+def chunked_header(record: Dict[str, Any]):
+    try:
+        return header_from_record(record)
+    except ContainerError:
+        return None
+
+def drop_containers(user_id: Any, records: List[Dict[str, Any]], keep=()) -> None:
+    for record in records:
+        header = chunked_header(record)
+        if header and header.id not in keep:
+            segment_store.delete(user_id, header.id)
+
+def claim_containers(user_id: Any, container_ids) -> None:
+    for container_id in container_ids:
+        try:
+            segment_store.claim(user_id, container_id)
+        except (KeyError, SegmentError):
+            log.warning("Saved file lists a missing container", extra={"container_id": container_id})
+
+@app.route('/api/containers/<user_id>', methods=['POST'])
+def begin_container(user_id):
+    # Body: the raw 36-byte header (application/octet-stream) or {"header": base64}
+    try:
+        if request.mimetype == "application/octet-stream":
+            raw = request.get_data()
+        else:
+            raw = base64.b64decode((request.get_json(silent=True) or {}).get("header") or "")
+        header = parse_header(raw)
+    except (ContainerError, ValueError) as e:
+        return jsonify({"error": f"Invalid container header: {e}"}), 400
+
+    def admit(pending_files: int, pending_bytes: int) -> None:
+        # Checked up front, counting containers not yet listed as files, so
+        # segments can't be used to get around the quota
+        usage.check(user_id, pending_files + 1, pending_bytes + header.ciphertext_bytes,
+                    largest_file=header.ciphertext_bytes)
+
+    try:
+        state = segment_store.begin(user_id, header, admit=admit)
+        return jsonify(state), 200 if state["present"] else 201
+    except QuotaExceeded as e:
+        return jsonify({"error": str(e), "usage": e.usage, "quota": e.limits}), 413
+    except SegmentError as e:
+        return jsonify({"error": str(e)}), 409
+
+@app.route('/api/containers/<user_id>/<container_id>', methods=['GET'])
+def get_container(user_id, container_id):
+    try:
+        return jsonify(segment_store.status(user_id, container_id)), 200
+    except SegmentError as e:
+        return jsonify({"error": str(e)}), 400
+    except KeyError:
+        return jsonify({"error": "Container not found"}), 404
+
+@app.route('/api/containers/<user_id>/<container_id>/segments/<int:number>', methods=['PUT'])
+def put_segment(user_id, container_id, number):
+    try:
+        state = segment_store.put(user_id, container_id, number, request.get_data(cache=False))
+        metrics.incr("segments.stored")
+        return jsonify({"stored": number, "missing": state["missing"], "complete": state["complete"]}), 200
+    except SegmentError as e:
+        return jsonify({"error": str(e)}), 400
+    except KeyError:
+        return jsonify({"error": "Container not found"}), 404
+
+@app.route('/api/containers/<user_id>/<container_id>/segments/<int:number>', methods=['GET'])
+def get_segment(user_id, container_id, number):
+    try:
+        data = segment_store.get(user_id, container_id, number)
+    except SegmentError as e:
+        return jsonify({"error": str(e)}), 400
+    except KeyError:
+        return jsonify({"error": "Segment not found"}), 404
+    # A sealed segment never changes: the container id is random and the index fixed
+    response = Response(data, mimetype="application/octet-stream")
+    response.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+    return response
+
+@app.route('/api/containers/<user_id>/<container_id>/stream', methods=['GET'])
+def stream_container(user_id, container_id):
+    # The whole container (header + segments in order), one segment in memory at a time
+    try:
+        state = segment_store.status(user_id, container_id)
+    except SegmentError as e:
+        return jsonify({"error": str(e)}), 400
+    except KeyError:
+        return jsonify({"error": "Container not found"}), 404
+    if not state["complete"]:
+        return jsonify({"error": "Container is incomplete", "missing": state["missing"]}), 409
+    return Response(stream_with_context(segment_store.stream(user_id, container_id)),
+                    mimetype="application/vnd.cloudvault.container")
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
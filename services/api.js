@@ -1,3 +1,5 @@
+import { parseContainerHeader } from './encryption';
+
 const API_BASE_URL = import.meta.env.VITE_API_URL || '';
 
 export const apiFetch = async (endpoint, options = {}) => {
@@ -14,3 +16,15 @@ export const apiFetch = async (endpoint, options = {}) => {
     const response = await fetch(url, defaultOptions);
     return response;
 };
+
+/**
+ * fetchSegment(index) for decryptContainer: pulls one sealed segment of an owner's container
+ */
+export const segmentFetcher = (ownerId, headerBase64) => {
+    const { id } = parseContainerHeader(headerBase64);
+    return async (index) => {
+        const response = await apiFetch(`/api/containers/${ownerId}/${id}/segments/${index}`);
+        if (!response.ok) throw new Error(`Segment ${index} unavailable (${response.status})`);
+        return response.arrayBuffer();
+    };
+};
@@ -87,3 +87,144 @@ export function base64ToBuffer(base64) {
     }
     return buf.buffer;
 }
+
+/**
+ * SHA-256 (hex) of the raw ciphertext behind a Base64 string.
+ * Matches the server's content hash used by the delta sync manifest.
+ */
+export async function contentHash(base64) {
+    const digest = await crypto.subtle.digest('SHA-256', base64 ? base64ToBuffer(base64) : new ArrayBuffer(0));
+    return Array.from(new Uint8Array(digest))
+        .map(b => b.toString(16).padStart(2, '0'))
+        .join('');
+}
+
+/*
+ * CVC1 chunked container (same format as cloudvault_client/container.py).
+ *
+ *   header    = "CVC1" | version u8 | flags u8 | reserved u16
+ *               | segmentSize u32 | size u64 | containerId 16B   (36 bytes)
+ *   segment i = AES-GCM(plaintext[i*S:(i+1)*S]), nonce = containerId[0:8] | i (u32 BE),
+ *               additionalData = header | i (u32 BE) | final (u8)
+ *
+ * Each segment has its own nonce and tag, so segments upload in parallel,
+ * resume individually and decrypt as they arrive. A file record holding a
+ * container stores the Base64 header as cipherContent and CONTAINER_IV as iv.
+ */
+
+export const CONTAINER_IV = 'CVC1';
+export const CONTAINER_SEGMENT_SIZE = 1024 * 1024;
+const CONTAINER_MAGIC = [0x43, 0x56, 0x43, 0x31];
+const CONTAINER_VERSION = 1;
+const HEADER_BYTES = 36;
+const MAX_SEGMENTS = 65536;
+const TAG_BYTES = 16;
+
+const keyCache = new Map();
+
+/**
+ * PBKDF2 is deliberately slow; derive once per password for all segments
+ */
+function getKey(password) {
+    if (!keyCache.has(password)) {
+        keyCache.set(password, deriveKey(password));
+    }
+    return keyCache.get(password);
+}
+
+export function isContainer(file) {
+    return Boolean(file) && file.iv === CONTAINER_IV;
+}
+
+/**
+ * New container header for a plaintext of `size` bytes
+ * Returns: { raw: Uint8Array, id, size, segmentSize, segmentCount }
+ */
+export function createContainerHeader(size, segmentSize = CONTAINER_SEGMENT_SIZE) {
+    const raw = new Uint8Array(HEADER_BYTES);
+    const view = new DataView(raw.buffer);
+    raw.set(CONTAINER_MAGIC, 0);
+    view.setUint8(4, CONTAINER_VERSION);
+    view.setUint32(8, segmentSize);
+    view.setBigUint64(12, BigInt(size));
+    raw.set(crypto.getRandomValues(new Uint8Array(16)), 20);
+    return parseContainerHeader(raw);
+}
+
+/**
+ * Parses a header from a Uint8Array/ArrayBuffer or its Base64 form
+ */
+export function parseContainerHeader(header) {
+    const raw = typeof header === 'string' ? new Uint8Array(base64ToBuffer(header)) : new Uint8Array(header);
+    if (raw.length !== HEADER_BYTES || CONTAINER_MAGIC.some((b, i) => raw[i] !== b)) {
+        throw new Error('Not a CVC1 container');
+    }
+    const view = new DataView(raw.buffer, raw.byteOffset, raw.byteLength);
+    if (view.getUint8(4) !== CONTAINER_VERSION) {
+        throw new Error(`Unsupported container version ${view.getUint8(4)}`);
+    }
+    const segmentSize = view.getUint32(8);
+    const size = Number(view.getBigUint64(12));
+    if (size > MAX_SEGMENTS * segmentSize) {
+        throw new Error(`Container is limited to ${MAX_SEGMENTS} segments`);
+    }
+    const id = Array.from(raw.subarray(20), b => b.toString(16).padStart(2, '0')).join('');
+    return { raw, id, size, segmentSize, segmentCount: Math.max(1, Math.ceil(size / segmentSize)) };
+}
+
+function segmentParams(header, index) {
+    const iv = new Uint8Array(12);
+    iv.set(header.raw.subarray(20, 28), 0);
+    new DataView(iv.buffer).setUint32(8, index);
+
+    const additionalData = new Uint8Array(HEADER_BYTES + 5);
+    additionalData.set(header.raw, 0);
+    new DataView(additionalData.buffer).setUint32(HEADER_BYTES, index);
+    additionalData[HEADER_BYTES + 4] = index === header.segmentCount - 1 ? 1 : 0;
+    return { name: ALGO, iv, additionalData };
+}
+
+/**
+ * The slice of a File/Blob that makes up segment `index`
+ */
+export function segmentSlice(file, header, index) {
+    const start = index * header.segmentSize;
+    return file.slice(start, Math.min(start + header.segmentSize, header.size));
+}
+
+export async function sealSegment(header, index, plaintext, password) {
+    const key = await getKey(password);
+    return crypto.subtle.encrypt(segmentParams(header, index), key, plaintext);
+}
+
+export async function openSegment(header, index, sealed, password) {
+    const key = await getKey(password);
+    if (sealed.byteLength < TAG_BYTES) {
+        throw new Error(`Segment ${index} is truncated`);
+    }
+    return crypto.subtle.decrypt(segmentParams(header, index), key, sealed);
+}
+
+/**
+ * Fetches and decrypts every segment of a container, `concurrency` at a time.
+ * fetchSegment(index) must resolve to the sealed segment's ArrayBuffer.
+ * Returns: Blob
+ */
+export async function decryptContainer(headerBase64, fetchSegment, password, fileType,
+                                       { concurrency = 4, onProgress } = {}) {
+    const header = parseContainerHeader(headerBase64);
+    const parts = new Array(header.segmentCount);
+    let next = 0;
+    let done = 0;
+
+    const worker = async () => {
+        while (next < header.segmentCount) {
+            const index = next++;
+            parts[index] = await openSegment(header, index, await fetchSegment(index), password);
+            done++;
+            if (onProgress) onProgress(done, header.segmentCount);
+        }
+    };
+    await Promise.all(Array.from({ length: Math.min(concurrency, header.segmentCount) }, worker));
+    return new Blob(parts, { type: fileType });
+}
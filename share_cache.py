@@ -0,0 +1,133 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from log_pipeline import get_logger
+
+# LRU cache of resolved /api/shared-files/<key> responses.
+#
+# Entries are keyed by the (upper-cased) share key and indexed by owner so a
+# salt rotation in login or any write to the owner's files drops every key
+# that points at them. Size is capped by entry count and by an estimate of
+# the bytes held (ciphertext dominates), evicting least recently used first.
+# The TTL bounds staleness when another worker process did the write.
+#
+# A miss resolves the key and fetches the files outside the lock, so the
+# caller reads generation() before resolving and put() drops the result if
+# that owner was invalidated since. Only the most recent invalidations are
+# remembered; a put older than the ones forgotten is dropped as well.
+
+log = get_logger("share_cache")
+
+SHARE_CACHE_MAX_ENTRIES = int(os.environ.get("SHARE_CACHE_MAX_ENTRIES", 256))
+SHARE_CACHE_MAX_BYTES = int(os.environ.get("SHARE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+SHARE_CACHE_TTL = float(os.environ.get("SHARE_CACHE_TTL", 300))
+
+_RECORD_OVERHEAD = 512
+_TRACKED_INVALIDATIONS = 1024
+
+
+class ShareCache:
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._by_owner: Dict[str, Set[str]] = {}
+        self._generation = 0
+        # owner -> generation of its last invalidation, oldest first
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def _estimate(files: List[Dict[str, Any]]) -> int:
+        return sum(len(f.get("cipherContent") or "") + _RECORD_OVERHEAD for f in files)
+
+    def get(self, share_key: str) -> Optional[Tuple[Any, str, List[Dict[str, Any]]]]:
+        with self._lock:
+            entry = self._entries.get(share_key)
+            if entry is None or entry["expires"] < time.monotonic():
+                if entry is not None:
+                    self._drop(share_key)
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(share_key)
+            self.stats["hits"] += 1
+            return entry["owner_id"], entry["owner_name"], entry["files"]
+
+    def generation(self) -> int:
+        # Read before resolving the key; put() discards the result if its
+        # owner was invalidated while the lookup was in flight
+        with self._lock:
+            return self._generation
+
+    def put(self, share_key: str, owner_id: Any, owner_name: str, files: List[Dict[str, Any]],
+            generation: Optional[int] = None) -> None:
+        size = self._estimate(files)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and (generation < self._forgotten
+                                           or self._invalidated.get(str(owner_id), 0) > generation):
+                return
+            if share_key in self._entries:
+                self._drop(share_key)
+            self._entries[share_key] = {
+                "owner_id": owner_id,
+                "owner_name": owner_name,
+                "files": files,
+                "size": size,
+                "expires": time.monotonic() + self.ttl,
+            }
+            self._by_owner.setdefault(str(owner_id), set()).add(share_key)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.stats["evictions"] += 1
+
+    def invalidate_owner(self, owner_id: Any) -> int:
+        with self._lock:
+            self._generation += 1
+            self._invalidated.pop(str(owner_id), None)
+            self._invalidated[str(owner_id)] = self._generation
+            while len(self._invalidated) > _TRACKED_INVALIDATIONS:
+                _, self._forgotten = self._invalidated.popitem(last=False)
+            keys = self._by_owner.pop(str(owner_id), set())
+            for share_key in keys:
+                self._drop(share_key, unindex=False)
+            if keys:
+                self.stats["invalidations"] += len(keys)
+        if keys:
+            log.debug("Invalidated shared-files cache", extra={"owner_id": owner_id, "keys": len(keys)})
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_owner.clear()
+            self._bytes = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), bytes=self._bytes)
+
+    def _drop(self, share_key: str, unindex: bool = True) -> None:
+        entry = self._entries.pop(share_key, None)
+        if entry is None:
+            return
+        self._bytes -= entry["size"]
+        if unindex:
+            keys = self._by_owner.get(str(entry["owner_id"]))
+            if keys is not None:
+                keys.discard(share_key)
+                if not keys:
+                    del self._by_owner[str(entry["owner_id"])]
+
+
+shared_files_cache = ShareCache(SHARE_CACHE_MAX_ENTRIES, SHARE_CACHE_MAX_BYTES, SHARE_CACHE_TTL)
@@ -0,0 +1,178 @@
+import re
+import copy
+import uuid
+import threading
+from typing import Any, Dict, List, Optional
+
+# In-memory stand-in for the subset of the supabase-py client this repo uses
+# (table/select/insert/update/delete, eq/neq/lt/lte/gt/gte/in_, order, limit,
+# count="exact" and "rel(cols)" embedding). It lets the server tests and the
+# repository conformance tests run offline.
+#
+#   client = StandinClient({"users": [...], "files": [...]})
+#   client.table("files").select("id, name").eq("owner_id", "42").execute().data
+
+_EMBED = re.compile(r"^(\w+)\((.*)\)$")
+
+
+class StandinError(Exception):
+    pass
+
+
+class StandinResponse:
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def _text(value: Any) -> Any:
+    return None if value is None else str(value)
+
+
+class _Query:
+    def __init__(self, client: "StandinClient", table: str):
+        self.client = client
+        self.table_name = table
+        self.action = "select"
+        self.columns = "*"
+        self.count_mode = None
+        self.payload: Any = None
+        self.filters = []
+        self.ordering = None
+        self.row_limit = None
+
+    # -- actions --
+    def select(self, columns: str = "*", count: Optional[str] = None, head: bool = False) -> "_Query":
+        self.action, self.columns, self.count_mode = "select", columns, count
+        return self
+
+    def insert(self, payload: Any) -> "_Query":
+        self.action, self.payload = "insert", payload
+        return self
+
+    def update(self, payload: Dict[str, Any]) -> "_Query":
+        self.action, self.payload = "update", payload
+        return self
+
+    def delete(self) -> "_Query":
+        self.action = "delete"
+        return self
+
+    # -- filters --
+    def _filter(self, op: str, column: str, value: Any) -> "_Query":
+        self.filters.append((op, column, value))
+        return self
+
+    def eq(self, column, value): return self._filter("eq", column, value)
+    def neq(self, column, value): return self._filter("neq", column, value)
+    def lt(self, column, value): return self._filter("lt", column, value)
+    def lte(self, column, value): return self._filter("lte", column, value)
+    def gt(self, column, value): return self._filter("gt", column, value)
+    def gte(self, column, value): return self._filter("gte", column, value)
+    def in_(self, column, values): return self._filter("in", column, list(values))
+
+    def order(self, column: str, desc: bool = False) -> "_Query":
+        self.ordering = (column, desc)
+        return self
+
+    def limit(self, n: int) -> "_Query":
+        self.row_limit = n
+        return self
+
+    # -- execution --
+    def _matches(self, row: Dict[str, Any]) -> bool:
+        for op, column, value in self.filters:
+            if column not in row and self.client.strict_columns:
+                raise StandinError(f"column {self.table_name}.{column} does not exist")
+            have = row.get(column)
+            if op == "eq" and _text(have) != _text(value):
+                return False
+            if op == "neq" and _text(have) == _text(value):
+                return False
+            if op == "in" and _text(have) not in {_text(v) for v in value}:
+                return False
+            if op in ("lt", "lte", "gt", "gte"):
+                if have is None:
+                    return False
+                if op == "lt" and not have < value:
+                    return False
+                if op == "lte" and not have <= value:
+                    return False
+                if op == "gt" and not have > value:
+                    return False
+                if op == "gte" and not have >= value:
+                    return False
+        return True
+
+    def _project(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        fields = [f.strip() for f in re.split(r",(?![^(]*\))", self.columns) if f.strip()]
+        out: Dict[str, Any] = {}
+        for field in fields:
+            embed = _EMBED.match(field)
+            if field == "*":
+                out.update(copy.deepcopy(row))
+            elif embed:
+                related, cols = embed.group(1), [c.strip() for c in embed.group(2).split(",") if c.strip()]
+                fk = row.get(related[:-1] + "_id" if related.endswith("s") else related + "_id")
+                target = next((r for r in self.client.rows(related) if _text(r.get("id")) == _text(fk)), None)
+                out[related] = None if target is None else (
+                    copy.deepcopy(target) if not cols or "*" in cols else {c: target.get(c) for c in cols})
+            else:
+                if field not in row and self.client.strict_columns and self.client.rows(self.table_name):
+                    raise StandinError(f"column {self.table_name}.{field} does not exist")
+                out[field] = copy.deepcopy(row.get(field))
+        return out
+
+    def execute(self) -> StandinResponse:
+        with self.client.lock:
+            self.client.calls.append((self.table_name, self.action))
+            if self.table_name in self.client.missing_tables:
+                raise StandinError(f"relation \"public.{self.table_name}\" does not exist")
+            rows = self.client.rows(self.table_name)
+
+            if self.action == "insert":
+                new_rows = self.payload if isinstance(self.payload, list) else [self.payload]
+                inserted = []
+                for r in new_rows:
+                    r = copy.deepcopy(r)
+                    r.setdefault("id", str(uuid.uuid4()))
+                    rows.append(r)
+                    inserted.append(copy.deepcopy(r))
+                return StandinResponse(inserted)
+
+            matched = [r for r in rows if self._matches(r)]
+
+            if self.action == "update":
+                for r in matched:
+                    r.update(copy.deepcopy(self.payload))
+                return StandinResponse([copy.deepcopy(r) for r in matched])
+
+            if self.action == "delete":
+                ids = {id(r) for r in matched}
+                rows[:] = [r for r in rows if id(r) not in ids]
+                return StandinResponse([copy.deepcopy(r) for r in matched])
+
+            count = len(matched) if self.count_mode == "exact" else None
+            if self.ordering:
+                column, desc = self.ordering
+                matched.sort(key=lambda r: (r.get(column) is None, r.get(column) if r.get(column) is not None else ""),
+                             reverse=desc)
+            if self.row_limit is not None:
+                matched = matched[:self.row_limit]
+            return StandinResponse([self._project(r) for r in matched], count)
+
+
+class StandinClient:
+    def __init__(self, tables: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+                 missing_tables: Optional[List[str]] = None, strict_columns: bool = False):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {k: [dict(r) for r in v] for k, v in (tables or {}).items()}
+        self.missing_tables = set(missing_tables or [])
+        self.strict_columns = strict_columns
+        self.calls: List[Any] = []
+        self.lock = threading.RLock()
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        return self.tables.setdefault(table, [])
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
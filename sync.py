@@ -0,0 +1,138 @@
+import base64
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional
+
+from usage import record_bytes
+
+# Delta sync bookkeeping for POST /api/files/<user_id>[/sync].
+#
+# The server keeps a per-user manifest {name: entry} in the local store
+# (db.json "manifests") so it can tell what changed without re-reading
+# ciphertext from Supabase. An entry records:
+#   size    - plaintext size reported by the client
+#   hash    - sha256 hex of the raw ciphertext bytes (the "content hash")
+#   bytes   - length of the raw ciphertext, for storage accounting (usage.py);
+#             for a chunked container, the header plus all of its segments
+#   meta    - the user-visible metadata (META_FIELDS), so a re-post with a
+#             changed category/verdict is still written
+#   version - optional client-supplied counter; a higher version always wins
+#   pending - set while the row is only in db.json because the Supabase
+#             write failed; such files are asked for again until it succeeds
+#
+# The upload path and the handshake decide "unchanged" with the same rule
+# (is_unchanged). Handshake items may carry META_FIELDS too; fields a client
+# leaves out (e.g. the SDK, which only tracks content) aren't compared.
+
+MANIFESTS_KEY = "manifests"
+
+META_FIELDS = ("type", "category", "riskLevel", "verdict")
+
+
+class ManifestError(ValueError):
+    pass
+
+
+def _ciphertext(cipher_b64: Optional[str]) -> bytes:
+    return base64.b64decode(cipher_b64) if cipher_b64 else b""
+
+
+def content_hash(cipher_b64: Optional[str]) -> str:
+    return hashlib.sha256(_ciphertext(cipher_b64)).hexdigest()
+
+
+def _version(value: Any) -> int:
+    if value is None:
+        return 0
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ManifestError(f"version must be an integer, got {value!r}")
+    return value
+
+
+def build_entry(file: Dict[str, Any]) -> Dict[str, Any]:
+    raw = _ciphertext(file.get("cipherContent") or file.get("cipher_content"))
+    return {
+        "id": file.get("id"),
+        "size": file.get("size"),
+        "hash": hashlib.sha256(raw).hexdigest(),
+        "bytes": record_bytes(file),
+        "meta": {field: file.get(field) for field in META_FIELDS},
+        "version": _version(file.get("version")),
+    }
+
+
+def read_client_manifest(items: Any) -> List[Dict[str, Any]]:
+    # Validates the handshake's manifest list into entries is_unchanged understands
+    if not isinstance(items, list):
+        raise ManifestError("manifest must be a list")
+    entries = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ManifestError("manifest items must be objects")
+        name = item.get("name")
+        if not isinstance(name, str) or not name:
+            raise ManifestError("manifest items need a name")
+        entries.append({
+            "name": name,
+            "size": item.get("size"),
+            "hash": item.get("hash"),
+            "meta": {field: item[field] for field in META_FIELDS if field in item},
+            "version": _version(item.get("version")),
+        })
+    return entries
+
+
+def build_manifest(files: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    return {f["name"]: build_entry(f) for f in files if isinstance(f, dict) and f.get("name")}
+
+
+def get_manifest(local_db: Dict[str, Any], user_id: Any) -> Optional[Dict[str, Dict[str, Any]]]:
+    manifests = local_db.get(MANIFESTS_KEY)
+    if not isinstance(manifests, dict):
+        return None
+    return manifests.get(str(user_id))
+
+
+def set_manifest(local_db: Dict[str, Any], user_id: Any, manifest: Dict[str, Dict[str, Any]]) -> None:
+    if not isinstance(local_db.get(MANIFESTS_KEY), dict):
+        local_db[MANIFESTS_KEY] = {}
+    local_db[MANIFESTS_KEY][str(user_id)] = manifest
+
+
+def is_unchanged(stored: Optional[Dict[str, Any]], entry: Dict[str, Any]) -> bool:
+    if not stored or stored.get("pending"):
+        return False
+    if stored.get("hash") != entry["hash"] or stored.get("size") != entry["size"]:
+        return False
+    meta = stored.get("meta")
+    if entry["meta"]:
+        # Manifests written before META_FIELDS hold a digest here; treat as changed
+        if not isinstance(meta, dict) or any(meta.get(k) != v for k, v in entry["meta"].items()):
+            return False
+    return entry["version"] <= (stored.get("version") or 0)
+
+
+def diff_manifest(manifest: Dict[str, Dict[str, Any]], client_entries: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    # Compare the client's entries (from read_client_manifest) with ours.
+    # need:    server wants these uploaded
+    # stale:   server holds a newer version; client should pull instead
+    # unchanged / remote_only: informational
+    need, stale, unchanged = [], [], []
+    seen = set()
+    for entry in client_entries:
+        name = entry["name"]
+        seen.add(name)
+        stored = manifest.get(name)
+        if is_unchanged(stored, entry):
+            unchanged.append(name)
+        elif stored and not stored.get("pending") and stored.get("hash") != entry["hash"] \
+                and entry["version"] < (stored.get("version") or 0):
+            stale.append(name)
+        else:
+            need.append(name)
+
+    return {
+        "need": need,
+        "stale": stale,
+        "unchanged": unchanged,
+        "remote_only": [name for name in manifest if name not in seen],
+    }
@@ -0,0 +1,156 @@
+import io
+import os
+import base64
+import hashlib
+from urllib.parse import urlsplit
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+from cloudvault_client import container, crypto, transfer
+from cloudvault_client.client import VaultClient, VaultError
+
+# The Python SDK: compatibility with services/encryption.js and
+# constants.js (vectors produced by the browser code under Node's
+# WebCrypto), and push/pull against the Flask app (conftest.py).
+#
+#   python -m pytest -q test_client.py
+
+USER = "u1"
+PASSWORD = "A1B2C3D4"
+
+# encryptFile("hello cloudvault") with IV 01..0c
+LEGACY_CIPHER = "khR+CAillnpSGHfToe3lbUdc2OiBAOMsRQi0CqIZTlE="
+LEGACY_IV = "AQIDBAUGBwgJCgsM"
+
+# 16484 bytes of i % 251 in 16 KiB segments, container id a0..af;
+# SHA-256 of each sealSegment() result
+CONTAINER_HEADER = "Q1ZDMQEAAAAAAEAAAAAAAAAAQGSgoaKjpKWmp6ipqqusra6v"
+CONTAINER_PLAINTEXT = bytes(i % 251 for i in range(16384 + 100))
+CONTAINER_SEGMENTS = ["1b5e6b0cb3ea8691c8e3fa7963a766b14ea7163c5adb6543309f6bcad5dca129",
+                      "6f9950a382f47ef34af9869b13430364a1c416577d934a0e5af6258c3ca93253"]
+
+
+def test_legacy_records_match_encryption_js(monkeypatch):
+    assert crypto.decrypt_bytes(LEGACY_CIPHER, LEGACY_IV, PASSWORD) == b"hello cloudvault"
+    monkeypatch.setattr(crypto.os, "urandom", lambda n: bytes(range(1, n + 1)))
+    assert crypto.encrypt_bytes(b"hello cloudvault", PASSWORD) == (LEGACY_CIPHER, LEGACY_IV)
+    with pytest.raises(InvalidTag):
+        crypto.decrypt_bytes(LEGACY_CIPHER, LEGACY_IV, "WRONGKEY")
+
+
+def test_containers_match_encryption_js():
+    header = container.parse_header(base64.b64decode(CONTAINER_HEADER))
+    assert (header.segment_size, header.size, header.segment_count) == (16384, 16484, 2)
+    assert header.id == bytes(range(0xa0, 0xb0)).hex()
+    for index, digest in enumerate(CONTAINER_SEGMENTS):
+        plain = CONTAINER_PLAINTEXT[index * 16384:(index + 1) * 16384]
+        sealed = container.seal_segment(header, index, plain, PASSWORD)
+        assert hashlib.sha256(sealed).hexdigest() == digest
+        assert container.open_segment(header, index, sealed, PASSWORD) == plain
+
+
+def test_content_hash_and_share_key():
+    assert crypto.content_hash(LEGACY_CIPHER) == hashlib.sha256(base64.b64decode(LEGACY_CIPHER)).hexdigest()
+    assert crypto.content_hash(None) == hashlib.sha256(b"").hexdigest()
+    # generateDynamicKey(userId, salt)
+    assert crypto.share_key("42", "abcdefghijklmnop") == "32013B86"
+    assert crypto.share_key("user-ü✓") == "27BDE8C0"
+    assert crypto.share_key(7, "x") == "721"
+
+
+class FlaskAdapter(HTTPAdapter):
+    # Sends a requests.Session's traffic to a Flask test client; replies go
+    # through urllib3 so Content-Encoding is decoded as on the wire
+    def __init__(self, http):
+        super().__init__()
+        self.http = http
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        path = url.path + (f"?{url.query}" if url.query else "")
+        self.sent.append((request.method, url.path))
+        reply = self.http.open(path, method=request.method, data=request.body, headers=dict(request.headers))
+        raw = HTTPResponse(body=io.BytesIO(reply.get_data()), headers=list(reply.headers.items()),
+                           status=reply.status_code, preload_content=False, decode_content=True)
+        return self.build_response(request, raw)
+
+
+@pytest.fixture
+def vault(server_env, monkeypatch):
+    client = VaultClient("http://vault.test")
+    adapter = FlaskAdapter(server_env.http)
+    client.session.mount("http://", adapter)
+    client.adapter = adapter
+    client.user = {"id": USER, "session_salt": "s" * 16}
+    # Small files go through the chunked path in 16 KiB segments
+    monkeypatch.setattr(transfer, "CHUNKED_BYTES", 32 * 1024)
+    monkeypatch.setattr(transfer, "new_header", lambda size: container.new_header(size, container.MIN_SEGMENT_SIZE))
+    return client
+
+
+def _tree(root):
+    os.makedirs(os.path.join(root, "docs"))
+    files = {"a.txt": b"alpha", "docs/b.txt": b"bravo" * 100, "big.bin": os.urandom(40000)}
+    for name, data in files.items():
+        with open(os.path.join(root, name), "wb") as f:
+            f.write(data)
+    return files
+
+
+def _segment_puts(vault):
+    return [path.rsplit("/", 1)[1] for method, path in vault.adapter.sent if method == "PUT"]
+
+
+def test_push_resumes_and_pulls_back(vault, tmp_path, monkeypatch):
+    src, dst = str(tmp_path / "src"), str(tmp_path / "dst")
+    files = _tree(src)
+    key = vault.share_key
+
+    # Segment 1 of big.bin fails the first time
+    put_segment = vault.put_segment
+
+    def flaky(container_id, number, sealed):
+        if number == 1 and not flaky.failed:
+            flaky.failed = True
+            raise VaultError(503, "try later")
+        return put_segment(container_id, number, sealed)
+    flaky.failed = False
+    monkeypatch.setattr(vault, "put_segment", flaky)
+
+    first = transfer.push(vault, src, key, workers=2)
+    assert sorted(first["uploaded"]) == ["a.txt", "docs/b.txt"]
+    assert list(first["failed"]) == ["big.bin"]
+    assert sorted(_segment_puts(vault)) == ["0", "2"]
+
+    # Only the missing segment is sent, nothing else is re-encrypted
+    vault.adapter.sent.clear()
+    second = transfer.push(vault, src, key, workers=2)
+    assert second["uploaded"] == ["big.bin"] and second["unchanged"] == 2 and not second["failed"]
+    assert _segment_puts(vault) == ["1"]
+
+    third = transfer.push(vault, src, key)
+    assert third["uploaded"] == [] and third["unchanged"] == 3
+
+    pulled = transfer.pull(vault, dst, key)
+    assert sorted(pulled["downloaded"]) == sorted(files) and not pulled["failed"]
+    for name, data in files.items():
+        with open(os.path.join(dst, name), "rb") as f:
+            assert f.read() == data
+    assert transfer.pull(vault, dst, key)["skipped"]
+
+
+def test_pull_with_the_wrong_key_reports_failures(vault, tmp_path):
+    _tree(str(tmp_path / "src"))
+    transfer.push(vault, str(tmp_path / "src"), vault.share_key)
+    report = transfer.pull(vault, str(tmp_path / "dst"), "WRONGKEY")
+    assert report["downloaded"] == [] and sorted(report["failed"]) == ["a.txt", "big.bin", "docs/b.txt"]
+
+
+def test_client_errors_carry_the_status(vault):
+    with pytest.raises(VaultError) as e:
+        vault.container_status("00" * 16)
+    assert e.value.status == 404
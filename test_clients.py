@@ -0,0 +1,100 @@
+import pytest
+
+import clients
+from supabase_standin import StandinClient
+
+# clients.py against a supabase_standin client: what the schema probe
+# records for missing vs. erroring columns, how often it re-runs, and the
+# remembered failure when the Supabase client can't be built.
+#
+#   python -m pytest -q test_clients.py
+
+
+class FlakyClient(StandinClient):
+    # Selecting session_salt times out while `flaky` is set
+    flaky = True
+
+    def table(self, name):
+        query = super().table(name)
+        select = query.select
+
+        def selecting(columns="*", **kwargs):
+            if self.flaky and "session_salt" in columns:
+                raise TimeoutError("canceling statement due to statement timeout")
+            return select(columns, **kwargs)
+        query.select = selecting
+        return query
+
+
+@pytest.fixture
+def probe(monkeypatch):
+    def use(client, interval=30.0):
+        monkeypatch.setattr(clients, "get_supabase", lambda: client)
+        monkeypatch.setattr(clients, "SCHEMA_PROBE_INTERVAL", interval)
+        return client
+    monkeypatch.setattr(clients, "_schema", None)
+    monkeypatch.setattr(clients, "_schema_probed_at", 0.0)
+    return use
+
+
+def _users(**extra):
+    return {"users": [dict({"id": 1, "username": "a"}, **extra)]}
+
+
+def test_missing_column_is_recorded_as_absent(probe):
+    probe(StandinClient(_users(), missing_tables=["access_logs"], strict_columns=True))
+
+    schema = clients.probe_schema()
+    assert schema["supabase"] and schema["settled"]
+    assert clients.has_column("users", "session_salt") is False
+    assert schema["tables"]["access_logs"]["exists"] is False
+
+
+def test_probe_errors_are_unknown_and_retried(probe):
+    client = probe(FlakyClient(_users(session_salt="s")), interval=0)
+
+    schema = clients.probe_schema()
+    assert not schema["settled"]
+    assert clients.has_column("users", "session_salt") is None
+    assert "timeout" in schema["tables"]["users"]["column_errors"]["session_salt"]
+
+    client.flaky = False
+    assert clients.probe_schema()["settled"]
+    assert clients.has_column("users", "session_salt") is True
+
+
+def test_refresh_is_throttled(probe):
+    client = probe(StandinClient(_users(session_salt="s")))
+
+    clients.probe_schema()
+    probes = len(client.calls)
+    clients.probe_schema(refresh=True)
+    assert len(client.calls) == probes
+
+    clients.SCHEMA_PROBE_INTERVAL = 0
+    clients.probe_schema(refresh=True)
+    assert len(client.calls) == 2 * probes
+
+
+def test_is_missing():
+    assert clients.is_missing('column users.session_salt does not exist', "session_salt")
+    assert clients.is_missing("{'code': 'PGRST204', 'message': \"Could not find the 'session_salt' column\"}", "session_salt")
+    assert not clients.is_missing("timeout while selecting session_salt", "session_salt")
+    assert not clients.is_missing('column users.other does not exist', "session_salt")
+
+
+def test_unconfigured_supabase_is_remembered(monkeypatch):
+    monkeypatch.setattr(clients, "_supabase", None)
+    monkeypatch.setattr(clients, "_supabase_failure", None)
+    monkeypatch.setattr(clients, "_env_loaded", True)
+    monkeypatch.setenv("SUPABASE_URL", "")
+
+    with pytest.raises(RuntimeError, match="not set"):
+        clients.get_supabase()
+    retry_at = clients._supabase_failure[1]
+
+    # Later calls re-raise without rebuilding (or re-stamping) anything
+    monkeypatch.setenv("SUPABASE_URL", "https://example.supabase.co")
+    with pytest.raises(RuntimeError, match="unavailable"):
+        clients.get_supabase()
+    assert clients._supabase_failure[1] == retry_at and clients._supabase is None
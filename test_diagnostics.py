@@ -0,0 +1,152 @@
+import json
+
+import diagnostics
+from cloudvault_client.crypto import share_key
+from supabase_standin import StandinClient
+
+# Runs the diagnostics command offline: Supabase is a supabase_standin
+# client and db.json a temporary file.
+#
+#   python -m pytest -q test_diagnostics.py
+
+USERS = [
+    {"id": "u1", "email": "a@example.com", "username": "a", "session_salt": "s1"},
+    {"id": "u2", "email": "b@example.com", "username": "b", "session_salt": None},
+]
+
+FILES = [
+    {"id": "f1", "owner_id": "u1", "name": "report.pdf", "size": 10, "iv": "iv1", "cipher_content": "AAAA"},
+    {"id": "f2", "owner_id": "u1", "name": "photo.png", "size": 20, "iv": "iv2", "cipher_content": "BBBB"},
+]
+
+
+def _write_db(path, users=USERS, files=FILES, requests=(), notifications=()):
+    local = {}
+    for f in files:
+        local.setdefault(f["owner_id"], []).append({
+            "id": f["id"], "ownerId": f["owner_id"], "name": f["name"], "size": f["size"],
+            "iv": f["iv"], "cipherContent": f["cipher_content"],
+        })
+    with open(path, "w") as fh:
+        json.dump({
+            "users": {u["email"]: u for u in users},
+            "files": local,
+            "access_requests": list(requests),
+            "notifications": list(notifications),
+        }, fh)
+    return str(path)
+
+
+def _client(**kwargs):
+    return StandinClient({"users": USERS, "files": FILES, "access_requests": [], "system_notifications": []}, **kwargs)
+
+
+def test_probes_tables_columns_and_counts(tmp_path):
+    client = _client(missing_tables=["access_logs"], strict_columns=True)
+    report = diagnostics.run(client, db_path=_write_db(tmp_path / "db.json"))
+
+    tables = report["tables"]
+    assert tables["files"]["exists"] and tables["files"]["rows"] == 2
+    assert tables["users"]["rows"] == 2
+    assert tables["users"]["latency_ms"] >= 0
+    assert not tables["access_logs"]["exists"]
+    # Seeded rows don't carry every column the API writes
+    assert "created_at" in tables["users"]["missing_columns"]
+    assert not report["ok"]
+    assert "table access_logs is missing" in report["problems"]
+
+
+class TimingOutClient(StandinClient):
+    # Probes of users.session_salt and of the whole access_logs table time out
+    def table(self, name):
+        query = super().table(name)
+        select = query.select
+
+        def selecting(columns="*", **kwargs):
+            if name == "access_logs" or (name == "users" and columns == "session_salt"):
+                raise TimeoutError("canceling statement due to statement timeout")
+            return select(columns, **kwargs)
+        query.select = selecting
+        return query
+
+
+def test_probe_errors_are_not_reported_as_missing(tmp_path, capsys):
+    client = TimingOutClient({"users": USERS, "files": FILES, "access_requests": [], "system_notifications": []})
+    path = _write_db(tmp_path / "db.json")
+    report = diagnostics.run(client, db_path=path)
+
+    users = report["tables"]["users"]
+    assert "session_salt" not in users["missing_columns"]
+    assert "timeout" in users["column_errors"]["session_salt"]
+    assert report["tables"]["access_logs"]["exists"] is None
+    assert report["ok"] and len(report["errors"]) == 2
+
+    assert diagnostics.main(["--db", path], client=client) == 2
+    text = capsys.readouterr().out
+    assert "access_logs" in text and "ERROR" in text and "unchecked: session_salt" in text
+
+
+def test_in_sync_stores_report_no_drift(tmp_path):
+    report = diagnostics.run(_client(), db_path=_write_db(tmp_path / "db.json"))
+
+    assert report["local_db"]["issues"] == []
+    assert report["local_db"]["records"]["files"] == 2
+    assert all(info["in_sync"] for info in report["drift"].values())
+
+
+def test_drift_between_supabase_and_local(tmp_path):
+    changed = dict(FILES[1], iv="iv2-new")
+    extra = {"id": "f3", "owner_id": "u1", "name": "local.txt", "size": 1, "iv": "iv3", "cipher_content": "CCCC"}
+    path = _write_db(tmp_path / "db.json", files=[changed, extra])
+
+    drift = diagnostics.run(_client(), db_path=path)["drift"]["files"]
+    assert drift["only_supabase"] == ["f1"]
+    assert drift["only_local"] == ["f3"]
+    assert drift["changed"] == {"f2": ["iv"]}
+    assert not drift["in_sync"]
+
+
+def test_local_integrity_issues(tmp_path):
+    broken = dict(FILES[0], cipher_content="not base64!")
+    orphan = {"id": "f9", "owner_id": "ghost", "name": "x", "size": 1, "iv": "iv", "cipher_content": "AAAA"}
+    requests = [{"id": "r1", "file_id": "missing", "owner_id": "u1", "status": "pending"}]
+    path = _write_db(tmp_path / "db.json", files=[broken, orphan], requests=requests)
+
+    issues = diagnostics.check_local_db(path)["issues"]
+    assert any("unreadable ciphertext" in i for i in issues)
+    assert any("unknown user ghost" in i for i in issues)
+    assert any("missing file missing" in i for i in issues)
+
+
+def test_unparseable_db_is_reported(tmp_path):
+    path = tmp_path / "db.json"
+    path.write_text("{not json")
+
+    report = diagnostics.run(None, db_path=str(path))
+    assert report["tables"] is None and report["drift"] is None
+    assert "does not parse" in report["local_db"]["issues"][0]
+    assert not report["ok"]
+
+
+def test_share_keys_are_recomputed_and_collisions_flagged():
+    report = diagnostics.check_share_keys(USERS + [{"id": "u1", "session_salt": "s1"}], show_keys=True)
+    assert report["users"] == 2
+    assert report["keys"] == {"u1": share_key("u1", "s1"), "u2": share_key("u2")}
+    assert report["legacy"] == ["u2"]
+    assert report["collisions"] == {}
+
+    # "Aa" and "BB" hash alike under the 31x string hash the key is built on
+    twins = diagnostics.check_share_keys([{"id": "Aa", "session_salt": "x"}, {"id": "BB", "session_salt": "x"}])
+    assert twins["collisions"] == {share_key("Aa", "x"): ["Aa", "BB"]}
+
+
+def test_cli_json_and_text_output(tmp_path, capsys):
+    path = _write_db(tmp_path / "db.json")
+
+    assert diagnostics.main(["--json", "--db", path], client=_client()) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert set(report) >= {"tables", "local_db", "share_keys", "drift", "ok"}
+
+    assert diagnostics.main(["--offline", "--db", path]) == 0
+    text = capsys.readouterr().out
+    assert "skipped (offline)" in text and text.rstrip().endswith("OK")
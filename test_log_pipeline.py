@@ -0,0 +1,100 @@
+import sys
+import json
+import queue
+import logging
+import logging.handlers
+
+from flask import Flask
+
+import log_pipeline
+from log_pipeline import DroppingQueueHandler, JsonFormatter, PeriodicFlusher, RequestContextFilter
+
+# log_pipeline: the JSON line format, request context on records, the
+# drop-on-full queue handler and the timed flush of buffered output.
+#
+#   python -m pytest -q test_log_pipeline.py
+
+
+class Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _record(msg="hello %s", args=("world",), level=logging.INFO, **extra):
+    record = logging.LogRecord("cloudvault.test", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_record_shape():
+    line = json.loads(JsonFormatter().format(_record(user_id="u1", latency_ms=1.5)))
+
+    assert set(line) == {"ts", "level", "logger", "msg", "user_id", "latency_ms"}
+    assert (line["level"], line["logger"], line["msg"]) == ("INFO", "cloudvault.test", "hello world")
+    assert line["ts"].endswith("Z") and line["user_id"] == "u1"
+
+
+def test_exceptions_are_rendered_before_queueing():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = _record("failed", (), level=logging.ERROR)
+        record.exc_info = sys.exc_info()
+
+    prepared = DroppingQueueHandler(queue.Queue()).prepare(record)
+    line = json.loads(JsonFormatter().format(prepared))
+    assert prepared.exc_info is None and "ValueError: boom" in line["exc"]
+
+
+def test_request_id_propagates_to_records_and_response():
+    app = Flask(__name__)
+    log_pipeline.init_app(app)
+    capture = Capture()
+    capture.addFilter(RequestContextFilter())
+    logger = log_pipeline.get_logger("test-request")
+    logger.addHandler(capture)
+
+    @app.route("/things/<user_id>")
+    def things(user_id):
+        logger.info("listing")
+        return "ok"
+
+    try:
+        res = app.test_client().get("/things/u1", headers={"X-Request-ID": "abc123"})
+        generated = app.test_client().get("/things/u2")
+    finally:
+        logger.removeHandler(capture)
+
+    assert res.headers["X-Request-ID"] == "abc123"
+    first, second = capture.records
+    assert (first.request_id, first.route, first.method, first.user_id) == ("abc123", "/things/<user_id>", "GET", "u1")
+    assert second.request_id == generated.headers["X-Request-ID"] and len(second.request_id) == 16
+
+
+def test_full_queue_drops_and_counts():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    for _ in range(5):
+        handler.handle(_record())
+
+    assert handler.queue.qsize() == 2 and handler.dropped == 3
+
+
+def test_buffered_records_are_flushed_on_a_timer():
+    capture = Capture()
+    buffered = logging.handlers.MemoryHandler(64, flushLevel=logging.WARNING, target=capture)
+    flusher = PeriodicFlusher([buffered], 0.01)
+    flusher.start()
+    try:
+        buffered.handle(_record())
+        for _ in range(200):
+            if capture.records:
+                break
+            flusher._stop.wait(0.01)
+    finally:
+        flusher.stop()
+
+    assert len(capture.records) == 1
@@ -0,0 +1,145 @@
+import secrets
+
+import pytest
+
+import rate_limit
+from rate_limit import MemoryStore, RateLimiter
+
+# Token buckets, strike escalation and the negative share-key cache, on a
+# MemoryStore with a fake clock; plus forget_bad_key on login through the
+# Flask test client (fixture in conftest.py).
+#
+#   python -m pytest -q test_rate_limit.py
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    monkeypatch.setitem(rate_limit.LIMITS, "share", (1.0, 3.0, 100.0, 100.0))
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_STRIKES", 3)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_STRIKE_WINDOW", 600)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_BACKOFF_BASE", 30)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_BACKOFF_MAX", 100)
+    return clock
+
+
+def test_bucket_allows_a_burst_then_refills(clock):
+    limiter = RateLimiter(MemoryStore())
+    assert [limiter.check("share", "c1")[0] for _ in range(3)] == [True, True, True]
+
+    allowed, retry_after, reason = limiter.check("share", "c1")
+    assert not allowed and reason == "client" and retry_after == pytest.approx(1.0)
+    # Other clients have their own bucket
+    assert limiter.check("share", "c2")[0]
+
+    clock.advance(1)
+    assert limiter.check("share", "c1")[0]
+    assert not limiter.check("share", "c1")[0]
+    clock.advance(60)
+    assert [limiter.check("share", "c1")[0] for _ in range(4)] == [True, True, True, False]
+
+
+def test_global_bucket_limits_all_clients(clock, monkeypatch):
+    monkeypatch.setitem(rate_limit.LIMITS, "share", (100.0, 100.0, 1.0, 2.0))
+    limiter = RateLimiter(MemoryStore())
+
+    assert limiter.check("share", "c1")[0] and limiter.check("share", "c2")[0]
+    assert limiter.check("share", "c3")[2] == "global"
+
+
+def test_strikes_block_with_doubling_backoff(clock):
+    limiter = RateLimiter(MemoryStore())
+    for _ in range(2):
+        limiter.record_failure("c1")
+    assert limiter.check("share", "c1")[0]
+
+    limiter.record_failure("c1")
+    allowed, retry_after, reason = limiter.check("share", "c1")
+    assert not allowed and reason == "backoff" and retry_after == pytest.approx(30)
+
+    clock.advance(31)
+    assert limiter.check("share", "c1")[0]
+    for _ in range(3):
+        limiter.record_failure("c1")
+    assert limiter.check("share", "c1")[1] == pytest.approx(60)
+
+    # Capped at RATE_LIMIT_BACKOFF_MAX
+    clock.advance(61)
+    for _ in range(3):
+        limiter.record_failure("c1")
+    assert limiter.check("share", "c1")[1] == pytest.approx(100)
+
+
+def test_strikes_outside_the_window_are_forgotten(clock):
+    limiter = RateLimiter(MemoryStore())
+    limiter.record_failure("c1")
+    limiter.record_failure("c1")
+    clock.advance(601)
+    limiter.record_failure("c1")
+    assert limiter.check("share", "c1")[0]
+
+
+def test_negative_key_cache_expires_and_can_be_forgotten(clock):
+    limiter = RateLimiter(MemoryStore())
+    assert not limiter.is_known_bad_key("K1")
+    limiter.remember_bad_key("K1")
+    assert limiter.is_known_bad_key("K1")
+
+    clock.advance(rate_limit.NEGATIVE_KEY_TTL + 1)
+    assert not limiter.is_known_bad_key("K1")
+
+    limiter.remember_bad_key("K1")
+    limiter.forget_bad_key("K1")
+    assert not limiter.is_known_bad_key("K1")
+
+
+def test_login_forgets_its_new_key(server_env, monkeypatch):
+    server = server_env.server
+    server_env.http.post("/api/register", json={"email": "a@example.com", "password": "pw"})
+    user_id = server_env.client.rows("users")[0]["id"]
+    monkeypatch.setattr(secrets, "choice", lambda alphabet: alphabet[0])
+    key = server.generate_dynamic_key(user_id, "a" * 16)
+
+    # Guessed before the login that mints it: cached as a bad key
+    assert server_env.http.get(f"/api/shared-files/{key}").status_code == 404
+    assert server.limiter.is_known_bad_key(key)
+
+    assert server_env.http.post("/api/login", json={"email": "a@example.com", "password": "pw"}).status_code == 200
+    assert server_env.http.get(f"/api/shared-files/{key}").status_code == 200
+
+
+class BrokenStore:
+    def update(self, key, fn, ttl):
+        raise rate_limit.sqlite3.OperationalError("database is locked")
+
+    def clear(self, prefix=""):
+        raise rate_limit.sqlite3.OperationalError("database is locked")
+
+
+def test_store_errors_fail_open(server_env, monkeypatch):
+    import metrics
+
+    limiter = RateLimiter(BrokenStore())
+    monkeypatch.setattr(rate_limit, "limiter", limiter)
+    monkeypatch.setattr(server_env.server, "limiter", limiter)
+    before = metrics.snapshot()["counters"].get("rate_limit.store_errors", 0)
+
+    server_env.http.post("/api/register", json={"email": "a@example.com", "password": "pw"})
+    user = server_env.http.post("/api/login", json={"email": "a@example.com", "password": "pw"})
+    assert user.status_code == 200
+    key = server_env.server.generate_dynamic_key(user.get_json()["id"], user.get_json()["session_salt"])
+    assert server_env.http.get(f"/api/shared-files/{key}").status_code == 200
+    assert server_env.http.get("/api/shared-files/NOPE").status_code == 404
+    assert metrics.snapshot()["counters"]["rate_limit.store_errors"] > before
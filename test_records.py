@@ -0,0 +1,67 @@
+from records import AccessRequestRecord, FileRecord, NotificationRecord, UserRecord, load_records
+
+# The exec-compiled loaders and serializers in records.py, round-tripped
+# against rows shaped like Supabase's (snake_case) and db.json's (the
+# frontend's camelCase for files).
+#
+#   python -m pytest -q test_records.py
+
+SUPABASE_FILE = {
+    "id": "f1", "owner_id": "u1", "name": "a.txt", "size": 12, "type": "text/plain", "url": "",
+    "category": "doc", "risk_level": "low", "verdict": "clean", "uploaded_at": "2026-03-01T00:00:00Z",
+    "cipher_content": "QUJD", "iv": "aXY=",
+}
+
+LOCAL_FILE = {
+    "id": "f1", "name": "a.txt", "size": 12, "type": "text/plain", "url": "", "category": "doc",
+    "riskLevel": "low", "verdict": "clean", "uploadedAt": "2026-03-01T00:00:00Z", "cipherContent": "QUJD", "iv": "aXY=",
+}
+
+
+def test_file_rows_from_either_store_load_the_same():
+    supabase, local = load_records(FileRecord, [SUPABASE_FILE, LOCAL_FILE])
+
+    assert supabase.to_frontend() == local.to_frontend() == LOCAL_FILE
+    assert supabase.owner_id == "u1" and local.owner_id is None
+    assert supabase.to_shared_frontend() == dict(LOCAL_FILE, ownerId="u1")
+
+
+def test_file_db_row_round_trips_through_supabase_shape():
+    record = FileRecord.from_row(LOCAL_FILE)
+    record.owner_id = "u1"
+
+    row = record.to_db_row()
+    assert row == {k: v for k, v in SUPABASE_FILE.items() if k not in ("id", "uploaded_at")}
+    assert FileRecord.from_row(dict(row, id="f1", uploaded_at=record.uploaded_at)).to_frontend() == LOCAL_FILE
+
+
+def test_file_metadata_has_no_ciphertext():
+    metadata = FileRecord.from_row(SUPABASE_FILE).to_metadata()
+
+    assert "cipherContent" not in metadata and "iv" not in metadata
+    assert metadata["riskLevel"] == "low" and metadata["uploadedAt"] == SUPABASE_FILE["uploaded_at"]
+
+
+def test_empty_values_fall_through_to_the_next_key():
+    # Matches the old `row.get("risk_level") or row.get("riskLevel")`
+    record = FileRecord.from_row({"risk_level": "", "riskLevel": "high"})
+    assert record.risk_level == "high" and record.name is None
+
+
+def test_served_records_keep_unknown_columns():
+    request_row = {"id": "r1", "file_id": "f1", "owner_id": "u1", "requester_key": "K", "status": "pending",
+                   "created_at": "2026-03-01T00:00:00Z", "files": {"name": "a.txt"}, "requester_name": "bob"}
+    notification_row = {"id": "n1", "user_id": "u1", "title": "t", "message": "m", "type": "info",
+                        "is_read": False, "created_at": "2026-03-01T00:00:00Z", "link": "/files/f1"}
+
+    assert AccessRequestRecord.from_row(request_row).to_json() == request_row
+    assert NotificationRecord.from_row(notification_row).to_json() == notification_row
+
+
+def test_served_records_fill_absent_columns_with_none():
+    assert NotificationRecord.from_row({"id": "n1"}).to_json() == {
+        "id": "n1", "user_id": None, "title": None, "message": None, "type": None, "is_read": None, "created_at": None,
+    }
+    assert UserRecord.from_row({"id": 1, "extra_column": "x"}).to_json() == {
+        "id": 1, "email": None, "username": None, "session_salt": None, "created_at": None,
+    }
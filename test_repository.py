@@ -0,0 +1,167 @@
+import json
+import os
+
+import pytest
+
+from repository import LocalBackend, QueryError, Repository, SupabaseBackend
+from supabase_standin import StandinClient
+
+# Conformance tests: every case runs against both backends, seeded with the
+# same records in each store's native shape (db.json keeps files camelCase
+# and partitioned by owner; Supabase has snake_case columns).
+#
+#   python -m pytest -q test_repository.py
+
+USERS = [
+    {"id": "u1", "email": "a@example.com", "username": "a", "session_salt": "s1"},
+    {"id": "u2", "email": "b@example.com", "username": "b", "session_salt": "s2"},
+]
+
+FILES = [
+    {"id": "f1", "owner_id": "u1", "name": "report.pdf", "size": 10, "type": "application/pdf",
+     "risk_level": "Low", "cipher_content": "AAAA", "iv": "iv1", "uploaded_at": "2026-01-01T00:00:00Z"},
+    {"id": "f2", "owner_id": "u1", "name": "photo.png", "size": 20, "type": "image/png",
+     "risk_level": "High", "cipher_content": "BBBB", "iv": "iv2", "uploaded_at": "2026-01-02T00:00:00Z"},
+    {"id": "f3", "owner_id": "u2", "name": "notes.txt", "size": 30, "type": "text/plain",
+     "risk_level": "Medium", "cipher_content": "CCCC", "iv": "iv3", "uploaded_at": "2026-01-03T00:00:00Z"},
+]
+
+REQUESTS = [
+    {"id": "r1", "file_id": "f1", "owner_id": "u1", "requester_key": "K1", "status": "pending", "created_at": "2026-02-01T00:00:00Z"},
+    {"id": "r2", "file_id": "f2", "owner_id": "u1", "requester_key": "K1", "status": "approved", "created_at": "2026-02-02T00:00:00Z"},
+    {"id": "r3", "file_id": "f3", "owner_id": "u2", "requester_key": "K2", "status": "pending", "created_at": "2026-02-03T00:00:00Z"},
+    {"id": "r4", "file_id": "gone", "owner_id": "u1", "requester_key": "K3", "status": "pending", "created_at": "2026-02-04T00:00:00Z"},
+]
+
+NOTIFICATIONS = [
+    {"id": "n1", "user_id": "u1", "title": "t1", "is_read": False, "created_at": "2026-03-01T00:00:00Z"},
+    {"id": "n2", "user_id": "u1", "title": "t2", "is_read": True, "created_at": "2026-03-03T00:00:00Z"},
+    {"id": "n3", "user_id": "u1", "title": "t3", "is_read": False, "created_at": "2026-03-02T00:00:00Z"},
+    {"id": "n4", "user_id": "u2", "title": "t4", "is_read": False, "created_at": "2026-03-04T00:00:00Z"},
+]
+
+_CAMEL = {"risk_level": "riskLevel", "cipher_content": "cipherContent", "uploaded_at": "uploadedAt"}
+
+
+def _write_local_db(path):
+    files = {}
+    for f in FILES:
+        local = {_CAMEL.get(k, k): v for k, v in f.items() if k != "owner_id"}
+        local["ownerId"] = f["owner_id"]
+        files.setdefault(f["owner_id"], []).append(local)
+    with open(path, "w") as fh:
+        json.dump({
+            "users": {u["email"]: u for u in USERS},
+            "files": files,
+            "access_requests": REQUESTS,
+            "notifications": NOTIFICATIONS,
+        }, fh, indent=4)
+
+
+@pytest.fixture(params=["local", "supabase"])
+def backend(request, tmp_path):
+    if request.param == "local":
+        path = tmp_path / "db.json"
+        _write_local_db(path)
+        return LocalBackend(str(path))
+    client = StandinClient({
+        "users": USERS,
+        "files": FILES,
+        "access_requests": REQUESTS,
+        "system_notifications": NOTIFICATIONS,
+    })
+    return SupabaseBackend(lambda: client)
+
+
+def ids(rows):
+    return sorted(r["id"] for r in rows)
+
+
+def test_equality_filters(backend):
+    rows = backend.find("access_requests", where={"owner_id": "u1", "status": "pending"})
+    assert ids(rows) == ["r1", "r4"]
+
+
+def test_in_filter(backend):
+    assert ids(backend.find("access_requests", where={"id": ["r2", "r3", "nope"]})) == ["r2", "r3"]
+
+
+def test_comparison_filter(backend):
+    rows = backend.find("notifications", where={"created_at": ("lt", "2026-03-03T00:00:00Z")})
+    assert ids(rows) == ["n1", "n3"]
+
+
+def test_boolean_filter_and_count(backend):
+    assert backend.count("notifications", where={"user_id": "u1", "is_read": False}) == 2
+    assert backend.count("notifications", where={"user_id": "nobody"}) == 0
+
+
+def test_order_and_limit(backend):
+    rows = backend.find("notifications", where={"user_id": "u1"}, order_by="created_at", desc=True)
+    assert [r["id"] for r in rows] == ["n2", "n3", "n1"]
+    rows = backend.find("notifications", where={"user_id": "u1"}, order_by="created_at", limit=2)
+    assert [r["id"] for r in rows] == ["n1", "n3"]
+
+
+def test_projection(backend):
+    rows = backend.find("users", where={"email": "b@example.com"}, fields=["id", "username"])
+    assert rows == [{"id": "u2", "username": "b"}]
+
+
+def test_files_use_db_column_names(backend):
+    rows = backend.find("files", where={"owner_id": "u1"}, order_by="name")
+    assert [r["name"] for r in rows] == ["photo.png", "report.pdf"]
+    assert rows[1]["risk_level"] == "Low"
+    assert rows[1]["cipher_content"] == "AAAA"
+    assert rows[1]["owner_id"] == "u1"
+
+
+def test_embedded_relation(backend):
+    rows = backend.find("access_requests", where={"owner_id": "u1", "status": "pending"},
+                        order_by="created_at", fields=["*", "files(name)"])
+    assert [r["files"] for r in rows] == [{"name": "report.pdf"}, None]
+    assert rows[0]["requester_key"] == "K1"
+
+
+def test_ids_match_across_types(backend):
+    assert ids(backend.find("access_requests", where={"file_id": "f3"})) == ["r3"]
+    assert backend.find("access_requests", where={"id": 12345}) == []
+
+
+def test_results_are_copies(backend):
+    rows = backend.find("notifications", where={"id": "n1"})
+    rows[0]["title"] = "mutated"
+    assert backend.find("notifications", where={"id": "n1"})[0]["title"] == "t1"
+
+
+def test_local_backend_reloads_after_external_write(tmp_path):
+    path = tmp_path / "db.json"
+    _write_local_db(path)
+    backend = LocalBackend(str(path))
+    assert backend.count("notifications", where={"user_id": "u2"}) == 1
+    assert backend.count("notifications", where={"user_id": "u2"}) == 1
+    assert backend.reloads == 1
+
+    with open(path) as fh:
+        data = json.load(fh)
+    data["notifications"].append({"id": "n5", "user_id": "u2", "is_read": False, "created_at": "2026-03-05T00:00:00Z"})
+    with open(path, "w") as fh:
+        json.dump(data, fh)
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000))
+
+    assert backend.count("notifications", where={"user_id": "u2"}) == 2
+    assert backend.reloads == 2
+
+
+def test_repository_falls_back_when_primary_fails(tmp_path):
+    path = tmp_path / "db.json"
+    _write_local_db(path)
+    client = StandinClient(missing_tables=["access_requests"])
+    repo = Repository(SupabaseBackend(lambda: client), LocalBackend(str(path)))
+    assert repo.exists("access_requests", where={"file_id": "f2", "requester_key": "K1", "status": "approved"})
+    assert not repo.exists("access_requests", where={"file_id": "f1", "requester_key": "K1", "status": "approved"})
+
+
+def test_unsupported_operator_is_rejected(backend):
+    with pytest.raises(QueryError):
+        backend.find("users", where={"id": ("like", "u%")})
@@ -0,0 +1,104 @@
+import copy
+
+import retention
+from retention import RetentionSweeper
+from supabase_standin import StandinClient
+
+# RetentionSweeper against a supabase_standin client and an in-memory
+# stand-in for db.json.
+#
+#   python -m pytest -q test_retention.py
+
+OLD = "2000-01-01T00:00:00Z"
+NEW = "2999-01-01T00:00:00Z"
+
+
+class LocalStore:
+    def __init__(self, data):
+        self.data = data
+        self.saves = 0
+
+    def load(self):
+        return copy.deepcopy(self.data)
+
+    def save(self, data):
+        self.data = copy.deepcopy(data)
+        self.saves += 1
+
+
+def _notifications():
+    return [
+        {"id": "n1", "user_id": "u1", "is_read": True, "created_at": OLD},
+        {"id": "n2", "user_id": "u1", "is_read": False, "created_at": OLD},
+        {"id": "n3", "user_id": "u1", "is_read": True, "created_at": NEW},
+    ]
+
+
+def test_expired_rows_are_removed_from_both_stores(monkeypatch):
+    monkeypatch.setattr(retention, "RETENTION_ARCHIVE_DIR", "")
+    client = StandinClient({"system_notifications": _notifications(), "access_requests": [], "access_logs": []})
+    local = LocalStore({"users": {}, "files": {"u1": [], "u2": [{"id": "f1"}]}, "notifications": _notifications(),
+                        "manifests": {"u1": {"f9": {"bytes": 10}}}})
+
+    report = RetentionSweeper(lambda: client, local.load, local.save).sweep()
+
+    result = report["policies"]["read_notifications"]
+    assert (result["supabase"], result["local"]) == (1, 1)
+    assert [n["id"] for n in client.rows("system_notifications")] == ["n2", "n3"]
+    assert [n["id"] for n in local.data["notifications"]] == ["n2", "n3"]
+    # Empty per-user file lists are compacted away
+    assert report["compacted"] == 1 and list(local.data["files"]) == ["u2"]
+    # Manifests may describe files only Supabase has, so they stay
+    assert local.data["manifests"] == {"u1": {"f9": {"bytes": 10}}}
+
+
+def test_local_writes_during_the_supabase_sweep_are_kept(monkeypatch):
+    monkeypatch.setattr(retention, "RETENTION_ARCHIVE_DIR", "")
+    client = StandinClient({"system_notifications": _notifications(), "access_requests": [], "access_logs": []})
+    local = LocalStore({"users": {}, "files": {}, "notifications": _notifications()})
+
+    def supabase():
+        # A request saves db.json while the sweep is talking to Supabase
+        if not local.data.get("access_requests"):
+            data = local.load()
+            data["access_requests"] = [{"id": "r-new", "status": "pending", "created_at": NEW}]
+            local.save(data)
+        return client
+
+    RetentionSweeper(supabase, local.load, local.save).sweep()
+
+    assert [r["id"] for r in local.data["access_requests"]] == ["r-new"]
+    assert [n["id"] for n in local.data["notifications"]] == ["n2", "n3"]
+
+
+def test_supabase_errors_are_reported_and_local_still_swept(monkeypatch):
+    monkeypatch.setattr(retention, "RETENTION_ARCHIVE_DIR", "")
+    local = LocalStore({"users": {}, "files": {}, "notifications": _notifications()})
+
+    def supabase():
+        raise ConnectionError("down")
+
+    report = RetentionSweeper(supabase, local.load, local.save).sweep()
+    assert "supabase_error" in report["policies"]["read_notifications"]
+    assert [n["id"] for n in local.data["notifications"]] == ["n2", "n3"]
+
+
+def test_deletes_that_remove_nothing_end_the_sweep(monkeypatch):
+    monkeypatch.setattr(retention, "RETENTION_ARCHIVE_DIR", "")
+    monkeypatch.setattr(retention, "RETENTION_BATCH_SIZE", 1)
+
+    class NoDeletes(StandinClient):
+        # Rows are visible to select but a policy hides them from delete
+        def table(self, name):
+            query = super().table(name)
+            delete = query.delete
+            query.delete = lambda: delete().eq("id", None)
+            return query
+
+    client = NoDeletes({"system_notifications": _notifications(), "access_requests": [], "access_logs": []})
+    local = LocalStore({"users": {}, "files": {}, "notifications": []})
+
+    report = RetentionSweeper(lambda: client, local.load, local.save).sweep()
+
+    assert report["policies"]["read_notifications"]["supabase"] == 0
+    assert client.calls.count(("system_notifications", "delete")) == 1
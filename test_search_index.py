@@ -0,0 +1,139 @@
+import threading
+
+import pytest
+
+from search_index import SearchIndex, tokenize
+
+# SearchIndex over an in-memory loader.
+#
+#   python -m pytest -q test_search_index.py
+
+DOCS = [
+    {"name": "Tax Report 2024.pdf", "size": 300, "type": "application/pdf", "category": "Financial",
+     "riskLevel": "High", "uploadedAt": "2024-04-01T00:00:00Z"},
+    {"name": "taxonomy.txt", "size": 20, "type": "text/plain", "category": "Document",
+     "riskLevel": "Low", "uploadedAt": "2024-05-01T00:00:00Z"},
+    {"name": "report_tax.docx", "size": 150, "type": "application/msword", "category": "Financial",
+     "riskLevel": "Medium", "uploadedAt": "2024-03-01T00:00:00Z"},
+    {"name": "holiday.jpg", "size": None, "type": "image/jpeg", "category": "Personal",
+     "riskLevel": "Low", "uploadedAt": None},
+]
+
+
+def _index(docs=DOCS, **kwargs):
+    return SearchIndex(lambda user_id: [dict(d) for d in docs], **kwargs)
+
+
+def _names(result):
+    return [d["name"] for d in result["results"]]
+
+
+def test_tokenize():
+    assert tokenize("Tax_Report-2024.PDF") == ["tax", "report", "2024", "pdf"]
+    assert tokenize("Résumé final") == ["résumé", "final"]
+    assert tokenize(None) == []
+
+
+def test_prefix_ranking():
+    index = _index()
+    # Exact token (2) + starts with the query (1); taxonomy's prefix match
+    # plus the bonus ties report_tax's exact match and is more recent
+    assert _names(index.search("u1", "tax")) == ["Tax Report 2024.pdf", "taxonomy.txt", "report_tax.docx"]
+    assert _names(index.search("u1", "report")) == ["report_tax.docx", "Tax Report 2024.pdf"]
+    assert _names(index.search("u1", "rep tax")) == ["Tax Report 2024.pdf", "report_tax.docx"]
+    assert index.search("u1", "taxes")["total"] == 0
+
+
+def test_facets_and_ranges():
+    index = _index()
+    assert _names(index.search("u1", filters={"category": "financial"}, sort="name")) == [
+        "report_tax.docx", "Tax Report 2024.pdf"]
+    assert _names(index.search("u1", "tax", filters={"riskLevel": "High"})) == ["Tax Report 2024.pdf"]
+    assert _names(index.search("u1", size_range=(100, 200))) == ["report_tax.docx"]
+    # Undated / unsized documents never match a range
+    assert _names(index.search("u1", date_range=("2024-03-15", None), sort="uploadedAt")) == [
+        "Tax Report 2024.pdf", "taxonomy.txt"]
+    assert index.search("u1", size_range=(0, None))["total"] == 3
+
+
+def test_pagination():
+    index = _index()
+    pages = [index.search("u1", sort="size", page=page, per_page=2) for page in (1, 2, 3)]
+    assert [_names(p) for p in pages] == [["taxonomy.txt", "report_tax.docx"],
+                                          ["Tax Report 2024.pdf", "holiday.jpg"], []]
+    assert all(p["total"] == 4 for p in pages)
+
+
+def test_upsert_and_remove_keep_a_built_index_current():
+    index = _index()
+    index.search("u1")
+    index.upsert("u1", [{"name": "tax notes.txt", "size": 5}])
+    index.remove("u1", ["taxonomy.txt"])
+    assert _names(index.search("u1", "tax", sort="name")) == ["report_tax.docx", "tax notes.txt", "Tax Report 2024.pdf"]
+    assert index.builds == 1
+
+
+def test_least_recently_searched_users_are_evicted():
+    index = _index(max_users=2)
+    for user in ("a", "b", "a", "c"):
+        index.search(user)
+    assert index.size() == 2 and index.evictions == 1
+    builds = index.builds
+    index.search("a")
+    assert index.builds == builds
+    index.search("b")
+    assert index.builds == builds + 1
+
+
+def test_indexes_are_capped_by_document_count():
+    index = _index(max_docs=6)
+    index.search("a")
+    index.search("b")
+    assert index.size() == 1
+    # The index just built is kept even if it alone is over the cap
+    small = _index(max_docs=2)
+    assert small.search("a")["total"] == 4 and small.size() == 1
+
+
+def test_writes_during_a_build_are_not_lost():
+    store = [dict(d) for d in DOCS]
+    loading, written = threading.Event(), threading.Event()
+
+    def loader(user_id):
+        snapshot = list(store)
+        if not written.is_set():
+            loading.set()
+            written.wait(5)
+        return snapshot
+
+    index = SearchIndex(loader)
+
+    def write():
+        loading.wait(5)
+        store.append({"name": "late tax.txt", "size": 1})
+        index.upsert("u1", [{"name": "late tax.txt", "size": 1}])
+        written.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    result = index.search("u1", "late")
+    writer.join()
+
+    assert _names(result) == ["late tax.txt"]
+    assert _names(index.search("u1", "late")) == ["late tax.txt"]
+    assert index.builds == 1
+
+
+def test_failed_build_is_not_cached():
+    calls = []
+
+    def loader(user_id):
+        calls.append(user_id)
+        if len(calls) == 1:
+            raise ConnectionError("down")
+        return DOCS
+
+    index = SearchIndex(loader)
+    with pytest.raises(ConnectionError):
+        index.search("u1")
+    assert index.search("u1")["total"] == 4 and index.size() == 1
@@ -0,0 +1,140 @@
+import os
+import time
+
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from cloudvault_client.container import (HEADER_BYTES, MAX_SEGMENTS, MIN_SEGMENT_SIZE, TAG_BYTES, ContainerError,
+                                         new_header, open_segment, parse_header, seal_segment)
+from segments import SegmentError, SegmentStore
+
+# CVC1 containers (cloudvault_client/container.py) and their server-side
+# segment store.
+#
+#   python -m pytest -q test_segments.py
+
+KEY = "A1B2C3D4"
+SIZE = 2 * MIN_SEGMENT_SIZE + 10
+
+
+@pytest.fixture
+def sealed():
+    data = os.urandom(SIZE)
+    header = new_header(SIZE, MIN_SEGMENT_SIZE)
+    chunks = [data[i * MIN_SEGMENT_SIZE:(i + 1) * MIN_SEGMENT_SIZE] for i in range(header.segment_count)]
+    return header, chunks, [seal_segment(header, i, chunk, KEY) for i, chunk in enumerate(chunks)]
+
+
+def test_header_round_trip():
+    header = new_header(SIZE, MIN_SEGMENT_SIZE)
+    assert parse_header(header.raw) == header
+    assert (header.segment_count, header.segment_bytes(2)) == (3, 10 + TAG_BYTES)
+    assert header.ciphertext_bytes == HEADER_BYTES + SIZE + 3 * TAG_BYTES
+    assert new_header(0, MIN_SEGMENT_SIZE).segment_count == 1
+    for raw in (header.raw[:-1], b"XVC1" + header.raw[4:], header.raw[:4] + b"\x02" + header.raw[5:]):
+        with pytest.raises(ContainerError):
+            parse_header(raw)
+    with pytest.raises(ContainerError):
+        new_header(SIZE, MIN_SEGMENT_SIZE - 1)
+
+
+def test_segment_count_is_bounded():
+    assert new_header(MAX_SEGMENTS * MIN_SEGMENT_SIZE, MIN_SEGMENT_SIZE).segment_count == MAX_SEGMENTS
+    with pytest.raises(ContainerError):
+        new_header(MAX_SEGMENTS * MIN_SEGMENT_SIZE + 1, MIN_SEGMENT_SIZE)
+    # A crafted header claiming 2^64 - 1 bytes
+    raw = new_header(10, MIN_SEGMENT_SIZE).raw
+    with pytest.raises(ContainerError):
+        parse_header(raw[:12] + b"\xff" * 8 + raw[20:])
+
+
+def test_seal_and_open(sealed):
+    header, chunks, segments = sealed
+    assert [open_segment(header, i, s, KEY) for i, s in enumerate(segments)] == chunks
+    with pytest.raises(InvalidTag):
+        open_segment(header, 0, segments[0], "WRONGKEY")
+
+
+def test_tampering_and_reordering_are_rejected(sealed):
+    header, _, segments = sealed
+    flipped = bytearray(segments[1])
+    flipped[5] ^= 1
+    with pytest.raises(InvalidTag):
+        open_segment(header, 1, bytes(flipped), KEY)
+    # Same size, wrong position
+    with pytest.raises(InvalidTag):
+        open_segment(header, 1, segments[0], KEY)
+    # A segment from another container with the same layout
+    other = new_header(SIZE, MIN_SEGMENT_SIZE)
+    with pytest.raises(InvalidTag):
+        open_segment(other, 0, segments[0], KEY)
+    # Truncation: the last segment can't stand in for a middle one
+    with pytest.raises(ContainerError):
+        open_segment(header, 1, segments[2], KEY)
+
+
+def test_store_resumes_missing_segments(tmp_path, sealed):
+    header, _, segments = sealed
+    store = SegmentStore(str(tmp_path))
+    assert store.begin("u1", header)["missing"] == [0, 1, 2]
+    store.put("u1", header.id, 2, segments[2])
+    store.put("u1", header.id, 0, segments[0])
+
+    # Registering the same header again reports what is still missing
+    state = store.begin("u1", header)
+    assert (state["present"], state["missing"], state["complete"]) == ([0, 2], [1], False)
+    assert store.put("u1", header.id, 1, segments[1])["complete"]
+    assert b"".join(store.stream("u1", header.id)) == header.raw + b"".join(segments)
+
+
+def test_store_validates_segments(tmp_path, sealed):
+    header, _, segments = sealed
+    store = SegmentStore(str(tmp_path))
+    store.begin("u1", header)
+    with pytest.raises(SegmentError):
+        store.put("u1", header.id, 3, segments[2])
+    with pytest.raises(SegmentError):
+        store.put("u1", header.id, 0, segments[2])
+    with pytest.raises(KeyError):
+        store.put("u1", "ab" * 16, 0, segments[0])
+    with pytest.raises(SegmentError):
+        store.status("../u2", header.id)
+    clash = parse_header(header.raw[:12] + (SIZE + 1).to_bytes(8, "big") + header.raw[20:])
+    with pytest.raises(SegmentError):
+        store.begin("u1", clash)
+
+
+def test_pending_containers_are_reserved_until_claimed(tmp_path, sealed):
+    header, _, segments = sealed
+    store = SegmentStore(str(tmp_path))
+    seen = []
+    store.begin("u1", header, admit=lambda files, size: seen.append((files, size)))
+    store.begin("u1", new_header(10, MIN_SEGMENT_SIZE), admit=lambda files, size: seen.append((files, size)))
+    # Resuming doesn't ask again
+    store.begin("u1", header, admit=lambda files, size: seen.append((files, size)))
+    assert seen == [(0, 0), (1, header.ciphertext_bytes)]
+
+    for i, segment in enumerate(segments):
+        store.put("u1", header.id, i, segment)
+    # Complete but not yet listed as a file: still pending
+    assert store.pending("u1")[0] == 2
+    store.claim("u1", header.id)
+    assert store.pending("u1") == (1, new_header(10, MIN_SEGMENT_SIZE).ciphertext_bytes)
+
+
+def test_prune_drops_unclaimed_containers_only(tmp_path, sealed, monkeypatch):
+    header, _, segments = sealed
+    store = SegmentStore(str(tmp_path), upload_ttl=60)
+    abandoned = new_header(10, MIN_SEGMENT_SIZE)
+    store.begin("u1", header)
+    store.begin("u1", abandoned)
+    for i, segment in enumerate(segments):
+        store.put("u1", header.id, i, segment)
+    store.claim("u1", header.id)
+
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert store.prune("u1") == 1
+    assert store.status("u1", header.id)["complete"]
+    with pytest.raises(KeyError):
+        store.status("u1", abandoned.id)
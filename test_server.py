@@ -0,0 +1,427 @@
+import os
+import json
+import base64
+import hashlib
+
+import pytest
+
+# API tests against the Flask test client (fixture in conftest.py):
+# Supabase is a supabase_standin client and db.json a temporary file.
+#
+#   python -m pytest -q test_server.py
+
+USER = "u1"
+
+
+def _file(name, content=b"cipher", **extra):
+    return dict({"id": name, "ownerId": USER, "name": name, "size": len(content), "type": "text/plain",
+                 "category": "Document", "riskLevel": "Low", "verdict": "ok",
+                 "cipherContent": base64.b64encode(content).decode(), "iv": "aXY="}, **extra)
+
+
+def _hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def _post(env, files):
+    return env.http.post(f"/api/files/{USER}", json=files)
+
+
+def _sync(env, body):
+    return env.http.post(f"/api/files/{USER}/sync", json=body)
+
+
+# -- readiness and schema probe (user-027) --
+def test_readiness_reports_the_probed_schema(server_env):
+    res = server_env.http.get("/api/ready")
+
+    body = res.get_json()
+    assert res.status_code == 200 and body["ready"] and body["storage"] == "supabase"
+    assert body["schema"]["tables"]["users"]["exists"]
+
+
+def test_readiness_refresh_is_throttled(server_env):
+    server_env.http.get("/api/ready")
+    probes = len(server_env.client.calls)
+    for _ in range(5):
+        server_env.http.get("/api/ready?refresh=1")
+    assert len(server_env.client.calls) == probes
+
+
+def test_readiness_with_supabase_down_uses_local(server_env, monkeypatch):
+    import clients
+
+    server_env.down = True
+    monkeypatch.setattr(clients, "SCHEMA_PROBE_INTERVAL", 0)
+    body = server_env.http.get("/api/ready").get_json()
+    assert body["ready"] and body["storage"] == "local"
+    # Connection errors are unknown, not missing, so the next call re-probes
+    assert body["schema"]["tables"]["users"]["exists"] is None
+
+    server_env.down = False
+    assert server_env.http.get("/api/ready").get_json()["storage"] == "supabase"
+
+
+# -- delta sync (user-029) --
+def test_unchanged_files_are_not_rewritten(server_env):
+    assert _post(server_env, [_file("a.txt")]).get_json()["written"] == 1
+
+    res = _post(server_env, [_file("a.txt")]).get_json()
+    assert res == {"status": "success", "supabase": True, "written": 0}
+    assert len(server_env.client.rows("files")) == 1
+
+
+def test_failed_supabase_write_is_retried(server_env):
+    server_env.down = True
+    res = _post(server_env, [_file("a.txt")]).get_json()
+    assert res["written"] == 1 and res["supabase"] is False
+    assert server_env.local_db()["manifests"][USER]["a.txt"]["pending"] is True
+
+    # Still down: the file is written again and reported as not in Supabase
+    assert _post(server_env, [_file("a.txt")]).get_json() == {"status": "success", "supabase": False, "written": 1}
+    assert _sync(server_env, {"manifest": [{"name": "a.txt", "size": 6, "hash": _hash(b"cipher")}]}).get_json()["need"] == ["a.txt"]
+
+    server_env.down = False
+    assert _post(server_env, [_file("a.txt")]).get_json() == {"status": "success", "supabase": True, "written": 1}
+    assert [r["name"] for r in server_env.client.rows("files")] == ["a.txt"]
+    assert "pending" not in server_env.local_db()["manifests"][USER]["a.txt"]
+    assert _post(server_env, [_file("a.txt")]).get_json()["written"] == 0
+
+
+def test_handshake_and_upload_agree_on_metadata_changes(server_env):
+    _post(server_env, [_file("a.txt")])
+    item = {"name": "a.txt", "size": 6, "hash": _hash(b"cipher")}
+
+    assert _sync(server_env, {"manifest": [item]}).get_json()["unchanged"] == ["a.txt"]
+    assert _sync(server_env, {"manifest": [dict(item, category="Document")]}).get_json()["unchanged"] == ["a.txt"]
+    # The upload path would write a re-categorised file, so the handshake asks for it
+    assert _sync(server_env, {"manifest": [dict(item, category="Finance")]}).get_json()["need"] == ["a.txt"]
+    assert _post(server_env, [_file("a.txt", category="Finance")]).get_json()["written"] == 1
+    assert _sync(server_env, {"manifest": [dict(item, size=7)]}).get_json()["need"] == ["a.txt"]
+
+
+def test_handshake_versions(server_env):
+    _post(server_env, [_file("a.txt", version=3)])
+
+    plan = _sync(server_env, {"manifest": [
+        {"name": "a.txt", "size": 5, "hash": "old", "version": 2},
+        {"name": "b.txt", "size": 1, "hash": "x"},
+    ]}).get_json()
+    assert plan["stale"] == ["a.txt"] and plan["need"] == ["b.txt"]
+
+
+def test_handshake_deletes(server_env):
+    _post(server_env, [_file("a.txt"), _file("b.txt")])
+
+    plan = _sync(server_env, {"manifest": [], "deleted": ["a.txt"]}).get_json()
+    assert plan["remote_only"] == ["b.txt"]
+    assert [f["name"] for f in server_env.local_db()["files"][USER]] == ["b.txt"]
+    assert [r["name"] for r in server_env.client.rows("files")] == ["b.txt"]
+
+
+@pytest.mark.parametrize("body", [
+    [],
+    {"manifest": "a.txt"},
+    {"manifest": ["x"]},
+    {"manifest": [{"size": 1}]},
+    {"manifest": [{"name": "a", "version": "2"}]},
+    {"manifest": [{"name": "a", "version": 1.5}]},
+    {"manifest": [], "deleted": 5},
+    {"manifest": [], "deleted": ["a", 3]},
+])
+def test_handshake_rejects_bad_input(server_env, body):
+    res = _sync(server_env, body)
+    assert res.status_code == 400 and "error" in res.get_json()
+
+
+def test_upload_rejects_bad_version(server_env):
+    res = _post(server_env, [_file("a.txt", version="new")])
+    assert res.status_code == 400
+
+
+# -- shared-files cache (user-030) --
+def test_lookup_racing_a_salt_rotation_is_not_cached(server_env, monkeypatch):
+    server = server_env.server
+    server_env.http.post("/api/register", json={"email": "a@example.com", "password": "pw"})
+    user = server_env.http.post("/api/login", json={"email": "a@example.com", "password": "pw"}).get_json()
+    key = server.generate_dynamic_key(user["id"], user["session_salt"])
+    resolve = server.resolve_share_key
+    calls = []
+
+    def racing(share_key):
+        calls.append(share_key)
+        found = resolve(share_key)
+        # A login rotates the salt after the users scan matched the old key
+        server.shared_files_cache.invalidate_owner(user["id"])
+        return found
+    monkeypatch.setattr(server, "resolve_share_key", racing)
+
+    assert server_env.http.get(f"/api/shared-files/{key}").status_code == 200
+    server_env.http.get(f"/api/shared-files/{key}")
+    assert len(calls) == 2
+
+
+# -- bulk updates and unread counter (user-032) --
+NOTIFICATIONS = [
+    {"id": "n1", "user_id": USER, "title": "t1", "is_read": False, "created_at": "2026-03-01T00:00:00Z"},
+    {"id": "n2", "user_id": USER, "title": "t2", "is_read": False, "created_at": "2026-03-02T00:00:00Z"},
+    {"id": "n3", "user_id": USER, "title": "t3", "is_read": True, "created_at": "2026-03-03T00:00:00Z"},
+    {"id": "n4", "user_id": "u2", "title": "t4", "is_read": False, "created_at": "2026-03-04T00:00:00Z"},
+]
+
+REQUESTS = [
+    {"id": "r1", "file_id": "f1", "owner_id": USER, "requester_key": "K", "status": "pending"},
+    {"id": "r2", "file_id": "f2", "owner_id": USER, "requester_key": "K", "status": "pending"},
+    {"id": "r3", "file_id": "f3", "owner_id": "u2", "requester_key": "K", "status": "pending"},
+]
+
+
+@pytest.fixture(params=["supabase", "local"])
+def seeded(request, server_env):
+    # The same rows in whichever store is serving; "local" has Supabase down
+    if request.param == "supabase":
+        server_env.client.tables["system_notifications"] = [dict(n) for n in NOTIFICATIONS]
+        server_env.client.tables["access_requests"] = [dict(r) for r in REQUESTS]
+    else:
+        server_env.down = True
+        with open(server_env.db_path, "w") as f:
+            json.dump({"users": {}, "files": {}, "notifications": NOTIFICATIONS, "access_requests": REQUESTS}, f)
+    return server_env
+
+
+def _unread(env, user=USER):
+    return env.http.get(f"/api/notifications/{user}/unread-count").get_json()["unread"]
+
+
+def _stored(env, collection):
+    if env.down:
+        return {r["id"]: r for r in env.local_db()[collection]}
+    table = "system_notifications" if collection == "notifications" else collection
+    return {r["id"]: r for r in env.client.rows(table)}
+
+
+def test_marking_one_notification_moves_the_counter_once(seeded):
+    assert _unread(seeded) == 2
+
+    assert seeded.http.patch("/api/notifications/n1").status_code == 200
+    assert _unread(seeded) == 1
+    # Already read: the is_read=False guard leaves the counter alone
+    assert seeded.http.patch("/api/notifications/n1").status_code == 200
+    assert seeded.http.patch("/api/notifications/n3").status_code == 200
+    assert _unread(seeded) == 1
+    assert seeded.http.patch("/api/notifications/nope").status_code == 404
+    assert _stored(seeded, "notifications")["n1"]["is_read"] is True
+
+
+def test_bulk_marking_by_ids_counts_only_unread_rows(seeded):
+    _unread(seeded)
+    res = seeded.http.post(f"/api/notifications/{USER}/read", json={"ids": ["n2", "n3", "n4"]}).get_json()
+
+    # n3 was already read and n4 belongs to someone else
+    assert res == {"marked": ["n2"], "unread": 1}
+    assert _stored(seeded, "notifications")["n4"]["is_read"] is False
+    assert _unread(seeded, "u2") == 1
+
+
+def test_bulk_marking_all(seeded):
+    _unread(seeded)
+    res = seeded.http.post(f"/api/notifications/{USER}/read", json={"all": True}).get_json()
+
+    assert sorted(res["marked"]) == ["n1", "n2"] and res["unread"] == 0
+    assert seeded.http.post(f"/api/notifications/{USER}/read", json={"all": True}).get_json() == {"marked": [], "unread": 0}
+    assert seeded.http.post(f"/api/notifications/{USER}/read", json={}).status_code == 400
+
+
+def test_new_access_request_bumps_the_owner_counter(seeded):
+    assert _unread(seeded) == 2
+    res = seeded.http.post("/api/access-requests", json={"fileId": "f1", "ownerId": USER, "requesterKey": "K"})
+
+    assert res.status_code == 201
+    assert _unread(seeded) == 3
+
+
+def test_bulk_access_request_update(seeded):
+    res = seeded.http.patch("/api/access-requests", json={"ids": ["r1", "r3", "r9"], "status": "approved", "ownerId": USER})
+
+    body = res.get_json()
+    assert res.status_code == 200
+    assert [r["id"] for r in body["updated"]] == ["r1"]
+    # r3 belongs to another owner, r9 doesn't exist
+    assert body["missing"] == ["r3", "r9"]
+    stored = _stored(seeded, "access_requests")
+    assert stored["r1"]["status"] == "approved"
+    assert stored["r2"]["status"] == "pending" and stored["r3"]["status"] == "pending"
+
+
+@pytest.mark.parametrize("body", [{}, {"ids": ["r1"]}, {"ids": ["r1"], "status": "maybe"}, {"ids": [], "status": "denied"}])
+def test_bulk_access_request_update_validates(server_env, body):
+    assert server_env.http.patch("/api/access-requests", json=body).status_code == 400
+
+
+@pytest.mark.parametrize("body", [["r1"], {"ids": 5, "all": True}, {"ids": "abc", "all": True}, {"ids": [{"id": "n1"}], "all": True}])
+def test_bulk_bodies_must_be_objects_with_id_lists(server_env, body):
+    assert server_env.http.post(f"/api/notifications/{USER}/read", json=body).status_code == 400
+    if isinstance(body, dict):
+        body = dict(body, status="approved")
+    assert server_env.http.patch("/api/access-requests", json=body).status_code == 400
+
+
+def test_unread_load_racing_an_adjust_is_not_cached():
+    from unread import UnreadCounter
+
+    counts = iter([2, 1])
+    def loader(user_id):
+        count = next(counts)
+        if count == 2:
+            # A notification is marked read after the count was taken
+            counter.adjust(user_id, -1)
+        return count
+    counter = UnreadCounter(loader)
+
+    assert counter.get(USER) == 2
+    assert counter.get(USER) == 1
+    assert counter.get(USER) == 1
+
+
+# -- usage and quotas (user-036) --
+@pytest.fixture
+def quota(server_env, monkeypatch):
+    from usage import UsageTracker
+
+    def tracker(**limits):
+        tracker = UsageTracker(server_env.server.measure_usage, ledger=server_env.server.manifest_usage, **limits)
+        monkeypatch.setattr(server_env.server, "usage", tracker)
+        return tracker
+    return tracker
+
+
+def _legacy_manifest(env):
+    # Manifest entries written before byte tracking (and so before the ledger)
+    data = env.local_db()
+    for entry in data["manifests"][USER].values():
+        del entry["bytes"]
+    with open(env.db_path, "w") as f:
+        json.dump(data, f)
+    os.remove(env.server.usage_ledger._path(USER))
+
+
+def _count_db_loads(env, monkeypatch):
+    loads = []
+    load = env.server.load_local_db
+    monkeypatch.setattr(env.server, "load_local_db", lambda: loads.append(1) or load())
+    return loads
+
+
+def test_quota_is_checked_when_the_delta_is_unknown(server_env, quota):
+    _post(server_env, [_file("a.txt"), _file("b.txt")])
+    _legacy_manifest(server_env)
+    quota(max_files=2, max_bytes=20)
+
+    res = _post(server_env, [_file("c.txt")])
+    assert res.status_code == 413
+    assert res.get_json()["usage"] == {"files": 2, "bytes": 12}
+
+    # Replacing a stored file is priced against what it replaces
+    assert _post(server_env, [_file("a.txt", b"cipher-cipher")]).status_code == 200
+    assert _post(server_env, [_file("b.txt", b"cipher-cipher")]).status_code == 413
+
+
+def test_usage_is_read_from_the_manifest_ledger(server_env, quota, monkeypatch):
+    _post(server_env, [_file("a.txt"), _file("b.txt", b"longer cipher")])
+    quota()
+    server_env.client.calls.clear()
+    loads = _count_db_loads(server_env, monkeypatch)
+
+    assert server_env.http.get(f"/api/files/{USER}/usage").get_json()["bytes"] == 19
+    assert ("files", "select") not in server_env.client.calls
+    assert not loads
+
+    # Without a usable ledger the store is scanned
+    _legacy_manifest(server_env)
+    quota()
+    assert server_env.http.get(f"/api/files/{USER}/usage").get_json() == {
+        "files": 2, "bytes": 19, "quota": {"files": None, "bytes": None, "file_bytes": None}}
+    assert ("files", "select") in server_env.client.calls
+
+
+def test_ledger_follows_deletes_and_seeds_once(server_env, quota, monkeypatch):
+    _post(server_env, [_file("a.txt"), _file("b.txt", b"longer cipher")])
+    file_id = server_env.local_db()["files"][USER][0]["id"]
+    assert server_env.http.delete(f"/api/files/{USER}/{file_id}").status_code == 200
+    assert server_env.server.usage_ledger.read(USER) == (True, (1, 13))
+
+    # A manifest written before the ledger existed is read from db.json once
+    os.remove(server_env.server.usage_ledger._path(USER))
+    loads = _count_db_loads(server_env, monkeypatch)
+    for _ in range(3):
+        assert server_env.server.manifest_usage(USER) == (1, 13)
+    assert len(loads) == 1
+
+
+# -- chunked containers (user-039) --
+def _container(size=20000):
+    from cloudvault_client.container import MIN_SEGMENT_SIZE, new_header, seal_segment
+
+    header = new_header(size, MIN_SEGMENT_SIZE)
+    data = bytes(size)
+    segments = [seal_segment(header, i, data[i * MIN_SEGMENT_SIZE:(i + 1) * MIN_SEGMENT_SIZE], "A1B2C3D4")
+                for i in range(header.segment_count)]
+    return header, segments
+
+
+def _begin(env, header):
+    return env.http.post(f"/api/containers/{USER}", data=header.raw, content_type="application/octet-stream")
+
+
+def _put_segment(env, header, number, sealed):
+    return env.http.put(f"/api/containers/{USER}/{header.id}/segments/{number}", data=sealed,
+                        content_type="application/octet-stream")
+
+
+def _container_file(name, header):
+    return _file(name, header.raw, iv="CVC1")
+
+
+def test_container_record_waits_for_every_segment(server_env):
+    header, segments = _container()
+    res = _post(server_env, [_container_file("big.bin", header)])
+    assert res.status_code == 409
+
+    assert _begin(server_env, header).status_code == 201
+    _put_segment(server_env, header, 1, segments[1])
+    res = _post(server_env, [_container_file("big.bin", header)])
+    assert res.status_code == 409 and res.get_json()["missing"] == [0]
+
+    # A resumed upload is told what is still missing
+    assert _begin(server_env, header).get_json()["missing"] == [0]
+    _put_segment(server_env, header, 0, segments[0])
+    assert _post(server_env, [_container_file("big.bin", header)]).get_json()["written"] == 1
+    stream = server_env.http.get(f"/api/containers/{USER}/{header.id}/stream").get_data()
+    assert stream == header.raw + b"".join(segments)
+
+
+def test_oversized_container_headers_are_rejected(server_env):
+    raw = _container()[0].raw
+    res = server_env.http.post(f"/api/containers/{USER}", data=raw[:12] + b"\xff" * 8 + raw[20:],
+                               content_type="application/octet-stream")
+    assert res.status_code == 400
+    assert not os.path.exists(os.path.join(server_env.server.segment_store.root, USER))
+
+
+def test_pending_containers_count_against_the_quota(server_env, quota):
+    first, segments = _container()
+    quota(max_bytes=first.ciphertext_bytes * 2 + 100)
+    assert _begin(server_env, first).status_code == 201
+    assert _begin(server_env, _container()[0]).status_code == 201
+    res = _begin(server_env, _container()[0])
+    assert res.status_code == 413
+
+    # Resuming a registered container isn't checked again
+    assert _begin(server_env, first).status_code == 201
+
+    # Once listed as a file the container is counted by usage, not twice
+    for i, sealed in enumerate(segments):
+        _put_segment(server_env, first, i, sealed)
+    assert _post(server_env, [_container_file("big.bin", first)]).status_code == 200
+    assert server_env.http.get(f"/api/files/{USER}/usage").get_json()["bytes"] == first.ciphertext_bytes
+    assert _begin(server_env, _container()[0]).status_code == 413
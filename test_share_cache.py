@@ -0,0 +1,112 @@
+import share_cache
+from share_cache import ShareCache, _RECORD_OVERHEAD
+
+# ShareCache: LRU and byte-cap eviction, owner invalidation, TTL and the
+# generation guard against caching a fetch that raced an invalidation.
+#
+#   python -m pytest -q test_share_cache.py
+
+
+def _files(n=1, content="AAAA"):
+    return [{"name": f"f{i}", "cipherContent": content} for i in range(n)]
+
+
+def test_hit_and_miss():
+    cache = ShareCache(max_entries=4, max_bytes=10**6, ttl=60)
+    assert cache.get("K1") is None
+    cache.put("K1", "u1", "alice", _files())
+
+    assert cache.get("K1") == ("u1", "alice", _files())
+    assert cache.snapshot()["hits"] == 1 and cache.snapshot()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ShareCache(max_entries=2, max_bytes=10**6, ttl=60)
+    cache.put("K1", "u1", "a", _files())
+    cache.put("K2", "u2", "b", _files())
+    cache.get("K1")
+    cache.put("K3", "u3", "c", _files())
+
+    assert cache.get("K2") is None
+    assert cache.get("K1") and cache.get("K3")
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_byte_cap_evicts_and_skips_oversized_entries():
+    entry_bytes = 100 + _RECORD_OVERHEAD
+    cache = ShareCache(max_entries=100, max_bytes=2 * entry_bytes, ttl=60)
+    for key in ("K1", "K2", "K3"):
+        cache.put(key, key.lower(), key, _files(content="A" * 100))
+
+    assert cache.get("K1") is None
+    assert cache.snapshot()["bytes"] == 2 * entry_bytes
+
+    cache.put("BIG", "u9", "big", _files(content="A" * 3 * entry_bytes))
+    assert cache.get("BIG") is None
+    assert cache.get("K2") and cache.get("K3")
+
+
+def test_replacing_a_key_keeps_the_byte_count_right():
+    cache = ShareCache(max_entries=4, max_bytes=10**6, ttl=60)
+    cache.put("K1", "u1", "a", _files(content="A" * 10))
+    cache.put("K1", "u1", "a", _files(content="A" * 20))
+
+    assert cache.snapshot()["bytes"] == 20 + _RECORD_OVERHEAD
+    assert cache.snapshot()["entries"] == 1
+
+
+def test_invalidate_owner_drops_every_key_for_that_owner():
+    cache = ShareCache(max_entries=8, max_bytes=10**6, ttl=60)
+    cache.put("OLD", "u1", "a", _files())
+    cache.put("NEW", "u1", "a", _files())
+    cache.put("OTHER", "u2", "b", _files())
+
+    assert cache.invalidate_owner("u1") == 2
+    assert cache.get("OLD") is None and cache.get("NEW") is None
+    assert cache.get("OTHER")
+    assert cache.invalidate_owner("u1") == 0
+
+
+def test_put_after_a_racing_invalidation_is_discarded():
+    cache = ShareCache(max_entries=8, max_bytes=10**6, ttl=60)
+    generation = cache.generation()
+    # ... the owner's salt rotates while the key is being resolved
+    cache.invalidate_owner("u1")
+    cache.put("K1", "u1", "a", _files(), generation)
+    assert cache.get("K1") is None
+
+    # Invalidating someone else doesn't matter
+    cache.put("K2", "u2", "b", _files(), generation)
+    assert cache.get("K2")
+
+    cache.put("K1", "u1", "a", _files(), cache.generation())
+    assert cache.get("K1")
+
+
+def test_invalidation_history_is_bounded(monkeypatch):
+    monkeypatch.setattr(share_cache, "_TRACKED_INVALIDATIONS", 3)
+    cache = ShareCache(max_entries=8, max_bytes=10**6, ttl=60)
+    generation = cache.generation()
+    for owner in ("u1", "u2", "u3", "u4", "u5"):
+        cache.invalidate_owner(owner)
+    assert len(cache._invalidated) == 3
+
+    # u1's invalidation was forgotten, so anything that started before it is refused
+    cache.put("K1", "u1", "a", _files(), generation)
+    cache.put("K9", "u9", "z", _files(), generation)
+    assert cache.get("K1") is None and cache.get("K9") is None
+    cache.put("K1", "u1", "a", _files(), cache.generation())
+    assert cache.get("K1")
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(share_cache.time, "monotonic", lambda: now[0])
+    cache = ShareCache(max_entries=8, max_bytes=10**6, ttl=60)
+    cache.put("K1", "u1", "a", _files())
+
+    now[0] += 59
+    assert cache.get("K1")
+    now[0] += 2
+    assert cache.get("K1") is None
+    assert cache.snapshot()["entries"] == 0 and cache.snapshot()["bytes"] == 0
@@ -0,0 +1,58 @@
+import json
+import struct
+
+import pytest
+
+from transport import FRAMES_MAGIC, FrameError, decode_frames, encode_frames
+
+# CVF1 frame codec: round trip and rejection of malformed bodies.
+#
+#   python -m pytest -q test_transport.py
+
+FILES = [
+    {"id": "f1", "name": "a.txt", "size": 3, "iv": "aXY=", "cipherContent": "AAEC"},
+    {"id": "f2", "name": "empty.txt", "size": 0, "iv": "aXY="},
+]
+
+
+def _frame(meta) -> bytes:
+    encoded = json.dumps(meta).encode("utf-8")
+    return struct.pack(">I", len(encoded)) + encoded
+
+
+def test_round_trip():
+    envelope, files = decode_frames(encode_frames({"owner": "me"}, [dict(f) for f in FILES]))
+
+    assert envelope == {"owner": "me", "count": 2}
+    assert files == FILES
+
+
+def test_undecodable_content_is_sent_unframed():
+    bad = [dict(FILES[0], cipherContent="not base64!"), dict(FILES[0], id="f3", cipherContent="AAE\nC")]
+    body = encode_frames({}, [dict(f) for f in bad + FILES])
+
+    assert decode_frames(body)[1] == bad + FILES
+
+
+@pytest.mark.parametrize("body", [
+    b"JSON{}",
+    FRAMES_MAGIC,
+    FRAMES_MAGIC + b"\x00\x00",
+    # meta_len runs past the end of the body
+    FRAMES_MAGIC + struct.pack(">I", 1000) + b"{}",
+    FRAMES_MAGIC + struct.pack(">I", 3) + b"{no",
+    # non-object metadata
+    FRAMES_MAGIC + _frame([]),
+    FRAMES_MAGIC + _frame("text"),
+    # payload lengths that are negative, not integers, or past the end
+    # {"bytes": -18} is 14 bytes: the length points back at its own header
+    FRAMES_MAGIC + _frame({"bytes": -18}),
+    FRAMES_MAGIC + _frame({"bytes": -1}),
+    FRAMES_MAGIC + _frame({"bytes": "3"}),
+    FRAMES_MAGIC + _frame({"bytes": 1.5}),
+    FRAMES_MAGIC + _frame({"bytes": True}),
+    FRAMES_MAGIC + _frame({"bytes": 10}) + b"short",
+])
+def test_malformed_bodies_raise_frame_error(body):
+    with pytest.raises(FrameError):
+        decode_frames(body)
@@ -0,0 +1,177 @@
+import os
+import gzip
+import json
+import base64
+import struct
+import binascii
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import Flask, Response, request
+
+from log_pipeline import get_logger
+
+try:
+    import zstandard
+except ImportError:  # optional: gzip is always available
+    zstandard = None
+
+# Wire formats for file payloads.
+#
+# JSON stays the default. Clients that send/accept FRAMES_MIMETYPE exchange
+# ciphertext as raw bytes instead of base64 strings:
+#
+#   b"CVF1" | frame* ;  frame = >I meta_len | meta (UTF-8 JSON) | payload
+#
+# meta["bytes"] is the payload length. The first frame is an envelope
+# (count, owner, ...) with no payload; each following frame is one file's
+# metadata (frontend shape minus cipherContent) plus its raw ciphertext.
+# A stored cipherContent that isn't valid base64 can't be sent raw; that
+# record goes out unframed, its string left in the metadata with an empty
+# payload, which decode_frames passes through unchanged.
+
+log = get_logger("transport")
+
+FRAMES_MIMETYPE = "application/vnd.cloudvault.frames"
+FRAMES_MAGIC = b"CVF1"
+_LEN = struct.Struct(">I")
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+ZSTD_LEVEL = int(os.environ.get("ZSTD_LEVEL", 3))
+
+
+class FrameError(ValueError):
+    pass
+
+
+def encode_frames(envelope: Dict[str, Any], files: List[Dict[str, Any]], content_key: str = "cipherContent") -> bytes:
+    parts = [FRAMES_MAGIC]
+
+    def _frame(meta: Dict[str, Any], payload: bytes) -> None:
+        meta["bytes"] = len(payload)
+        encoded = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+        parts.append(_LEN.pack(len(encoded)))
+        parts.append(encoded)
+        parts.append(payload)
+
+    _frame(dict(envelope, count=len(files)), b"")
+    for f in files:
+        meta = {k: v for k, v in f.items() if k != content_key}
+        content = f.get(content_key)
+        try:
+            payload = base64.b64decode(content, validate=True) if content else b""
+        except (binascii.Error, TypeError) as e:
+            log.warning("Sending record with undecodable content unframed", extra={"file_id": f.get("id"), "error": str(e)})
+            meta[content_key] = content
+            payload = b""
+        _frame(meta, payload)
+    return b"".join(parts)
+
+
+def decode_frames(body: bytes, content_key: str = "cipherContent") -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    if body[:4] != FRAMES_MAGIC:
+        raise FrameError("Missing CVF1 header")
+
+    view = memoryview(body)
+    pos = 4
+    frames = []
+    while pos < len(body):
+        if pos + 4 > len(body):
+            raise FrameError("Truncated frame header")
+        (meta_len,) = _LEN.unpack_from(view, pos)
+        pos += 4
+        if pos + meta_len > len(body):
+            raise FrameError("Truncated frame metadata")
+        try:
+            meta = json.loads(bytes(view[pos:pos + meta_len]))
+        except ValueError as e:
+            raise FrameError(f"Bad frame metadata: {e}")
+        if not isinstance(meta, dict):
+            raise FrameError("Frame metadata must be an object")
+        pos += meta_len
+        size = meta.pop("bytes", 0)
+        # bool is an int subclass; a negative length would move pos backwards forever
+        if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+            raise FrameError(f"Bad frame length {size!r}")
+        if pos + size > len(body):
+            raise FrameError("Truncated frame payload")
+        frames.append((meta, view[pos:pos + size]))
+        pos += size
+
+    if not frames:
+        raise FrameError("Missing envelope frame")
+
+    envelope = frames[0][0]
+    files = []
+    for meta, payload in frames[1:]:
+        if len(payload):
+            meta[content_key] = base64.b64encode(payload).decode("ascii")
+        files.append(meta)
+    return envelope, files
+
+
+def wants_frames() -> bool:
+    # Only when asked for by name; a wildcard Accept (browsers, curl, requests) means JSON
+    accept = request.accept_mimetypes
+    if FRAMES_MIMETYPE not in accept.values():
+        return False
+    return accept.quality(FRAMES_MIMETYPE) >= accept.quality("application/json")
+
+
+def is_frames_request() -> bool:
+    return request.mimetype == FRAMES_MIMETYPE
+
+
+def read_files_payload() -> Tuple[Optional[Dict[str, Any]], Any]:
+    # Returns (envelope, files) for either wire format; envelope is None for JSON
+    if is_frames_request():
+        return decode_frames(request.get_data(cache=False))
+    return None, request.get_json(silent=True)
+
+
+def frames_response(files: List[Dict[str, Any]], status: int = 200, **envelope: Any) -> Response:
+    return Response(encode_frames(envelope, files), status=status, mimetype=FRAMES_MIMETYPE)
+
+
+def _choose_encoding() -> Optional[str]:
+    accepted = request.accept_encodings
+    if zstandard is not None and accepted["zstd"] > 0:
+        return "zstd"
+    if accepted["gzip"] > 0:
+        return "gzip"
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def init_app(app: Flask) -> None:
+    @app.after_request
+    def _compress_json(response: Response) -> Response:
+        # Only JSON metadata responses; frames carry ciphertext, which doesn't compress
+        if (response.mimetype != "application/json"
+                or response.direct_passthrough
+                or response.status_code < 200 or response.status_code >= 300
+                or "Content-Encoding" in response.headers):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        encoding = _choose_encoding()
+        if not encoding:
+            return response
+
+        try:
+            compressed = compress(data, encoding)
+        except Exception as e:
+            log.warning("Response compression failed", extra={"encoding": encoding, "error": str(e)})
+            return response
+
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,70 @@
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+# Per-user unread notification counters.
+#
+# The first read for a user runs the loader (a count query, or a scan of the
+# local store) and from then on the count is adjusted in place when
+# notifications are created or marked read. Counts are reloaded after
+# UNREAD_COUNT_TTL seconds so changes made by other worker processes are
+# eventually picked up. The loader runs outside the lock; an adjust() or
+# invalidate() for that user while it runs bumps a generation and the load
+# is returned but not cached, since it may or may not include the change.
+
+UNREAD_COUNT_TTL = float(os.environ.get("UNREAD_COUNT_TTL", 300))
+
+
+class UnreadCounter:
+    def __init__(self, loader: Callable[[Any], int], ttl: float = UNREAD_COUNT_TTL):
+        self.loader = loader
+        self.ttl = ttl
+        self._counts: Dict[str, Tuple[int, float]] = {}
+        # user -> [loads in flight, generation]; only held while a load runs
+        self._generations: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: Any) -> int:
+        key = str(user_id)
+        with self._lock:
+            cached = self._counts.get(key)
+            if cached and cached[1] > time.monotonic():
+                return cached[0]
+            tracked = self._generations.setdefault(key, [0, 0])
+            tracked[0] += 1
+            generation = tracked[1]
+        try:
+            count = self.loader(user_id)
+        finally:
+            with self._lock:
+                tracked[0] -= 1
+                if not tracked[0]:
+                    del self._generations[key]
+        with self._lock:
+            if tracked[1] == generation:
+                self._counts[key] = (count, time.monotonic() + self.ttl)
+        return count
+
+    def _changed(self, key: str) -> None:
+        # Caller holds the lock
+        tracked = self._generations.get(key)
+        if tracked is not None:
+            tracked[1] += 1
+
+    def adjust(self, user_id: Any, delta: int) -> None:
+        # Users never counted yet are left alone; their first get() loads the truth
+        key = str(user_id)
+        with self._lock:
+            self._changed(key)
+            cached = self._counts.get(key)
+            if cached:
+                self._counts[key] = (max(0, cached[0] + delta), cached[1])
+
+    def invalidate(self, user_id: Any) -> None:
+        with self._lock:
+            self._changed(str(user_id))
+            self._counts.pop(str(user_id), None)
+
+    def size(self) -> int:
+        return len(self._counts)
@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+from cloudvault_client.container import ContainerError, header_from_record
+from log_pipeline import get_logger
+
+# Per-user storage accounting and quotas.
+#
+# A user's file count and ciphertext bytes are read from the ledger (the
+# totals recorded in their sync manifest) the first time they're needed,
+# or measured from the store when the ledger can't say, and from then on
+# moved by the deltas that
+# save_user_files / delete_file / sync apply, so GET /api/files/<id>/usage
+# is a dict lookup. Deltas come from the sync manifest (sync.py), which
+# already knows each stored file's previous ciphertext length; writes whose
+# delta can't be known exactly just drop the counter so it is re-measured.
+#
+# Quotas are checked against the projected totals before anything is
+# persisted. A limit of 0 disables it.
+#
+# The ledger itself is a small per-user file (UsageLedger, under
+# USAGE_LEDGER_DIR) rewritten from the manifest every time the server writes
+# one, so reading a user's totals never parses db.json. Users whose manifest
+# predates the ledger are seeded from db.json on first read.
+#
+# reconcile() re-measures users from the store and reports drift against
+# the live counter or, for users this process hasn't counted, against the
+# totals recorded in their sync manifest (the ledger the deltas come from).
+#
+#   python usage.py        # reconcile every user and print the drift report
+
+log = get_logger("usage")
+
+QUOTA_MAX_FILES = int(os.environ.get("QUOTA_MAX_FILES", 0))
+QUOTA_MAX_BYTES = int(os.environ.get("QUOTA_MAX_BYTES", 0))
+QUOTA_MAX_FILE_BYTES = int(os.environ.get("QUOTA_MAX_FILE_BYTES", 0))
+
+# Counters are re-measured after this long so writes made by other worker
+# processes are eventually reflected
+USAGE_COUNT_TTL = float(os.environ.get("USAGE_COUNT_TTL", 3600))
+
+USAGE_LEDGER_DIR = os.environ.get("USAGE_LEDGER_DIR", "usage_ledger")
+
+
+def ciphertext_bytes(cipher_b64: Optional[str]) -> int:
+    # Decoded length of a base64 string without decoding it
+    if not cipher_b64:
+        return 0
+    return len(cipher_b64) * 3 // 4 - len(cipher_b64) + len(cipher_b64.rstrip("="))
+
+
+def record_bytes(file: Dict[str, Any]) -> int:
+    # Stored ciphertext of a file record; a chunked container counts all its segments
+    try:
+        header = header_from_record(file)
+    except ContainerError:
+        header = None
+    if header:
+        return header.ciphertext_bytes
+    return ciphertext_bytes(file.get("cipherContent") or file.get("cipher_content"))
+
+
+def manifest_delta(changes: Iterable[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]) -> Optional[Tuple[int, int]]:
+    # (old manifest entry or None, new entry or None) pairs -> (files, bytes).
+    # None when an old entry predates byte tracking and the delta is unknown.
+    files = size = 0
+    for old, new in changes:
+        if old is not None:
+            if "bytes" not in old:
+                return None
+            files -= 1
+            size -= old["bytes"]
+        if new is not None:
+            files += 1
+            size += new["bytes"]
+    return files, size
+
+
+def manifest_totals(manifest: Optional[Dict[str, Dict[str, Any]]]) -> Optional[Tuple[int, int]]:
+    # (files, bytes) a manifest accounts for; None if it can't say
+    if manifest is None or any("bytes" not in entry for entry in manifest.values()):
+        return None
+    return len(manifest), sum(entry["bytes"] for entry in manifest.values())
+
+
+class UsageLedger:
+    # One small JSON file per user holding their manifest totals. Writes go
+    # through a temp file and os.replace, so readers in other worker processes
+    # see the old or the new totals, never a partial file.
+    def __init__(self, root: str = USAGE_LEDGER_DIR):
+        self.root = root
+
+    def _path(self, user_id: Any) -> str:
+        # Hashed so any user id is a safe file name
+        return os.path.join(self.root, hashlib.sha256(str(user_id).encode()).hexdigest()[:32] + ".json")
+
+    def read(self, user_id: Any) -> Tuple[bool, Optional[Tuple[int, int]]]:
+        # (seeded, totals); totals is None for a seeded user whose manifest can't say
+        try:
+            with open(self._path(user_id), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return False, None
+        if entry.get("files") is None:
+            return True, None
+        return True, (entry["files"], entry["bytes"])
+
+    def write(self, user_id: Any, totals: Optional[Tuple[int, int]], replace: bool = True) -> None:
+        # replace=False only creates the file, so a seed read from an older
+        # db.json never overwrites totals a concurrent manifest write stored
+        path = self._path(user_id)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        files, size = totals if totals is not None else (None, None)
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump({"user_id": str(user_id), "files": files, "bytes": size}, f)
+            if replace:
+                os.replace(tmp, path)
+            else:
+                try:
+                    os.link(tmp, path)
+                except FileExistsError:
+                    pass
+        except OSError as e:
+            # Like save_local_db, a failed write doesn't fail the request; the
+            # stale entry is dropped so the next read re-seeds from db.json
+            log.error("Could not write usage ledger", extra={"user_id": str(user_id), "error": str(e)})
+            if replace:
+                self._remove(path)
+        finally:
+            self._remove(tmp)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, message: str, usage: Dict[str, int], limits: Dict[str, Optional[int]]):
+        super().__init__(message)
+        self.usage = usage
+        self.limits = limits
+
+
+class UsageTracker:
+    def __init__(self, loader: Callable[[Any], Tuple[int, int]],
+                 ledger: Optional[Callable[[Any], Optional[Tuple[int, int]]]] = None, ttl: float = USAGE_COUNT_TTL,
+                 max_files: int = QUOTA_MAX_FILES, max_bytes: int = QUOTA_MAX_BYTES,
+                 max_file_bytes: int = QUOTA_MAX_FILE_BYTES):
+        self.loader = loader
+        self.ledger = ledger
+        self.ttl = ttl
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.last_reconcile: Optional[Dict[str, Any]] = None
+        self._usage: Dict[str, Tuple[int, int, float]] = {}
+        self._lock = threading.Lock()
+
+    def limits(self) -> Dict[str, Optional[int]]:
+        return {
+            "files": self.max_files or None,
+            "bytes": self.max_bytes or None,
+            "file_bytes": self.max_file_bytes or None,
+        }
+
+    def _measure(self, user_id: Any, use_ledger: bool = False) -> Dict[str, int]:
+        # The ledger is a local read; the loader scans every stored record
+        counted = self.ledger(user_id) if use_ledger and self.ledger else None
+        files, size = counted if counted is not None else self.loader(user_id)
+        with self._lock:
+            self._usage[str(user_id)] = (files, size, time.monotonic() + self.ttl)
+        return {"files": files, "bytes": size}
+
+    def get(self, user_id: Any) -> Dict[str, int]:
+        with self._lock:
+            cached = self._usage.get(str(user_id))
+            if cached and cached[2] > time.monotonic():
+                return {"files": cached[0], "bytes": cached[1]}
+        return self._measure(user_id, use_ledger=True)
+
+    def check(self, user_id: Any, files_delta: int, bytes_delta: int, largest_file: int = 0) -> None:
+        # Raises QuotaExceeded if applying the delta would cross a limit.
+        # Writes that only shrink usage are always allowed.
+        if self.max_file_bytes and largest_file > self.max_file_bytes:
+            metrics.incr("usage.quota_rejected")
+            raise QuotaExceeded(f"File exceeds the {self.max_file_bytes} byte per-file limit",
+                                self.get(user_id), self.limits())
+        if not (self.max_files and files_delta > 0) and not (self.max_bytes and bytes_delta > 0):
+            return
+        current = self.get(user_id)
+        if self.max_files and files_delta > 0 and current["files"] + files_delta > self.max_files:
+            metrics.incr("usage.quota_rejected")
+            raise QuotaExceeded(f"File count quota of {self.max_files} exceeded", current, self.limits())
+        if self.max_bytes and bytes_delta > 0 and current["bytes"] + bytes_delta > self.max_bytes:
+            metrics.incr("usage.quota_rejected")
+            raise QuotaExceeded(f"Storage quota of {self.max_bytes} bytes exceeded", current, self.limits())
+
+    def apply(self, user_id: Any, delta: Optional[Tuple[int, int]]) -> None:
+        # delta=None (unknown) drops the counter; users never measured are left alone
+        key = str(user_id)
+        with self._lock:
+            cached = self._usage.get(key)
+            if not cached:
+                return
+            if delta is None:
+                del self._usage[key]
+                return
+            self._usage[key] = (max(0, cached[0] + delta[0]), max(0, cached[1] + delta[1]), cached[2])
+
+    def invalidate(self, user_id: Any) -> None:
+        with self._lock:
+            self._usage.pop(str(user_id), None)
+
+    def size(self) -> int:
+        return len(self._usage)
+
+    def reconcile(self, user_ids: Iterable[Any]) -> Dict[str, Any]:
+        # Re-measure each user from the store, replace the counter and report
+        # where the incremental numbers had drifted
+        started = time.monotonic()
+        drift: List[Dict[str, Any]] = []
+        errors: Dict[str, str] = {}
+        checked = 0
+        for user_id in user_ids:
+            key = str(user_id)
+            with self._lock:
+                cached = self._usage.get(key)
+            try:
+                counted = cached[:2] if cached else (self.ledger(user_id) if self.ledger else None)
+                actual = self._measure(user_id)
+            except Exception as e:
+                errors[key] = str(e)
+                continue
+            checked += 1
+            if counted is not None and tuple(counted) != (actual["files"], actual["bytes"]):
+                drift.append({
+                    "user_id": key,
+                    "source": "counter" if cached else "manifest",
+                    "counted": {"files": counted[0], "bytes": counted[1]},
+                    "actual": actual,
+                })
+
+        report = {
+            "checked": checked,
+            "drift": drift,
+            "errors": errors,
+            "finished_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            "duration_ms": round((time.monotonic() - started) * 1000, 1),
+        }
+        if drift:
+            metrics.incr("usage.drift", len(drift))
+            log.warning("Usage counters drifted from the store", extra={"users": len(drift)})
+        self.last_reconcile = report
+        return report
+
+
+if __name__ == "__main__":
+    from server import repo, usage
+
+    users = [u.get("id") for u in repo.find("users", fields=["id"])]
+    print(json.dumps(usage.reconcile(users), indent=2))